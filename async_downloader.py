@@ -0,0 +1,281 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from download_scheduler import priority_key
+from http_cache import (HttpValidatorCache, content_range_start, discard_part, resume_headers,
+                        save_part_validator)
+from http_session import RetryPolicy
+from telemetry import TransferTelemetry
+
+try:
+    import httpx
+except ImportError:  # Dependencia opcional
+    httpx = None
+
+try:
+    import h2  # noqa: F401  (necesario para HTTP/2 en httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+# Bytes recibidos que se acumulan antes de escribirlos (en el hilo de E/S)
+WRITE_BUFFER = 256 * 1024
+
+
+class _PriorityGate:
+    """Semáforo asyncio que despierta primero al que tenga menor prioridad"""
+
+    def __init__(self, limit: int):
+        self._free = limit
+        self._waiters = []
+        self._seq = itertools.count()
+
+    async def acquire(self, priority=(0, 0)):
+        if self._free > 0 and not self._waiters:
+            self._free -= 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority_key(priority), next(self._seq), waiter))
+        await waiter
+
+    def release(self):
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                # El hueco pasa directamente al siguiente en espera
+                waiter.set_result(None)
+                return
+        self._free += 1
+
+
+class AsyncDownloadEngine:
+    """Motor de descargas asyncio sobre httpx con multiplexación HTTP/2
+
+    Ejecuta su propio bucle de eventos en un hilo de fondo para poder usarse
+    desde el código síncrono del descargador. Cada respuesta se vuelca al
+    disco por bloques, así que cientos de peticiones en vuelo ocupan poca
+    memoria. La escritura en disco y los callbacks (hash, almacén de blobs,
+    manifiesto) corren en un pool de hilos de E/S para no frenar el bucle.
+    """
+
+    def __init__(self, headers: Optional[Dict[str, str]] = None, max_in_flight: int = 200,
+                 per_host_limit: int = 100, http2: bool = True, timeout: float = 30,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 http_cache: Optional[HttpValidatorCache] = None,
+                 telemetry: Optional[TransferTelemetry] = None,
+                 io_workers: int = 4, logger: Optional[logging.Logger] = None):
+        if httpx is None:
+            raise ImportError("El motor asíncrono necesita httpx (pip install 'httpx[http2]')")
+
+        self.logger = logger or logging.getLogger(__name__)
+        # httpx registra cada petición a nivel INFO
+        logging.getLogger('httpx').setLevel(logging.WARNING)
+        self.headers = dict(headers or {})
+        # httpx solo decodifica brotli si está instalado el paquete brotli
+        self.headers['Accept-Encoding'] = 'gzip, deflate'
+        self.max_in_flight = max(1, max_in_flight)
+        self.per_host_limit = max(1, per_host_limit)
+        self.timeout = timeout
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.http_cache = http_cache
+        self.telemetry = telemetry
+
+        self.http2 = http2 and HTTP2_AVAILABLE
+        if http2 and not HTTP2_AVAILABLE:
+            self.logger.warning("Paquete h2 no instalado, el motor asíncrono usará HTTP/1.1")
+
+        self._io = ThreadPoolExecutor(max_workers=max(1, io_workers), thread_name_prefix="descarga-async-io")
+        self._client = None
+        self._gate = None
+        self._host_gates = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="descarga-async",
+                                        daemon=True)
+        self._thread.start()
+
+    async def _ensure_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                http2=self.http2,
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=self.max_in_flight,
+                                    max_keepalive_connections=self.max_in_flight),
+            )
+            self._gate = _PriorityGate(self.max_in_flight)
+            self._host_gates = defaultdict(lambda: asyncio.Semaphore(self.per_host_limit))
+        return self._client
+
+    async def _in_io(self, func, *args):
+        """Ejecutar una función bloqueante (disco, callbacks) en el pool de E/S"""
+        return await asyncio.get_running_loop().run_in_executor(self._io, func, *args)
+
+    def _request_headers(self, url: str, filepath: str, part_path: str) -> Dict[str, str]:
+        # Reanudar un .part previo con Range + If-Range (si cambió llega entero)
+        headers = resume_headers(part_path)
+        if not headers and self.http_cache:
+            headers = self.http_cache.conditional_headers(url, filepath)
+        return headers
+
+    @staticmethod
+    def _range_matches_part(part_path: str, headers) -> bool:
+        """La respuesta 206 empieza justo donde acaba el .part; si no, se descarta"""
+        if content_range_start(headers) == os.path.getsize(part_path):
+            return True
+        discard_part(part_path)
+        return False
+
+    @staticmethod
+    def _open_part(part_path: str, mode: str, headers):
+        if mode == 'wb':
+            save_part_validator(part_path, headers)
+        return open(part_path, mode)
+
+    def _complete_part(self, url: str, part_path: str, filepath: str, headers) -> bool:
+        """Renombrar el .part terminado y guardar sus validadores"""
+        if os.path.getsize(part_path) <= 1000:
+            return False
+        os.replace(part_path, filepath)
+        discard_part(part_path)
+        if self.http_cache:
+            self.http_cache.store(url, filepath, headers)
+        return True
+
+    async def _download(self, url: str, filepath: str, priority,
+                        on_page: Optional[Callable[[str, str], None]] = None,
+                        on_retry: Optional[Callable[[str], None]] = None) -> Optional[str]:
+        client = await self._ensure_client()
+        host = urlparse(url).netloc
+        part_path = filepath + '.part'
+
+        attempt = 0
+        while True:
+            status_code = None
+            retry_after = None
+            received = 0
+            ttfb = None
+            start = None
+            headers = await self._in_io(self._request_headers, url, filepath, part_path)
+
+            await self._gate.acquire(priority)
+            try:
+                async with self._host_gates[host]:
+                    # El tiempo en cola no cuenta: se mide desde que hay hueco
+                    start = time.perf_counter()
+                    async with client.stream('GET', url, headers=headers) as response:
+                        ttfb = time.perf_counter() - start
+                        status_code = response.status_code
+                        retry_after = response.headers.get('Retry-After')
+                        if status_code == 304:
+                            # Solo hay peticiones condicionales con caché; sin ella un 304
+                            # dejaría un archivo vacío
+                            if not self.http_cache:
+                                raise ValueError("respuesta 304 a una petición no condicional")
+                            await self._in_io(self.http_cache.record_hit, url)
+                            self._record(url, ttfb, start, 0, attempt, status_code)
+                            self.logger.info(f"Sin cambios: {os.path.basename(filepath)}")
+                            if on_page:
+                                await self._in_io(on_page, url, filepath)
+                            return filepath
+                        if status_code == 416:
+                            await self._in_io(discard_part, part_path)
+                            status_code = None
+                            raise ValueError("rango no satisfacible, se reinicia la descarga")
+                        response.raise_for_status()
+                        if status_code == 206 and not await self._in_io(
+                                self._range_matches_part, part_path, response.headers):
+                            # El servidor no continúa donde acaba el .part: empezar de cero
+                            status_code = None
+                            raise ValueError("Content-Range no coincide con la descarga parcial, se reinicia")
+                        mode = 'ab' if status_code == 206 else 'wb'
+                        f = await self._in_io(self._open_part, part_path, mode, response.headers)
+                        try:
+                            buffer = bytearray()
+                            async for chunk in response.aiter_bytes(8192):
+                                buffer += chunk
+                                received += len(chunk)
+                                if len(buffer) >= WRITE_BUFFER:
+                                    await self._in_io(f.write, bytes(buffer))
+                                    buffer.clear()
+                            if buffer:
+                                await self._in_io(f.write, bytes(buffer))
+                        finally:
+                            await self._in_io(f.close)
+                        response_headers = response.headers
+
+                if await self._in_io(self._complete_part, url, part_path, filepath, response_headers):
+                    latency = self._record(url, ttfb, start, received, attempt, status_code)
+                    self.logger.info(f"Descargada: {os.path.basename(filepath)} "
+                                     f"({received / 1024:.0f} KB en {latency * 1000:.0f} ms)")
+                    if on_page:
+                        await self._in_io(on_page, url, filepath)
+                    return filepath
+
+                status_code = None
+                error = "archivo incompleto"
+
+            except Exception as e:
+                error = str(e)
+            finally:
+                self._gate.release()
+
+            if start is not None:
+                self._record(url, ttfb, start, received, attempt, status_code, ok=False)
+
+            if not self.retry_policy.should_retry(attempt, status_code):
+                self.logger.error(f"Error descargando {os.path.basename(filepath)}: {error}")
+                return None
+
+            # La espera entre reintentos no ocupa hueco de concurrencia
+            delay = self.retry_policy.delay(attempt, retry_after)
+            self.logger.warning(f"Reintento {attempt + 1} para {os.path.basename(filepath)} en {delay:.1f}s: {error}")
+            if on_retry:
+                on_retry(url)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _record(self, url, ttfb, start, received, attempt, status_code, ok=True) -> float:
+        latency = time.perf_counter() - start
+        if self.telemetry:
+            self.telemetry.record(url, ttfb, latency, received, attempt, status_code, ok)
+        return latency
+
+    async def _download_chapter(self, jobs: List[Tuple[str, str]], priority,
+                                on_page=None, on_retry=None) -> List[Optional[str]]:
+        return await asyncio.gather(*(self._download(url, filepath, priority, on_page, on_retry)
+                                      for url, filepath in jobs))
+
+    def submit_chapter(self, jobs: List[Tuple[str, str]], priority=(0, 0),
+                       on_page: Optional[Callable[[str, str], None]] = None,
+                       on_retry: Optional[Callable[[str], None]] = None) -> Future:
+        """Encolar (url, ruta) de un capítulo; el futuro devuelve las rutas descargadas o None
+
+        on_page(url, ruta) se llama tras cada página completada y on_retry(url)
+        antes de cada reintento.
+        """
+        return asyncio.run_coroutine_threadsafe(self._download_chapter(jobs, priority, on_page, on_retry),
+                                                self._loop)
+
+    def close(self):
+        """Cerrar el cliente HTTP y detener el bucle de eventos"""
+        async def close_client():
+            if self._client is not None:
+                await self._client.aclose()
+
+        if self._loop.is_running():
+            asyncio.run_coroutine_threadsafe(close_client(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+        self._loop.close()
+        self._io.shutdown()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+📚 DESCARGA POR LOTES
+🔧 Descarga muchos títulos en un solo proceso, sin preguntas: navegadores,
+   conexiones HTTP, planificador y conversión se comparten entre todos
+
+Archivo de cola, un título por línea (las líneas con # se ignoran):
+
+    https://bato.to/title/141482-demon-king-x-adventurer
+    https://xbato.com/title/186157-black-blood-official 10-20 prioridad=5 formato=cbz
+    https://bato.to/title/157079-otro-titulo 30-
+
+o en JSON, una línea por título:
+
+    {"url": "https://bato.to/title/141482-demon-king-x-adventurer", "inicio": 10, "fin": 20, "prioridad": 5}
+
+Uso:
+    python batch_download.py cola.txt
+    python batch_download.py cola.txt --titulos-simultaneos 3 --formato cbz
+    python batch_download.py cola.txt --actualizar     # solo capítulos nuevos
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional
+
+from formats import OUTPUT_FORMATS
+from manga_downloader_edge import EdgeMangaDownloader, configure_logging
+from metrics import PROMETHEUS_PREFIX, write_textfile
+
+# Resumen de cada lote, en la carpeta de descargas
+SUMMARY_NAME = "resumen_lote.json"
+
+# Telemetría de transferencia del lote (compartida por todos los títulos)
+TRANSFER_METRICS_NAME = "metricas_transferencia.prom"
+
+
+class TitleRequest(NamedTuple):
+    url: str
+    start_chapter: int = 1
+    end_chapter: Optional[int] = None
+    # Mayor = antes: el título empieza antes y sus imágenes pasan delante en el planificador
+    priority: int = 0
+    output_format: Optional[str] = None
+    line: int = 0
+
+
+def _parse_range(text: str):
+    start, _, end = text.partition('-')
+    return int(start or 1), (int(end) if end else None)
+
+
+def parse_queue(path: str) -> List[TitleRequest]:
+    """Leer un archivo de cola (texto o JSON por líneas); ValueError indica la línea errónea"""
+    requests = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, raw in enumerate(f, 1):
+            line = raw.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                if line.startswith('{'):
+                    entry = json.loads(line)
+                    url = entry['url']
+                    start, end = int(entry.get('inicio', 1)), entry.get('fin')
+                    end = int(end) if end is not None else None
+                    priority, output_format = int(entry.get('prioridad', 0)), entry.get('formato')
+                else:
+                    url, *fields = line.split()
+                    start, end, priority, output_format = 1, None, 0, None
+                    for field in fields:
+                        key, sep, value = field.partition('=')
+                        if not sep:
+                            start, end = _parse_range(field)
+                        elif key == 'prioridad':
+                            priority = int(value)
+                        elif key == 'formato':
+                            output_format = value.lower()
+                        else:
+                            raise ValueError(f"opción desconocida '{key}'")
+            except (KeyError, ValueError, json.JSONDecodeError) as e:
+                raise ValueError(f"{path}, línea {number}: {e}") from None
+
+            if not url.startswith(('http://', 'https://')):
+                raise ValueError(f"{path}, línea {number}: URL no válida '{url}'")
+            if output_format is not None and output_format not in OUTPUT_FORMATS:
+                raise ValueError(f"{path}, línea {number}: formato no válido '{output_format}'")
+            requests.append(TitleRequest(url.rstrip('/'), start, end, priority, output_format, number))
+    return requests
+
+
+class BatchDownloader:
+    """Descarga varios títulos a la vez con un único conjunto de recursos
+
+    Un descargador propietario crea el pool de navegadores, la sesión HTTP,
+    la caché de validadores, el planificador y el motor de conversión; cada
+    título usa un descargador ligero que los comparte (ver `shared_with`),
+    con sus propias métricas y su propio pipeline de capítulos.
+    """
+
+    def __init__(self, download_dir: str = "downloads", max_titles: int = 2,
+                 output_format: str = "pdf", update: bool = False,
+                 logger: Optional[logging.Logger] = None, **downloader_options):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Formato de salida no válido: {output_format}")
+        self.download_dir = download_dir
+        self.max_titles = max(1, max_titles)
+        self.output_format = output_format
+        # Modo actualización: cada título solo procesa sus capítulos nuevos (ver TitleRecord)
+        self.update = update
+        self.logger = logger or logging.getLogger(__name__)
+        self.downloader_options = downloader_options
+        self.shared = EdgeMangaDownloader(download_dir=download_dir, **downloader_options)
+
+    def _download_title(self, request: TitleRequest) -> dict:
+        manga_id = request.url.split('/')[-1]
+        output_format = request.output_format or self.output_format
+        result = {'url': request.url, 'manga': manga_id, 'format': output_format,
+                  'priority': request.priority, 'status': 'error'}
+        options = dict(self.downloader_options)
+        if options.get('metrics_textfile'):
+            # Un .prom por título junto al indicado: el textfile collector lee todos
+            root, extension = os.path.splitext(options['metrics_textfile'])
+            options['metrics_textfile'] = f"{root}_{manga_id}{extension or '.prom'}"
+        downloader = EdgeMangaDownloader(download_dir=self.download_dir, shared_with=self.shared, **options)
+        start = time.time()
+        self.logger.info(f"▶️ Título {manga_id} (prioridad {request.priority})")
+        try:
+            ok = downloader.download_manga(request.url, request.start_chapter, request.end_chapter,
+                                           output_format, priority=request.priority, update=self.update)
+            result['status'] = 'ok' if ok else 'fallo'
+        except Exception as e:
+            self.logger.error(f"❌ Error descargando {manga_id}: {e}")
+            result['error'] = str(e)
+        finally:
+            downloader.cleanup()
+        result['duration'] = time.time() - start
+        result['counters'] = downloader.metrics.snapshot()['counters']
+        return result
+
+    def run(self, requests: List[TitleRequest]) -> dict:
+        """Descargar los títulos (los de mayor prioridad primero) y devolver el resumen"""
+        unique, seen = [], set()
+        for request in requests:
+            if request.url in seen:
+                self.logger.warning(f"Título repetido en la línea {request.line}, se omite: {request.url}")
+                continue
+            seen.add(request.url)
+            unique.append(request)
+        # sorted es estable: a igual prioridad se respeta el orden del archivo
+        ordered = sorted(unique, key=lambda request: -request.priority)
+
+        self.logger.info(f"📚 Lote de {len(ordered)} títulos, {self.max_titles} a la vez")
+        started = time.time()
+        self.shared.telemetry.start_reporter()
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_titles, thread_name_prefix="titulo") as executor:
+                results = list(executor.map(self._download_title, ordered))
+        finally:
+            self.shared.telemetry.stop_reporter()
+            self.shared.cleanup()
+
+        totals = {}
+        for result in results:
+            for name, value in result['counters'].items():
+                totals[name] = totals.get(name, 0) + value
+        summary = {
+            'started': started,
+            'duration': time.time() - started,
+            'titles': results,
+            'status': {status: sum(1 for result in results if result['status'] == status)
+                       for status in ('ok', 'fallo', 'error')},
+            'totals': totals,
+            'transfer': self.shared.get_transfer_stats()['totals'],
+        }
+        self._log_summary(summary)
+        self.write_summary(summary)
+        self.write_transfer_metrics()
+        return summary
+
+    def _log_summary(self, summary: dict):
+        icons = {'ok': "✅", 'fallo': "⚠️", 'error': "❌"}
+        self.logger.info("=" * 50)
+        self.logger.info("📚 RESUMEN DEL LOTE")
+        for result in summary['titles']:
+            counters = result['counters']
+            new = counters.get('capitulos_creados', 0)
+            skipped = counters.get('capitulos_omitidos', 0)
+            failed = counters.get('capitulos', 0) - new - skipped
+            self.logger.info(f"{icons[result['status']]} {result['manga']}: {new} capítulos nuevos, "
+                             f"{skipped} al día, {failed} fallidos, {counters.get('paginas', 0)} páginas "
+                             f"({counters.get('bytes', 0) / (1024 * 1024):.1f} MB) "
+                             f"en {result['duration'] / 60:.1f} min")
+        status = summary['status']
+        self.logger.info(f"📊 Títulos: {status['ok']} correctos, {status['fallo']} sin capítulos, "
+                         f"{status['error']} con error")
+        self.logger.info(f"🌐 Transferido: {summary['transfer']['bytes'] / (1024 * 1024):.1f} MB en "
+                         f"{summary['transfer']['requests']} peticiones")
+        self.logger.info(f"⏱️ Tiempo total: {summary['duration'] / 60:.1f} minutos")
+        self.logger.info("=" * 50)
+
+    def write_summary(self, summary: dict) -> Optional[str]:
+        """Guardar el resumen en resumen_lote.json (escritura atómica)"""
+        path = os.path.join(self.download_dir, SUMMARY_NAME)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.download_dir, exist_ok=True)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, ensure_ascii=False, indent=1)
+            os.replace(temp_path, path)
+            return path
+        except OSError as e:
+            self.logger.warning(f"No se pudo guardar el resumen del lote: {e}")
+            return None
+
+    def write_transfer_metrics(self) -> Optional[str]:
+        """Exportar una sola vez, sin etiqueta de título, la telemetría compartida
+
+        Va junto a los .prom de los títulos si se indicó metrics_textfile y si
+        no a la carpeta de descargas.
+        """
+        textfile = self.downloader_options.get('metrics_textfile')
+        if textfile:
+            root, extension = os.path.splitext(textfile)
+            path = f"{root}_transferencia{extension or '.prom'}"
+        else:
+            path = os.path.join(self.download_dir, TRANSFER_METRICS_NAME)
+        try:
+            write_textfile(path, self.shared.telemetry.prometheus_lines(PROMETHEUS_PREFIX, {}))
+            return path
+        except OSError as e:
+            self.logger.warning(f"No se pudo guardar la telemetría del lote: {e}")
+            return None
+
+
+def run_batch(queue_file: str, max_titles: int = 2, output_format: str = "pdf",
+              download_dir: str = "downloads", update: bool = False, **downloader_options) -> int:
+    """Ejecutar un lote desde un archivo de cola; devuelve el código de salida del proceso"""
+    logger = logging.getLogger(__name__)
+    try:
+        requests = parse_queue(queue_file)
+    except (OSError, ValueError) as e:
+        logger.error(f"❌ No se pudo leer la cola: {e}")
+        return 2
+    if not requests:
+        logger.warning("La cola no tiene títulos")
+        return 0
+
+    batch = BatchDownloader(download_dir=download_dir, max_titles=max_titles,
+                            output_format=output_format, update=update, logger=logger,
+                            **downloader_options)
+    summary = batch.run(requests)
+    return 0 if summary['status']['ok'] == len(summary['titles']) else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Descargar los títulos de un archivo de cola")
+    parser.add_argument('cola', help="archivo con un título por línea (texto o JSON)")
+    parser.add_argument('--titulos-simultaneos', type=int, default=2,
+                        help="títulos descargándose a la vez (comparten navegadores y conexiones)")
+    parser.add_argument('--formato', default='pdf', choices=OUTPUT_FORMATS,
+                        help="formato de los títulos que no lo indican en la cola")
+    parser.add_argument('--directorio', default='downloads')
+    parser.add_argument('--actualizar', action='store_true',
+                        help="procesar solo los capítulos nuevos o cambiados de cada título")
+    parser.add_argument('--motor', default='threads', choices=('threads', 'async'),
+                        help="motor de descarga de imágenes")
+    args = parser.parse_args()
+
+    configure_logging()
+    sys.exit(run_batch(args.cola, args.titulos_simultaneos, args.formato, args.directorio,
+                       update=args.actualizar, download_engine=args.motor))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+⏱️ BENCHMARK DE ARRANQUE: COSTE DE IMPORTACIÓN
+🔧 Mide con `python -X importtime` lo que cuesta importar cada comando y
+   comprueba que las herramientas sin conexión no cargan Selenium
+
+Uso:
+    python benchmarks/bench_import_time.py                    # todos los comandos
+    python benchmarks/bench_import_time.py --repeticiones 10
+    python benchmarks/bench_import_time.py --comparar benchmarks/resultados/importtime-anterior.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "resultados")
+
+# Módulo de cada comando y si debe poder importarse sin Selenium
+COMMANDS = [
+    ('convert_to_pdf', True),
+    ('regenerate_complete_pdf', True),
+    ('pdf_converter', True),
+    ('pdf_engine', True),
+    ('manga_downloader_edge', False),
+    ('download_edge', False),
+]
+
+# Paquetes del navegador que las herramientas sin conexión no deben cargar
+BROWSER_PACKAGES = ('selenium', 'webdriver_manager')
+
+# Un comando es más lento que la referencia si su mediana supera este margen
+DEFAULT_TOLERANCE = 0.10
+
+
+def import_time(module):
+    """Importar `module` en un intérprete nuevo; devuelve (µs acumulados, paquetes cargados)"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=REPO_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {module}: {result.stderr.strip().splitlines()[-1]}")
+
+    total, packages = None, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        packages.add(name.split('.')[0])
+        if name == module:
+            total = int(cumulative)
+    return total, packages
+
+
+def measure(module, repeat):
+    samples, packages = [], set()
+    for _ in range(repeat):
+        total, packages = import_time(module)
+        samples.append(total / 1e6)
+    return {
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'max': max(samples),
+        'repeat': repeat,
+        'browser': sorted(packages.intersection(BROWSER_PACKAGES)),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocida"
+
+
+def compare(results, baseline_path, tolerance):
+    """Mostrar la variación frente a una ejecución anterior; devuelve las regresiones"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)['benchmarks']
+
+    regressions = []
+    print(f"\n📊 Comparación con {os.path.basename(baseline_path)} (margen {tolerance * 100:.0f}%)")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        change = result['median'] / baseline[name]['median'] - 1
+        marker = "❌" if change > tolerance else "✅"
+        print(f"   {marker} {name:45s} {baseline[name]['median'] * 1000:8.1f} ms -> "
+              f"{result['median'] * 1000:8.1f} ms ({change * 100:+.1f}%)")
+        if change > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coste de importación de los comandos")
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--salida', help="archivo JSON de resultados (por defecto benchmarks/resultados/)")
+    parser.add_argument('--comparar', help="JSON de una ejecución anterior para detectar regresiones")
+    parser.add_argument('--tolerancia', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    results, leaks = {}, []
+    print("⏱️ import_time")
+    for module, offline in COMMANDS:
+        try:
+            result = measure(module, args.repeticiones)
+        except RuntimeError as e:
+            print(f"   ⚠️ {e}")
+            continue
+        name = f"import_time[{module}]"
+        results[name] = result
+        browser = ", ".join(result['browser']) or "-"
+        print(f"   {name:45s} {result['median'] * 1000:10.1f} ms   navegador: {browser}")
+        if offline and result['browser']:
+            leaks.append(module)
+
+    report = {
+        'revision': git_revision(),
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'cpus': os.cpu_count()},
+        'benchmarks': results,
+    }
+
+    output = args.salida
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"importtime-{datetime.now():%Y%m%d-%H%M%S}-{report['revision']}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+    print(f"\n💾 Resultados guardados en {output}")
+
+    failed = False
+    if leaks:
+        print(f"❌ Cargan el navegador sin necesitarlo: {', '.join(leaks)}")
+        failed = True
+    if args.comparar:
+        regressions = compare(results, args.comparar, args.tolerancia)
+        if regressions:
+            print(f"❌ {len(regressions)} regresiones detectadas")
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
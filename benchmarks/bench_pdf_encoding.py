@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+⏱️ BENCHMARK: CODIFICACIÓN DE PÁGINAS EN images_to_pdf
+🔧 Compara el método antiguo (temp_resized_*.jpg en disco) con la codificación en memoria
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from pdf_pages import EncodedJPEG, encode_page
+from synthetic import make_chapter
+
+
+def pdf_temp_files(files, output_path, target_width):
+    """Método anterior: cada página pasa por un JPEG temporal en disco"""
+    c = None
+    for i, image_file in enumerate(files):
+        data, width, height = encode_page(image_file, target_width)
+        temp_path = f"temp_resized_{i}.jpg"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        if c is None:
+            c = canvas.Canvas(output_path, pagesize=(width, height))
+        c.setPageSize((width, height))
+        c.drawImage(temp_path, 0, 0, width, height)
+        c.showPage()
+        os.remove(temp_path)
+    c.save()
+
+
+def pdf_image_reader(files, output_path, target_width):
+    """Buffer en memoria con ImageReader estándar (reportlab lo decodifica otra vez)"""
+    c = None
+    for image_file in files:
+        data, width, height = encode_page(image_file, target_width)
+        if c is None:
+            c = canvas.Canvas(output_path, pagesize=(width, height))
+        c.setPageSize((width, height))
+        c.drawImage(ImageReader(io.BytesIO(data)), 0, 0, width, height)
+        c.showPage()
+    c.save()
+
+
+def pdf_in_memory(files, output_path, target_width):
+    """Método actual: buffer JPEG entregado directamente al PDF"""
+    c = None
+    for image_file in files:
+        data, width, height = encode_page(image_file, target_width)
+        if c is None:
+            c = canvas.Canvas(output_path, pagesize=(width, height))
+        c.setPageSize((width, height))
+        c.drawImage(EncodedJPEG(data), 0, 0, width, height)
+        c.showPage()
+    c.save()
+
+
+def measure(func, files, output_path, target_width, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(files, output_path, target_width)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de codificación de páginas a PDF")
+    parser.add_argument('--paginas', type=int, default=30)
+    parser.add_argument('--ancho', type=int, default=800)
+    parser.add_argument('--alto', type=int, default=1200)
+    parser.add_argument('--formato', default='webp', choices=['webp', 'jpg', 'png'])
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        files = make_chapter(work_dir, args.paginas, args.ancho, args.alto, args.formato,
+                             mixed_widths=False)
+        output_path = os.path.join(work_dir, "capitulo.pdf")
+
+        methods = [
+            ("archivos temporales", pdf_temp_files),
+            ("ImageReader(BytesIO)", pdf_image_reader),
+            ("en memoria (EncodedJPEG)", pdf_in_memory),
+        ]
+
+        print(f"📄 {args.paginas} páginas {args.formato} de {args.ancho}x{args.alto}px")
+        results = {}
+        for name, func in methods:
+            total = measure(func, files, output_path, args.ancho, args.repeticiones)
+            results[name] = total
+            print(f"   {name:28s} {total * 1000 / args.paginas:8.2f} ms/página")
+
+        baseline = results["archivos temporales"]
+        current = results["en memoria (EncodedJPEG)"]
+        saved = (baseline - current) * 1000 / args.paginas
+        print(f"⚡ Ahorro por página: {saved:.2f} ms ({(1 - current / baseline) * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
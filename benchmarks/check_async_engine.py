@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+✅ COMPROBACIÓN DEL MOTOR ASÍNCRONO
+🔧 Descarga imágenes de un servidor HTTP local con AsyncDownloadEngine y verifica
+   el contenido, la reanudación con If-Range y que los callbacks no se ejecutan
+   en el hilo del bucle de eventos
+
+Uso:
+    python benchmarks/check_async_engine.py
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from async_downloader import AsyncDownloadEngine, httpx
+from http_cache import PART_VALIDATOR_SUFFIX
+from http_session import RetryPolicy
+from synthetic import LocalServer, QuietHandler
+
+
+class RangeHandler(QuietHandler):
+    """Sirve archivos con ETag y atiende Range / If-Range como un CDN"""
+
+    # Códigos de respuesta servidos, para comprobar qué camino se tomó
+    statuses = []
+    # Simula un servidor que responde 206 desde un byte distinto del pedido
+    misaligned = False
+
+    def do_GET(self):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        with open(path, 'rb') as f:
+            data = f.read()
+        etag = f'"{hashlib.sha256(data).hexdigest()[:16]}"'
+
+        start = 0
+        byte_range = self.headers.get('Range')
+        if_range = self.headers.get('If-Range')
+        if byte_range and (if_range is None or if_range == etag):
+            start = int(byte_range.split('=')[1].split('-')[0])
+            if RangeHandler.misaligned:
+                start //= 2
+        status = 206 if start else 200
+        RangeHandler.statuses.append(status)
+
+        self.send_response(status)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(data) - start))
+        if start:
+            self.send_header('Content-Range', f"bytes {start}-{len(data) - 1}/{len(data)}")
+        self.end_headers()
+        self.wfile.write(data[start:])
+
+
+def main():
+    if httpx is None:
+        print("⚠️ httpx no está instalado: no se puede comprobar el motor asíncrono")
+        return
+
+    failures = []
+
+    def check(name, ok):
+        print(f"   {'✅' if ok else '❌'} {name}")
+        if not ok:
+            failures.append(name)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        served = os.path.join(work_dir, "servidor")
+        output = os.path.join(work_dir, "salida")
+        os.makedirs(served)
+        os.makedirs(output)
+        originals = {}
+        for i in range(7):
+            name = f"pagina_{i + 1:03d}.jpg"
+            originals[name] = os.urandom(50_000 + i * 1000)
+            with open(os.path.join(served, name), 'wb') as f:
+                f.write(originals[name])
+
+        def same(name):
+            with open(os.path.join(output, name), 'rb') as f:
+                return f.read() == originals[name]
+
+        callback_threads = set()
+
+        def on_page(url, filepath):
+            callback_threads.add(threading.current_thread().name)
+
+        engine = AsyncDownloadEngine(max_in_flight=4, http2=False,
+                                     retry_policy=RetryPolicy(max_attempts=1))
+        try:
+            with LocalServer(served, RangeHandler) as server:
+                def download(names, priority=(0, 0)):
+                    jobs = [(f"{server.base_url}/{name}", os.path.join(output, name)) for name in names]
+                    return engine.submit_chapter(jobs, priority, on_page=on_page).result(timeout=60)
+
+                print("✅ Motor asíncrono contra servidor local")
+                results = download(list(originals)[:3])
+                check("descarga completa y contenido idéntico",
+                      all(results) and all(same(name) for name in list(originals)[:3]))
+                check("callbacks fuera del hilo del bucle de eventos",
+                      bool(callback_threads) and "descarga-async" not in callback_threads)
+
+                # .part válido: se reanuda con 206 y el resultado es el original
+                name = list(originals)[3]
+                part = os.path.join(output, name + '.part')
+                with open(part, 'wb') as f:
+                    f.write(originals[name][:20_000])
+                with open(part + PART_VALIDATOR_SUFFIX, 'w', encoding='utf-8') as f:
+                    f.write(f'"{hashlib.sha256(originals[name]).hexdigest()[:16]}"')
+                RangeHandler.statuses.clear()
+                download([name], 5)
+                check("reanudación con If-Range válido (206)", RangeHandler.statuses == [206] and same(name))
+
+                # .part de otra versión del archivo: el servidor envía 200 y se reescribe
+                name = list(originals)[4]
+                part = os.path.join(output, name + '.part')
+                with open(part, 'wb') as f:
+                    f.write(b'x' * 20_000)
+                with open(part + PART_VALIDATOR_SUFFIX, 'w', encoding='utf-8') as f:
+                    f.write('"version-anterior"')
+                RangeHandler.statuses.clear()
+                download([name])
+                check("If-Range obsoleto reescribe el archivo (200)", RangeHandler.statuses == [200] and same(name))
+
+                # .part sin validador: se descarta en lugar de reanudarse a ciegas
+                name = list(originals)[5]
+                with open(os.path.join(output, name + '.part'), 'wb') as f:
+                    f.write(b'x' * 20_000)
+                RangeHandler.statuses.clear()
+                download([name])
+                check(".part sin validador se descarga de nuevo", RangeHandler.statuses == [200] and same(name))
+
+                # 206 que no empieza donde acaba el .part: se descarta y se descarga entero
+                name = list(originals)[6]
+                part = os.path.join(output, name + '.part')
+                with open(part, 'wb') as f:
+                    f.write(originals[name][:20_000])
+                with open(part + PART_VALIDATOR_SUFFIX, 'w', encoding='utf-8') as f:
+                    f.write(f'"{hashlib.sha256(originals[name]).hexdigest()[:16]}"')
+                RangeHandler.statuses.clear()
+                RangeHandler.misaligned = True
+                try:
+                    first = download([name])
+                finally:
+                    RangeHandler.misaligned = False
+                second = download([name])
+                check("Content-Range desalineado reinicia la descarga",
+                      first == [None] and second[0] and RangeHandler.statuses == [206, 200] and same(name))
+                check("sin restos .part", not [f for f in os.listdir(output) if '.part' in f])
+        finally:
+            engine.close()
+
+    if failures:
+        print(f"❌ {len(failures)} comprobaciones fallidas")
+        sys.exit(1)
+    print("🎉 Todas las comprobaciones superadas")
+
+
+if __name__ == "__main__":
+    main()
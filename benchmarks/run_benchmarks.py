@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+⏱️ SUITE DE BENCHMARKS: CONVERSIÓN Y DESCARGA
+🔧 Mide las rutas críticas con datos sintéticos y guarda los resultados en JSON
+   para detectar regresiones entre versiones
+
+Uso:
+    python benchmarks/run_benchmarks.py                      # suite completa
+    python benchmarks/run_benchmarks.py --rapido             # tamaños pequeños
+    python benchmarks/run_benchmarks.py --filtro merge_pdfs  # solo algunos casos
+    python benchmarks/run_benchmarks.py --comparar benchmarks/resultados/anterior.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from PIL import Image
+from reportlab.pdfgen import canvas
+
+from manga_downloader_edge import EdgeMangaDownloader
+from pdf_converter import convert_images_to_pdf_simple
+from synthetic import LocalServer, make_chapter
+
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "resultados")
+
+# Un caso es más lento que la referencia si su mediana supera este margen
+DEFAULT_TOLERANCE = 0.10
+
+
+def make_pdfs(directory, count, pages_per_pdf=2):
+    """PDFs de capítulo pequeños para medir la combinación"""
+    os.makedirs(directory, exist_ok=True)
+    image = os.path.join(directory, "pagina.jpg")
+    Image.effect_noise((400, 600), 64).convert('RGB').save(image, quality=80)
+    files = []
+    for n in range(1, count + 1):
+        path = os.path.join(directory, f"capitulo_{n}.pdf")
+        c = canvas.Canvas(path, pagesize=(400, 600))
+        for page in range(pages_per_pdf):
+            c.drawImage(image, 0, 0, 400, 600)
+            c.drawString(20, 20, f"Capítulo {n} - página {page + 1}")
+            c.showPage()
+        c.save()
+        files.append(path)
+    return files
+
+
+def measure(func, repeat, setup=None):
+    """Ejecutar func `repeat` veces; setup (sin cronometrar) prepara cada ejecución"""
+    samples = []
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - start)
+    return {
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'max': max(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'repeat': repeat,
+    }
+
+
+def bench_images_to_pdf(work_dir, sizes, repeat):
+    downloader = EdgeMangaDownloader(download_dir=os.path.join(work_dir, "dl"))
+    try:
+        for fmt in ('webp', 'jpg'):
+            for pages in sizes:
+                files = make_chapter(os.path.join(work_dir, f"pdf_{fmt}_{pages}"), pages, 800, 1200, fmt)
+                output = os.path.join(work_dir, f"pdf_{fmt}_{pages}.pdf")
+                result = measure(lambda: downloader.images_to_pdf(files, output), repeat)
+                result['per_item'] = result['median'] / pages
+                yield f"images_to_pdf[{fmt}-{pages}]", result
+    finally:
+        downloader.cleanup()
+
+
+def bench_convert_simple(work_dir, sizes, repeat):
+    for pages in sizes:
+        files = [Path(f) for f in make_chapter(os.path.join(work_dir, f"simple_{pages}"), pages, 800, 1200, 'webp')]
+        output_dir = Path(work_dir) / f"simple_{pages}_pdf"
+        output_dir.mkdir(exist_ok=True)
+
+        def run():
+            # Silenciar la salida por página del conversor
+            with open(os.devnull, 'w') as devnull:
+                stdout, sys.stdout = sys.stdout, devnull
+                try:
+                    convert_images_to_pdf_simple(1, files, output_dir)
+                finally:
+                    sys.stdout = stdout
+
+        result = measure(run, repeat)
+        result['per_item'] = result['median'] / pages
+        yield f"convert_images_to_pdf_simple[webp-{pages}]", result
+
+
+def bench_merge_pdfs(work_dir, counts, repeat):
+    downloader = EdgeMangaDownloader(download_dir=os.path.join(work_dir, "dl"))
+    try:
+        for count in counts:
+            files = make_pdfs(os.path.join(work_dir, f"merge_{count}"), count)
+            output = os.path.join(work_dir, f"merge_{count}_completo.pdf")
+            # Reconstrucción completa en cada repetición (sin actualización incremental)
+            result = measure(lambda: downloader.merge_pdfs(files, output, incremental=False), repeat)
+            result['per_item'] = result['median'] / count
+            yield f"merge_pdfs[{count}]", result
+    finally:
+        downloader.cleanup()
+
+
+def bench_download_chapter(work_dir, sizes, repeat):
+    served = os.path.join(work_dir, "servidor")
+    for pages in sizes:
+        make_chapter(os.path.join(served, f"cap_{pages}"), pages, 800, 1200, 'webp')
+
+    with LocalServer(served) as server:
+        for engine in ('threads', 'async'):
+            for pages in sizes:
+                urls = [f"{server.base_url}/cap_{pages}/pagina_{i + 1:03d}.webp" for i in range(pages)]
+                state = {}
+
+                def setup():
+                    # Descargador y directorio nuevos: sin manifiesto ni caché HTTP previos
+                    if 'downloader' in state:
+                        state['downloader'].cleanup()
+                    run_dir = tempfile.mkdtemp(dir=work_dir)
+                    try:
+                        state['downloader'] = EdgeMangaDownloader(download_dir=run_dir, download_engine=engine)
+                    except ImportError:
+                        return None
+                    return state['downloader'], os.path.join(run_dir, "capitulo_1")
+
+                def run(downloader, chapter_dir):
+                    downloaded = downloader.download_chapter_images(chapter_dir, urls)
+                    if len(downloaded) != len(urls):
+                        raise RuntimeError(f"Descargadas {len(downloaded)}/{len(urls)} imágenes")
+
+                try:
+                    if setup() is None:
+                        print(f"   ⚠️ Motor {engine} no disponible, se omite")
+                        break
+                    result = measure(run, repeat, setup)
+                finally:
+                    if 'downloader' in state:
+                        state['downloader'].cleanup()
+                result['per_item'] = result['median'] / pages
+                yield f"download_chapter_images[{engine}-{pages}]", result
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocida"
+
+
+def compare(results, baseline_path, tolerance):
+    """Mostrar la variación frente a una ejecución anterior; devuelve las regresiones"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)['benchmarks']
+
+    regressions = []
+    print(f"\n📊 Comparación con {os.path.basename(baseline_path)} (margen {tolerance * 100:.0f}%)")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        change = result['median'] / baseline[name]['median'] - 1
+        marker = "❌" if change > tolerance else "✅"
+        print(f"   {marker} {name:45s} {change * 100:+7.1f}%")
+        if change > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de conversión y descarga")
+    parser.add_argument('--rapido', action='store_true', help="tamaños pequeños para una comprobación rápida")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--filtro', default='', help="ejecutar solo los casos cuyo nombre contenga este texto")
+    parser.add_argument('--salida', help="archivo JSON de resultados (por defecto benchmarks/resultados/)")
+    parser.add_argument('--comparar', help="JSON de una ejecución anterior para detectar regresiones")
+    parser.add_argument('--tolerancia', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    # Solo interesan los tiempos, no el registro de cada operación
+    logging.disable(logging.WARNING)
+
+    if args.rapido:
+        chapter_sizes, merge_counts, download_sizes = [10], [10, 50], [20]
+    else:
+        chapter_sizes, merge_counts, download_sizes = [10, 50], [10, 100, 500], [20, 100]
+
+    suites = [
+        ('images_to_pdf', bench_images_to_pdf, chapter_sizes),
+        ('convert_images_to_pdf_simple', bench_convert_simple, chapter_sizes),
+        ('merge_pdfs', bench_merge_pdfs, merge_counts),
+        ('download_chapter_images', bench_download_chapter, download_sizes),
+    ]
+
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix="bench_manga_")
+    cwd = os.getcwd()
+    try:
+        os.chdir(work_dir)
+        for suite_name, suite, sizes in suites:
+            if args.filtro and args.filtro not in suite_name:
+                continue
+            print(f"⏱️ {suite_name}")
+            for name, result in suite(work_dir, sizes, args.repeticiones):
+                results[name] = result
+                print(f"   {name:45s} {result['median'] * 1000:10.1f} ms "
+                      f"({result['per_item'] * 1000:.2f} ms/elemento)")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'revision': git_revision(),
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'cpus': os.cpu_count()},
+        'benchmarks': results,
+    }
+
+    output = args.salida
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{report['revision']}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+    print(f"\n💾 Resultados guardados en {output}")
+
+    if args.comparar:
+        regressions = compare(results, args.comparar, args.tolerancia)
+        if regressions:
+            print(f"❌ {len(regressions)} regresiones detectadas")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
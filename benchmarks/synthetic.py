@@ -0,0 +1,54 @@
+"""Datos sintéticos y servidor HTTP local compartidos por los benchmarks"""
+
+import functools
+import http.server
+import os
+import threading
+
+from PIL import Image
+
+
+def make_chapter(directory, pages, width, height, fmt, mixed_widths=True):
+    """Crear un capítulo sintético con imágenes de contenido variado
+
+    Con mixed_widths, una de cada siete páginas es algo más ancha, como en
+    los capítulos reales.
+    """
+    os.makedirs(directory, exist_ok=True)
+    files = []
+    noise = Image.effect_noise((width, height), 64).convert('RGB')
+    gradient = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    for i in range(pages):
+        img = Image.blend(gradient, noise, 0.3 + (i % 5) * 0.1)
+        if mixed_widths and i % 7 == 6:
+            img = img.resize((width + 40, height))
+        path = os.path.join(directory, f"pagina_{i + 1:03d}.{fmt}")
+        img.save(path, quality=90)
+        files.append(path)
+    return files
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalServer:
+    """Servidor HTTP local que sirve un directorio de imágenes"""
+
+    def __init__(self, directory, handler_class=None):
+        handler = functools.partial(handler_class or QuietHandler, directory=directory)
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
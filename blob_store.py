@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+🧱 ALMACÉN DE IMÁGENES POR CONTENIDO
+🔧 Cada imagen se guarda una sola vez en downloads/.blobs/ según su SHA-256;
+   las páginas y portadas de los títulos son enlaces duros (o reflinks) a ella
+
+Uso:
+    python blob_store.py deduplicar     # enlazar las imágenes ya descargadas
+    python blob_store.py purgar         # borrar las que ya no usa ningún título
+"""
+
+import argparse
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+from chapter_manifest import file_sha256
+
+# Carpeta del almacén dentro de la carpeta de descargas
+BLOB_DIR = ".blobs"
+
+# ioctl de Linux para clonar un archivo compartiendo bloques (Btrfs, XFS...)
+FICLONE = 0x40049409
+
+# Marca junto a un blob compartido por reflink: su número de enlaces no dice si se usa
+REFLINK_SUFFIX = ".reflink"
+
+
+def _reflink(src: str, dest: str) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(src, 'rb') as source, open(dest, 'wb') as target:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+        return True
+    except OSError:
+        try:
+            os.remove(dest)
+        except OSError:
+            pass
+        return False
+
+
+class BlobStore:
+    """Imágenes direccionadas por contenido, compartidas entre capítulos y títulos
+
+    Un archivo recién descargado se convierte en el blob de su hash o, si ese
+    contenido ya estaba, se sustituye por un enlace al blob existente. La URL
+    de cada imagen se anota en la biblioteca (tabla blob_urls), de modo que
+    una URL ya conocida se enlaza sin volver a descargarla.
+
+    Los archivos se reemplazan siempre con os.replace, nunca se reescriben en
+    su sitio, así que un enlace duro no puede modificar a los demás. Si el
+    sistema de archivos no admite enlaces duros ni reflinks el almacén se
+    desactiva y las imágenes se guardan como antes.
+    """
+
+    def __init__(self, root: str, library=None, logger: Optional[logging.Logger] = None):
+        self.root = root
+        self.library = library
+        self.logger = logger or logging.getLogger(__name__)
+        self.enabled = True
+        self._lock = threading.Lock()
+        # URL -> sha256 aún sin escribir en la biblioteca (ver flush)
+        self._pending: Dict[str, str] = {}
+        self.stats = {'linked': 0, 'stored': 0, 'duplicates': 0, 'bytes_saved': 0}
+
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def _place(self, src: str, dest: str, blob: str) -> bool:
+        """Dejar en `dest` un enlace duro (o reflink) a `src`, de forma atómica
+
+        Si hace falta un reflink se marca `blob`, para que purge no lo borre.
+        """
+        temp_path = f"{dest}.{os.getpid()}.{threading.get_ident()}.enlace"
+        try:
+            os.link(src, temp_path)
+        except OSError:
+            if not _reflink(src, temp_path):
+                return False
+            open(blob + REFLINK_SUFFIX, 'a').close()
+        os.replace(temp_path, dest)
+        return True
+
+    def lookup(self, url: str) -> Optional[str]:
+        """Hash del contenido ya guardado para esta URL, si el blob sigue en disco"""
+        with self._lock:
+            sha256 = self._pending.get(url)
+        if sha256 is None and self.library is not None:
+            sha256 = self.library.blob_for_url(url)
+        return sha256 if sha256 and os.path.exists(self.blob_path(sha256)) else None
+
+    def fetch(self, url: str, dest: str) -> Optional[str]:
+        """Enlazar en `dest` el contenido conocido de `url` sin descargarlo; devuelve su hash"""
+        sha256 = self.lookup(url) if self.enabled else None
+        if sha256 is None:
+            return None
+        blob = self.blob_path(sha256)
+        try:
+            if not (os.path.exists(dest) and os.path.samefile(dest, blob)):
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                if not self._place(blob, dest, blob):
+                    return None
+        except OSError as e:
+            self.logger.warning(f"No se pudo enlazar {os.path.basename(dest)} desde el almacén: {e}")
+            return None
+        with self._lock:
+            self.stats['linked'] += 1
+            self.stats['bytes_saved'] += os.path.getsize(blob)
+        return sha256
+
+    def ingest(self, path: str, url: Optional[str] = None) -> Optional[str]:
+        """Pasar un archivo descargado al almacén (o enlazarlo al blob igual); devuelve su hash"""
+        try:
+            sha256 = file_sha256(path)
+        except OSError as e:
+            self.logger.warning(f"No se pudo leer {os.path.basename(path)}: {e}")
+            return None
+        if not self.enabled:
+            return sha256
+
+        blob = self.blob_path(sha256)
+        try:
+            # El cerrojo evita que dos copias iguales creen a la vez el mismo blob
+            with self._lock:
+                if not os.path.exists(blob):
+                    os.makedirs(os.path.dirname(blob), exist_ok=True)
+                    if not self._place(path, blob, blob):
+                        self.enabled = False
+                        self.logger.warning("El sistema de archivos no admite enlaces duros ni reflinks; "
+                                            "se desactiva el almacén de imágenes")
+                        return sha256
+                    self.stats['stored'] += 1
+                elif not os.path.samefile(path, blob):
+                    size = os.path.getsize(path)
+                    if self._place(blob, path, blob):
+                        self.stats['duplicates'] += 1
+                        self.stats['bytes_saved'] += size
+                if url:
+                    self._pending[url] = sha256
+        except OSError as e:
+            self.logger.warning(f"No se pudo guardar {os.path.basename(path)} en el almacén: {e}")
+        return sha256
+
+    def flush(self):
+        """Escribir en la biblioteca las URL nuevas (una transacción)"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending and self.library is not None:
+            self.library.record_blob_urls(pending)
+
+    def deduplicate(self) -> dict:
+        """Pasar al almacén las páginas y portadas ya registradas en la biblioteca"""
+        for chapter in self.library.chapter_pages():
+            for path in chapter['files']:
+                if os.path.exists(path):
+                    self.ingest(path)
+        for title in self.library.titles():
+            if title['cover']:
+                cover = os.path.join(self.library.absolute(title['dir']), title['cover'])
+                if os.path.exists(cover):
+                    self.ingest(cover)
+        return dict(self.stats)
+
+    def purge(self) -> dict:
+        """Borrar los blobs sin ningún otro enlace (imágenes que ya no usa nadie)
+
+        Los blobs compartidos por reflink se conservan: sus copias son archivos
+        independientes y el número de enlaces no indica si siguen en uso.
+        """
+        removed = {'blobs': 0, 'bytes': 0, 'kept_reflinks': 0}
+        if not os.path.isdir(self.root):
+            return removed
+        for prefix in os.scandir(self.root):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                if entry.name.endswith(REFLINK_SUFFIX) or not entry.is_file():
+                    continue
+                if os.path.exists(entry.path + REFLINK_SUFFIX):
+                    removed['kept_reflinks'] += 1
+                    continue
+                # os.stat y no DirEntry.stat: en Windows este último da siempre st_nlink = 0
+                info = os.stat(entry.path)
+                if info.st_nlink == 1:
+                    os.remove(entry.path)
+                    removed['blobs'] += 1
+                    removed['bytes'] += info.st_size
+        return removed
+
+
+def main():
+    from library_store import open_library
+
+    parser = argparse.ArgumentParser(description="Almacén de imágenes por contenido")
+    parser.add_argument('accion', choices=('deduplicar', 'purgar'))
+    parser.add_argument('--directorio', default='downloads')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    library = open_library(args.directorio)
+    blobs = BlobStore(os.path.join(args.directorio, BLOB_DIR), library)
+    try:
+        if args.accion == 'deduplicar':
+            stats = blobs.deduplicate()
+            print(f"✅ {stats['stored']} imágenes únicas, {stats['duplicates']} duplicadas enlazadas "
+                  f"({stats['bytes_saved'] / (1024 * 1024):.1f} MB liberados)")
+        else:
+            removed = blobs.purge()
+            print(f"🗑️ {removed['blobs']} imágenes sin uso borradas ({removed['bytes'] / (1024 * 1024):.1f} MB)")
+            if removed['kept_reflinks']:
+                print(f"   {removed['kept_reflinks']} compartidas por reflink se conservan")
+    finally:
+        library.close()
+
+
+if __name__ == "__main__":
+    main()
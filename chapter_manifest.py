@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import List, Optional
+
+
+def file_sha256(path: str) -> str:
+    """Hash SHA-256 de un archivo leído por bloques"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def image_is_complete(path: str) -> bool:
+    """La imagen se decodifica entera (PIL falla con los archivos truncados)"""
+    from PIL import Image
+
+    try:
+        with Image.open(path) as image:
+            image.load()
+        return True
+    except Exception:
+        return False
+
+
+class ChapterManifest:
+    """Registro por capítulo de las páginas descargadas y de su PDF
+
+    Se guarda como manifest.json dentro de capitulo_N/ con la URL, tamaño,
+    hash y estado de cada página, para que una nueva ejecución salte lo que
+    ya está completo.
+    """
+
+    FILENAME = "manifest.json"
+    # Guardar como mucho una vez por segundo mientras se descargan páginas
+    SAVE_INTERVAL = 1.0
+
+    def __init__(self, chapter_dir: str):
+        self.chapter_dir = chapter_dir
+        self.path = os.path.join(chapter_dir, self.FILENAME)
+        self._lock = threading.RLock()
+        self._last_save = 0.0
+        self.data = {'version': 1, 'image_urls': [], 'pages': {}, 'pdf': None}
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.data.update(json.load(f))
+            except (OSError, ValueError):
+                # Manifiesto corrupto: se reconstruye desde cero
+                pass
+
+    @property
+    def image_urls(self) -> List[str]:
+        return list(self.data['image_urls'])
+
+    def set_image_urls(self, image_urls: List[str]):
+        with self._lock:
+            self.data['image_urls'] = list(image_urls)
+
+    def has_valid_page(self, filepath: str, url: str) -> bool:
+        """Comprobar si la página ya está descargada y coincide con el manifiesto"""
+        filename = os.path.basename(filepath)
+        if not os.path.exists(filepath):
+            return False
+
+        size = os.path.getsize(filepath)
+        with self._lock:
+            entry = self.data['pages'].get(filename)
+            if entry is None:
+                # Archivo de una ejecución anterior que no llegó a anotarse: solo vale
+                # si la imagen se decodifica entera (una caída puede dejarla truncada)
+                if size > 1000 and image_is_complete(filepath):
+                    self.record_page(filepath, url)
+                    return True
+                return False
+
+            return entry['status'] == 'complete' and entry['url'] == url and entry['size'] == size
+
+    def record_page(self, filepath: str, url: str, status: str = 'complete', sha256: Optional[str] = None):
+        """Anotar una página descargada (calcula su hash si no se indica)"""
+        filename = os.path.basename(filepath)
+        entry = {'url': url, 'status': status, 'size': 0, 'sha256': None}
+        if os.path.exists(filepath):
+            entry['size'] = os.path.getsize(filepath)
+            entry['sha256'] = sha256 or file_sha256(filepath)
+
+        with self._lock:
+            self.data['pages'][filename] = entry
+            if time.monotonic() - self._last_save >= self.SAVE_INTERVAL:
+                self.save()
+
+    def prune_pages(self, filenames: List[str]) -> int:
+        """Borrar las páginas (archivo y entrada) que no están en `filenames`
+
+        Un capítulo sustituido puede tener menos páginas o con otra extensión;
+        las sobrantes de la versión anterior no deben contar como suyas.
+        Devuelve cuántas páginas se han borrado.
+        """
+        keep = set(filenames)
+        removed = set()
+        with self._lock:
+            for filename in list(self.data['pages']):
+                if filename not in keep:
+                    del self.data['pages'][filename]
+                    removed.add(filename)
+            if os.path.isdir(self.chapter_dir):
+                for name in os.listdir(self.chapter_dir):
+                    # También los .part (y su validador) de páginas que ya no existen
+                    page = name.split('.part')[0]
+                    if name.startswith('pagina_') and page not in keep:
+                        try:
+                            os.remove(os.path.join(self.chapter_dir, name))
+                        except OSError:
+                            continue
+                        removed.add(page)
+            if removed:
+                self.save()
+        return len(removed)
+
+    def page_files(self) -> List[str]:
+        """Rutas de las páginas completas, en orden"""
+        with self._lock:
+            return sorted(
+                os.path.join(self.chapter_dir, filename)
+                for filename, entry in self.data['pages'].items()
+                if entry['status'] == 'complete'
+            )
+
+    def is_complete(self) -> bool:
+        """Todas las URLs conocidas tienen su página completa en disco"""
+        with self._lock:
+            urls = set(self.data['image_urls'])
+            if not urls:
+                return False
+
+            done = set()
+            for filename, entry in self.data['pages'].items():
+                filepath = os.path.join(self.chapter_dir, filename)
+                if (entry['status'] == 'complete' and os.path.exists(filepath)
+                        and os.path.getsize(filepath) == entry['size']):
+                    done.add(entry['url'])
+            return urls <= done
+
+    def inputs_digest(self, extra: str = "") -> str:
+        """Huella de las páginas que forman el PDF del capítulo"""
+        digest = hashlib.sha256(extra.encode('utf-8'))
+        with self._lock:
+            for filename in sorted(self.data['pages']):
+                entry = self.data['pages'][filename]
+                if entry['status'] == 'complete':
+                    digest.update(f"{filename}:{entry['sha256']}\n".encode('utf-8'))
+        return digest.hexdigest()
+
+    def record_pdf(self, pdf_path: str, extra: str = ""):
+        with self._lock:
+            self.data['pdf'] = {
+                'path': os.path.basename(pdf_path),
+                'size': os.path.getsize(pdf_path),
+                'inputs': self.inputs_digest(extra),
+            }
+            self.save()
+
+    def pdf_up_to_date(self, pdf_path: str, extra: str = "") -> bool:
+        """El PDF existe y se generó a partir de las mismas páginas"""
+        with self._lock:
+            pdf = self.data.get('pdf')
+            if not pdf or not os.path.exists(pdf_path):
+                return False
+            return (pdf['path'] == os.path.basename(pdf_path)
+                    and pdf['size'] == os.path.getsize(pdf_path)
+                    and pdf['inputs'] == self.inputs_digest(extra))
+
+    def save(self):
+        """Escritura atómica del manifiesto"""
+        with self._lock:
+            os.makedirs(self.chapter_dir, exist_ok=True)
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, ensure_ascii=False, indent=1)
+            os.replace(temp_path, self.path)
+            self._last_save = time.monotonic()
@@ -0,0 +1,241 @@
+import os
+import shutil
+import uuid
+import xml.etree.ElementTree as ET
+import zipfile
+from datetime import datetime, timezone
+from functools import partial
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional
+from xml.sax.saxutils import escape
+
+from PIL import Image
+
+from image_index import index_images
+
+IMAGE_MEDIA_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+}
+
+# Los archivos se guardan sin comprimir: las imágenes ya lo están
+STORED = zipfile.ZIP_STORED
+
+# Marcador de la página de portada en los volúmenes unificados
+COVER_BOOKMARK = "Portada"
+
+
+class ArchivePage(NamedTuple):
+    extension: str
+    open: Callable
+    width: int
+    height: int
+    # Título del capítulo que empieza en esta página (marcador / índice)
+    bookmark: Optional[str] = None
+
+
+def pages_from_files(image_files: List[str], bookmark: Optional[str] = None) -> Iterator[ArchivePage]:
+    """Páginas a partir de imágenes descargadas (dimensiones del índice, sin decodificar)"""
+    dimensions = index_images(image_files)
+    for image_file in image_files:
+        extension = os.path.splitext(image_file)[1].lower()
+        info = dimensions.get(image_file)
+        if info is None or extension not in IMAGE_MEDIA_TYPES:
+            continue
+        yield ArchivePage(extension, partial(open, image_file, 'rb'), info['width'], info['height'], bookmark)
+        bookmark = None
+
+
+def _archive_images(names: List[str]) -> List[str]:
+    return sorted(name for name in names
+                  if os.path.splitext(name)[1].lower() in IMAGE_MEDIA_TYPES
+                  and not name.startswith('META-INF/'))
+
+
+def pages_from_archive(archive_path: str, bookmark: Optional[str] = None) -> Iterator[ArchivePage]:
+    """Páginas de un CBZ o EPUB ya generado, en orden; se leen tal cual del zip"""
+    with zipfile.ZipFile(archive_path) as archive:
+        for name in _archive_images(archive.namelist()):
+            # Solo se lee la cabecera para conocer las dimensiones
+            with archive.open(name) as f, Image.open(f) as img:
+                width, height = img.size
+            yield ArchivePage(os.path.splitext(name)[1].lower(), partial(archive.open, name),
+                              width, height, bookmark)
+            bookmark = None
+
+
+def _copy_entry(archive: zipfile.ZipFile, name: str, page: ArchivePage) -> int:
+    info = zipfile.ZipInfo(name, date_time=datetime.now().timetuple()[:6])
+    info.compress_type = STORED
+    with page.open() as src, archive.open(info, 'w') as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    return info.file_size
+
+
+def _write_atomic(output_path: str, write: Callable[[zipfile.ZipFile], int]) -> int:
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        with zipfile.ZipFile(temp_path, 'w', STORED) as archive:
+            count = write(archive)
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return count
+
+
+def _comic_info(pages: List[dict], title: str, series: Optional[str], number) -> bytes:
+    root = ET.Element('ComicInfo', {
+        'xmlns:xsi': 'http://www.w3.org/2001/XMLSchema-instance',
+        'xmlns:xsd': 'http://www.w3.org/2001/XMLSchema',
+    })
+    ET.SubElement(root, 'Title').text = title
+    if series:
+        ET.SubElement(root, 'Series').text = series
+    if number is not None:
+        ET.SubElement(root, 'Number').text = str(number)
+    ET.SubElement(root, 'PageCount').text = str(len(pages))
+    ET.SubElement(root, 'Manga').text = 'Yes'
+    pages_element = ET.SubElement(root, 'Pages')
+    for page in pages:
+        ET.SubElement(pages_element, 'Page', {key: str(value) for key, value in page.items()})
+    return b'<?xml version="1.0" encoding="utf-8"?>\n' + ET.tostring(root, encoding='utf-8')
+
+
+def write_cbz(pages: Iterable[ArchivePage], output_path: str, title: str,
+              series: Optional[str] = None, number=None) -> int:
+    """CBZ sin compresión con ComicInfo.xml; las imágenes se copian byte a byte"""
+    def write(archive):
+        entries = []
+        for i, page in enumerate(pages):
+            size = _copy_entry(archive, f"{i + 1:04d}{page.extension}", page)
+            entry = {'Image': i, 'ImageWidth': page.width, 'ImageHeight': page.height, 'ImageSize': size}
+            if page.bookmark == COVER_BOOKMARK:
+                entry['Type'] = 'FrontCover'
+            elif page.bookmark:
+                entry['Bookmark'] = page.bookmark
+            entries.append(entry)
+        archive.writestr(zipfile.ZipInfo('ComicInfo.xml'), _comic_info(entries, title, series, number))
+        return len(entries)
+
+    return _write_atomic(output_path, write)
+
+
+CONTAINER_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>
+"""
+
+PAGE_XHTML = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml">
+<head>
+<title>{title}</title>
+<meta name="viewport" content="width={width}, height={height}"/>
+<style>html, body {{ margin: 0; padding: 0; }} img {{ display: block; width: {width}px; height: {height}px; }}</style>
+</head>
+<body><img src="images/{image}" alt=""/></body>
+</html>
+"""
+
+NAV_XHTML = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
+<head><title>{title}</title></head>
+<body>
+<nav epub:type="toc" id="toc"><ol>
+{items}
+</ol></nav>
+</body>
+</html>
+"""
+
+CONTENT_OPF = """<?xml version="1.0" encoding="UTF-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="bookid" prefix="rendition: http://www.idpf.org/vocab/rendition/#">
+<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+<dc:identifier id="bookid">urn:uuid:{uuid}</dc:identifier>
+<dc:title>{title}</dc:title>
+<dc:language>es</dc:language>
+<meta property="dcterms:modified">{modified}</meta>
+<meta property="rendition:layout">pre-paginated</meta>
+<meta property="rendition:spread">none</meta>
+{cover_meta}
+</metadata>
+<manifest>
+<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+{manifest}
+</manifest>
+<spine>
+{spine}
+</spine>
+</package>
+"""
+
+
+def write_epub(pages: Iterable[ArchivePage], output_path: str, title: str,
+               series: Optional[str] = None, number=None) -> int:
+    """EPUB 3 de maquetación fija: una página XHTML por imagen, imágenes sin recodificar"""
+    def write(archive):
+        # mimetype debe ser la primera entrada y sin comprimir
+        archive.writestr(zipfile.ZipInfo('mimetype'), 'application/epub+zip')
+        archive.writestr(zipfile.ZipInfo('META-INF/container.xml'), CONTAINER_XML)
+
+        manifest, spine, toc = [], [], []
+        for i, page in enumerate(pages):
+            image = f"{i + 1:04d}{page.extension}"
+            document = f"p{i + 1:04d}.xhtml"
+            _copy_entry(archive, f"OEBPS/images/{image}", page)
+            archive.writestr(zipfile.ZipInfo(f"OEBPS/{document}"), PAGE_XHTML.format(
+                title=escape(title), width=page.width, height=page.height, image=image))
+
+            properties = ' properties="cover-image"' if i == 0 else ''
+            manifest.append(f'<item id="img{i + 1}" href="images/{image}" '
+                            f'media-type="{IMAGE_MEDIA_TYPES[page.extension]}"{properties}/>')
+            manifest.append(f'<item id="p{i + 1}" href="{document}" media-type="application/xhtml+xml"/>')
+            spine.append(f'<itemref idref="p{i + 1}"/>')
+            if page.bookmark or i == 0:
+                toc.append(f'<li><a href="{document}">{escape(page.bookmark or title)}</a></li>')
+
+        full_title = f"{series} - {title}" if series and series != title else title
+        archive.writestr(zipfile.ZipInfo('OEBPS/nav.xhtml'), NAV_XHTML.format(
+            title=escape(full_title), items="\n".join(toc)))
+        archive.writestr(zipfile.ZipInfo('OEBPS/content.opf'), CONTENT_OPF.format(
+            uuid=uuid.uuid5(uuid.NAMESPACE_URL, f"{full_title}|{number}"),
+            title=escape(full_title),
+            modified=datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            cover_meta='<meta name="cover" content="img1"/>' if spine else '',
+            manifest="\n".join(manifest), spine="\n".join(spine)))
+        return len(spine)
+
+    return _write_atomic(output_path, write)
+
+
+WRITERS = {'cbz': write_cbz, 'epub': write_epub}
+
+
+def images_to_archive(image_files: List[str], output_path: str, output_format: str,
+                      title: str, series: Optional[str] = None, number=None) -> int:
+    """Empaquetar las imágenes de un capítulo tal cual; devuelve el número de páginas"""
+    return WRITERS[output_format](pages_from_files(image_files), output_path, title, series, number)
+
+
+def merge_archives(archive_files: List[str], output_path: str, output_format: str, title: str,
+                   cover_image: Optional[str] = None, bookmarks: Optional[List[str]] = None) -> int:
+    """Volumen unificado copiando las imágenes de los archivos de cada capítulo
+
+    Cada capítulo se marca con su título (o el nombre del archivo) para la
+    navegación del lector; la portada, si se indica, abre el volumen.
+    """
+    def pages():
+        if cover_image and os.path.exists(cover_image):
+            yield from pages_from_files([cover_image], COVER_BOOKMARK)
+        for i, archive_file in enumerate(archive_files):
+            bookmark = bookmarks[i] if bookmarks else os.path.splitext(os.path.basename(archive_file))[0]
+            yield from pages_from_archive(archive_file, bookmark)
+
+    return WRITERS[output_format](pages(), output_path, title, series=title)
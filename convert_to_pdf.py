@@ -1,22 +1,26 @@
 #!/usr/bin/env python3
 """
 📄 CONVERTIR IMÁGENES A PDF
-🔧 Convierte las imágenes descargadas a PDFs
+🔧 Convierte las imágenes descargadas a PDFs (o a CBZ / EPUB con --formato)
 """
 
+import argparse
 import os
 import logging
 from pathlib import Path
-from manga_downloader_edge import EdgeMangaDownloader
+from formats import OUTPUT_FORMATS
+from library_store import OUTPUT_DIRS, open_library
+from pdf_engine import PdfEngine
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def convert_chapters_to_pdf():
-    """Convertir capítulos descargados a PDF"""
+def convert_chapters_to_pdf(output_format="pdf"):
+    """Convertir capítulos descargados a PDF, CBZ o EPUB"""
     
-    print("📄 CONVERSOR DE IMÁGENES A PDF")
+    label = output_format.upper()
+    print(f"📄 CONVERSOR DE IMÁGENES A {label}")
     print("=" * 50)
     
     downloads_dir = Path("downloads")
@@ -25,71 +29,74 @@ def convert_chapters_to_pdf():
         print("❌ No existe el directorio downloads")
         return
     
-    # Buscar directorios de capítulos
-    chapter_dirs = list(downloads_dir.glob("capitulo_*"))
+    # Capítulos y páginas según la biblioteca (la primera vez se importa lo que hay en disco)
+    library = open_library(str(downloads_dir))
+    chapters = list(library.chapter_pages())
     
-    if not chapter_dirs:
+    if not chapters:
         print("❌ No se encontraron directorios de capítulos")
+        library.close()
         return
     
-    print(f"📁 Encontrados {len(chapter_dirs)} directorios de capítulos:")
-    for chapter_dir in sorted(chapter_dirs):
-        images = list(chapter_dir.glob("pagina_*.webp"))
-        print(f"   📖 {chapter_dir.name}: {len(images)} imágenes")
+    print(f"📁 Encontrados {len(chapters)} directorios de capítulos:")
+    for chapter in chapters:
+        print(f"   📖 {os.path.basename(chapter['chapter_dir'])}: {len(chapter['files'])} imágenes")
     
-    # Crear downloader
-    downloader = EdgeMangaDownloader()
-    
-    # Crear directorio de PDFs
-    pdf_dir = downloads_dir / "pdfs"
-    pdf_dir.mkdir(exist_ok=True)
+    # Motor de conversión (sin navegador: no carga Selenium)
+    engine = PdfEngine()
     
     converted = 0
-    for chapter_dir in sorted(chapter_dirs):
+    created_files = []
+    for chapter in chapters:
+        chapter_name = os.path.basename(chapter['chapter_dir'])
         try:
-            # Extraer número de capítulo
-            chapter_num = int(chapter_dir.name.split('_')[1])
-            
-            # Buscar imágenes
-            image_files = sorted(chapter_dir.glob("pagina_*.webp"))
-            
-            if not image_files:
-                print(f"⚠️ No hay imágenes en {chapter_dir.name}")
-                continue
+            chapter_num = int(chapter['number']) if chapter['number'].is_integer() else chapter['number']
+            image_paths = chapter['files']
             
-            print(f"\n📄 Convirtiendo capítulo {chapter_num} ({len(image_files)} imágenes)...")
+            print(f"\n📄 Convirtiendo capítulo {chapter_num} ({len(image_paths)} imágenes)...")
             
-            # Convertir paths a strings
-            image_paths = [str(img) for img in image_files]
+            # Cada título en su carpeta de salida (pdfs/, cbz/ o epub/)
+            output_dir = Path(chapter['title_dir']) / OUTPUT_DIRS[output_format]
+            output_dir.mkdir(exist_ok=True)
+            output_path = str(output_dir / f"{chapter_name}.{output_format}")
             
-            # Crear PDF usando el método del downloader
-            pdf_path = downloader.images_to_pdf(image_paths, chapter_num)
+            # Crear el archivo con el motor de conversión
+            if output_format == "pdf":
+                created = engine.images_to_pdf(image_paths, output_path)
+            else:
+                created = engine.images_to_archive(image_paths, output_path, output_format,
+                                                   f"Capítulo {chapter_num}", number=chapter_num)
             
-            if pdf_path:
-                print(f"✅ PDF creado: {pdf_path}")
+            if created:
+                library.record_artifact(chapter['title_id'], chapter['chapter_id'], output_format,
+                                        output_path, len(image_paths))
+                print(f"✅ {label} creado: {output_path}")
+                created_files.append(output_path)
                 converted += 1
             else:
-                print(f"❌ Error creando PDF para capítulo {chapter_num}")
+                print(f"❌ Error creando {label} para capítulo {chapter_num}")
                 
         except Exception as e:
-            print(f"❌ Error procesando {chapter_dir.name}: {e}")
+            print(f"❌ Error procesando {chapter_name}: {e}")
+    
+    engine.close()
+    library.close()
     
     print(f"\n{'='*50}")
     print(f"📊 RESUMEN:")
-    print(f"   📁 Directorios procesados: {len(chapter_dirs)}")
-    print(f"   ✅ PDFs creados: {converted}")
-    print(f"   ❌ Errores: {len(chapter_dirs) - converted}")
+    print(f"   📁 Directorios procesados: {len(chapters)}")
+    print(f"   ✅ {label} creados: {converted}")
+    print(f"   ❌ Errores: {len(chapters) - converted}")
     
     if converted > 0:
-        print(f"\n📁 PDFs guardados en: {pdf_dir}")
-        
-        # Listar PDFs creados
-        pdf_files = list(pdf_dir.glob("*.pdf"))
-        if pdf_files:
-            print(f"📄 Archivos PDF:")
-            for pdf_file in sorted(pdf_files):
-                size_mb = pdf_file.stat().st_size / (1024 * 1024)
-                print(f"   📖 {pdf_file.name} ({size_mb:.1f} MB)")
+        # Listar archivos creados
+        print(f"📄 Archivos {label}:")
+        for pdf_file in created_files:
+            size_mb = os.path.getsize(pdf_file) / (1024 * 1024)
+            print(f"   📖 {pdf_file} ({size_mb:.1f} MB)")
 
 if __name__ == "__main__":
-    convert_chapters_to_pdf()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Convertir capítulos descargados")
+    parser.add_argument('--formato', default='pdf', choices=OUTPUT_FORMATS,
+                        help="pdf, o cbz / epub para empaquetar las imágenes sin recodificar")
+    convert_chapters_to_pdf(parser.parse_args().formato)
\ No newline at end of file
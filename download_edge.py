@@ -15,12 +15,18 @@ Características ULTRA RÁPIDAS con Edge:
 ✅ Portada automática incluida
 
 Compatible con: bato.to y xbato.com
+
+Sin argumentos pregunta por un título; con --lote descarga sin preguntas todos
+los títulos de un archivo de cola (ver batch_download.py):
+
+    python download_edge.py --lote cola.txt --titulos-simultaneos 3
+    python download_edge.py --lote cola.txt --actualizar   # solo capítulos nuevos
 """
 
+import argparse
 import sys
-import os
-import time
-from manga_downloader_edge import EdgeMangaDownloader
+from formats import OUTPUT_FORMATS
+from manga_downloader_edge import EdgeMangaDownloader, configure_logging
 
 def print_banner():
     """Mostrar banner del programa"""
@@ -50,7 +56,7 @@ def validate_url(url):
     valid_domains = ['bato.to', 'xbato.com']
     return any(domain in url.lower() for domain in valid_domains)
 
-def main():
+def main(update=False):
     """Función principal"""
     try:
         print_banner()
@@ -89,6 +95,11 @@ def main():
                 start_chapter = 1
                 end_chapter = None
         
+        output_format = input("📦 Formato de salida (pdf/cbz/epub, Enter para pdf): ").strip().lower() or "pdf"
+        if output_format not in OUTPUT_FORMATS:
+            print("⚠️ Formato no válido, usando pdf")
+            output_format = "pdf"
+        
         # Mostrar información del manga
         print(f"\n🎌 Información del Manga")
         print("="*50)
@@ -101,6 +112,7 @@ def main():
             print(f"📖 Capítulos: {start_chapter} - {end_chapter}")
         else:
             print(f"📖 Capítulos: {start_chapter} en adelante")
+        print(f"📦 Formato: {output_format.upper()}")
         
         # Confirmar descarga
         print(f"\n🚀 Iniciando descarga con Microsoft Edge...")
@@ -112,7 +124,9 @@ def main():
             success = downloader.download_manga(
                 manga_url=manga_url,
                 start_chapter=start_chapter,
-                end_chapter=end_chapter
+                end_chapter=end_chapter,
+                output_format=output_format,
+                update=update
             )
             
             if success:
@@ -145,4 +159,17 @@ if __name__ == "__main__":
             except:
                 pass
     
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Descargador de mangas con Microsoft Edge")
+    parser.add_argument('--lote', metavar='COLA', help="archivo de cola: descarga por lotes sin preguntas")
+    parser.add_argument('--titulos-simultaneos', type=int, default=2)
+    parser.add_argument('--formato', default='pdf', choices=OUTPUT_FORMATS,
+                        help="formato de los títulos de la cola que no lo indican")
+    parser.add_argument('--actualizar', action='store_true',
+                        help="procesar solo los capítulos nuevos o cambiados (según la biblioteca de descargas)")
+    args = parser.parse_args()
+    
+    configure_logging()
+    if args.lote:
+        from batch_download import run_batch
+        sys.exit(run_batch(args.lote, args.titulos_simultaneos, args.formato, update=args.actualizar))
+    main(update=args.actualizar)
\ No newline at end of file
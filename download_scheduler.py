@@ -0,0 +1,193 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+
+class RetryLater(Exception):
+    """Lanzada por una tarea para volver a la cola tras `delay` segundos
+
+    Mientras espera, la tarea no ocupa ningún hilo de descarga.
+    """
+
+    def __init__(self, delay: float):
+        super().__init__(f"reintentar en {delay:.1f}s")
+        self.delay = delay
+
+
+def priority_key(priority) -> Tuple:
+    """Prioridad como tupla comparable: un número n equivale a (n,)
+
+    Los capítulos pueden usar números o tuplas (prioridad del título, índice);
+    normalizarlas evita comparar int con tuple dentro del heap.
+    """
+    if isinstance(priority, tuple):
+        return priority
+    if isinstance(priority, (int, float)):
+        return (priority,)
+    raise TypeError(f"Prioridad no válida: {priority!r}")
+
+
+class _Batch:
+    """Grupo de descargas (un capítulo) con su futuro de finalización"""
+
+    def __init__(self, size: int):
+        self.results: List[Any] = [None] * size
+        self.pending = size
+        self.future: Future = Future()
+
+
+class _Task:
+    def __init__(self, priority, seq: int, host: str, func: Callable[[], Any],
+                 batch: _Batch, index: int):
+        self.priority = priority_key(priority)
+        self.seq = seq
+        self.host = host
+        self.func = func
+        self.batch = batch
+        self.index = index
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class DownloadScheduler:
+    """Planificador global de descargas compartido por todos los capítulos
+
+    Un único conjunto de hilos atiende todas las descargas de la ejecución
+    (o de varios títulos). Limita la concurrencia total y por host, y da
+    prioridad a los capítulos con número de prioridad menor para que los
+    primeros capítulos terminen antes.
+    """
+
+    def __init__(self, max_workers: int = 8, per_host_limit: int = 8,
+                 logger: Optional[logging.Logger] = None):
+        self.max_workers = max(1, max_workers)
+        self.per_host_limit = max(1, per_host_limit)
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._cond = threading.Condition()
+        self._ready: List[_Task] = []
+        # Tareas aparcadas porque su host ya está al límite
+        self._host_waiting = defaultdict(list)
+        self._host_active = defaultdict(int)
+        # Reintentos en espera: (momento en que vuelven a estar listos, seq, tarea)
+        self._delayed = []
+        self._seq = itertools.count()
+        self._threads: List[threading.Thread] = []
+        self._shutdown = False
+
+    def _start_workers(self):
+        while len(self._threads) < self.max_workers:
+            thread = threading.Thread(target=self._worker, name=f"descarga-{len(self._threads)}",
+                                      daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def submit_chapter(self, jobs: List[Tuple[str, Callable[[], Any]]], priority=(0, 0)) -> Future:
+        """Encolar las descargas de un capítulo
+
+        jobs es una lista de (url, función). El futuro devuelto se resuelve con
+        la lista de resultados en el mismo orden que jobs. priority es un
+        número o una tupla (ver priority_key); menor = antes.
+        """
+        priority = priority_key(priority)
+        batch = _Batch(len(jobs))
+        if not jobs:
+            batch.future.set_result([])
+            return batch.future
+
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("El planificador de descargas está detenido")
+            for index, (url, func) in enumerate(jobs):
+                host = urlparse(url).netloc
+                task = _Task(priority, next(self._seq), host, func, batch, index)
+                heapq.heappush(self._ready, task)
+            self._start_workers()
+            self._cond.notify_all()
+
+        return batch.future
+
+    def _next_task(self) -> Optional[_Task]:
+        """Sacar la tarea más prioritaria cuyo host tenga hueco (con el lock tomado)"""
+        now = time.monotonic()
+        while self._delayed and self._delayed[0][0] <= now:
+            heapq.heappush(self._ready, heapq.heappop(self._delayed)[2])
+
+        while self._ready:
+            task = heapq.heappop(self._ready)
+            if self._host_active[task.host] < self.per_host_limit:
+                return task
+            heapq.heappush(self._host_waiting[task.host], task)
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                task = self._next_task()
+                while task is None:
+                    if self._delayed:
+                        self._cond.wait(max(0.0, self._delayed[0][0] - time.monotonic()))
+                    elif self._shutdown:
+                        return
+                    else:
+                        self._cond.wait()
+                    task = self._next_task()
+                self._host_active[task.host] += 1
+
+            try:
+                result = task.func()
+            except RetryLater as retry:
+                self._release_host(task)
+                with self._cond:
+                    ready_at = time.monotonic() + retry.delay
+                    heapq.heappush(self._delayed, (ready_at, next(self._seq), task))
+                    self._cond.notify()
+                continue
+            except Exception as e:
+                self.logger.error(f"Error en descarga programada: {str(e)}")
+                result = None
+
+            # Un fallo interno no debe matar el hilo ni dejar el capítulo esperando
+            try:
+                self._release_host(task)
+                self._finish(task, result)
+            except Exception as e:
+                self.logger.error(f"Error interno del planificador: {str(e)}")
+                if not task.batch.future.done():
+                    task.batch.future.set_exception(e)
+
+    def _release_host(self, task: _Task):
+        with self._cond:
+            self._host_active[task.host] -= 1
+            waiting = self._host_waiting[task.host]
+            if waiting:
+                heapq.heappush(self._ready, heapq.heappop(waiting))
+                self._cond.notify()
+
+    def _finish(self, task: _Task, result: Any):
+        done = None
+        with self._cond:
+            batch = task.batch
+            batch.results[task.index] = result
+            batch.pending -= 1
+            if batch.pending == 0:
+                done = batch
+
+        if done is not None:
+            done.future.set_result(done.results)
+
+    def shutdown(self, wait: bool = True):
+        """Detener los hilos una vez vaciada la cola"""
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
@@ -0,0 +1,170 @@
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+# Rutas conocidas de msedgedriver instalado con Edge en Windows
+SYSTEM_DRIVER_PATHS = [
+    r"C:\Program Files (x86)\Microsoft\Edge\Application\msedgedriver.exe",
+    r"C:\Program Files\Microsoft\Edge\Application\msedgedriver.exe",
+]
+
+_driver_path_lock = threading.Lock()
+_driver_path_cache = {}
+
+
+def resolve_edge_driver_path(logger: Optional[logging.Logger] = None) -> Optional[str]:
+    """Resolver la ruta de msedgedriver una sola vez por proceso"""
+    logger = logger or logging.getLogger(__name__)
+
+    with _driver_path_lock:
+        if 'path' in _driver_path_cache:
+            return _driver_path_cache['path']
+
+        path = os.environ.get('EDGE_DRIVER_PATH')
+        if path and os.path.exists(path):
+            logger.info("Usando driver de Edge indicado en EDGE_DRIVER_PATH")
+        else:
+            path = None
+            # Intentar con EdgeChromiumDriverManager primero, luego manual
+            try:
+                from webdriver_manager.microsoft import EdgeChromiumDriverManager
+                path = EdgeChromiumDriverManager().install()
+                logger.info("Driver descargado automáticamente")
+            except Exception:
+                # Fallback: usar Edge instalado en el sistema
+                for candidate in SYSTEM_DRIVER_PATHS:
+                    if os.path.exists(candidate):
+                        path = candidate
+                        logger.info("Usando driver de Edge del sistema")
+                        break
+                else:
+                    # Último recurso: Edge sin service específico
+                    logger.info("Intentando Edge sin service específico")
+
+        _driver_path_cache['path'] = path
+        return path
+
+
+class _PooledDriver:
+    """Driver vivo del pool con su contador de páginas servidas"""
+
+    def __init__(self, driver, slot: int):
+        self.driver = driver
+        self.slot = slot
+        self.uses = 0
+
+
+class EdgeDriverPool:
+    """Pool de navegadores Edge reutilizables durante toda la descarga"""
+
+    def __init__(self, factory: Callable[[int], object], size: int = 1,
+                 max_uses: int = 50, logger: Optional[logging.Logger] = None):
+        self.factory = factory
+        self.size = max(1, size)
+        self.max_uses = max_uses
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._idle: List[_PooledDriver] = []
+        # Cada driver vivo ocupa un slot (perfil de usuario propio)
+        self._free_slots = list(range(self.size))
+        self._closed = False
+
+        self.stats = {'created': 0, 'reused': 0, 'recycled': 0, 'discarded': 0}
+
+    def _is_healthy(self, pooled: _PooledDriver) -> bool:
+        """Comprobar que el navegador sigue respondiendo"""
+        try:
+            return pooled.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def _quit(self, pooled: _PooledDriver):
+        try:
+            pooled.driver.quit()
+        except Exception:
+            pass
+        with self._lock:
+            self._free_slots.append(pooled.slot)
+
+    def _create(self, slot: int) -> _PooledDriver:
+        try:
+            driver = self.factory(slot)
+        except Exception:
+            with self._lock:
+                self._free_slots.append(slot)
+            raise
+        with self._lock:
+            self.stats['created'] += 1
+        return _PooledDriver(driver, slot)
+
+    def acquire(self) -> _PooledDriver:
+        """Obtener un driver sano, creando uno nuevo si hace falta"""
+        if self._closed:
+            raise RuntimeError("El pool de drivers está cerrado")
+
+        self._slots.acquire()
+        try:
+            with self._lock:
+                pooled = self._idle.pop() if self._idle else None
+                slot = None if pooled else self._free_slots.pop(0)
+
+            if pooled is not None:
+                if self._is_healthy(pooled):
+                    with self._lock:
+                        self.stats['reused'] += 1
+                    return pooled
+                self.logger.warning("Driver de Edge sin respuesta, creando uno nuevo")
+                with self._lock:
+                    self.stats['discarded'] += 1
+                self._quit(pooled)
+                with self._lock:
+                    slot = self._free_slots.pop(0)
+
+            return self._create(slot)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, pooled: _PooledDriver, healthy: bool = True):
+        """Devolver un driver al pool o reciclarlo si ya sirvió suficientes páginas"""
+        pooled.uses += 1
+        try:
+            if not healthy or self._closed:
+                with self._lock:
+                    self.stats['discarded'] += 1
+                self._quit(pooled)
+            elif self.max_uses and pooled.uses >= self.max_uses:
+                self.logger.info(f"Reciclando driver de Edge tras {pooled.uses} páginas")
+                with self._lock:
+                    self.stats['recycled'] += 1
+                self._quit(pooled)
+            else:
+                with self._lock:
+                    self._idle.append(pooled)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def driver(self):
+        """Prestar un driver durante el bloque with"""
+        pooled = self.acquire()
+        healthy = True
+        try:
+            yield pooled.driver
+        except Exception:
+            healthy = self._is_healthy(pooled)
+            raise
+        finally:
+            self.release(pooled, healthy)
+
+    def close(self):
+        """Cerrar todos los navegadores inactivos del pool"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            self._quit(pooled)
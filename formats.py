@@ -0,0 +1,11 @@
+# Constantes de formato compartidas por las herramientas de conversión.
+# Sin dependencias: se importan al arrancar sin cargar PIL, reportlab ni Selenium
+
+# Formatos de salida disponibles además del PDF
+OUTPUT_FORMATS = ('pdf', 'cbz', 'epub')
+
+# Modos de codificación de las páginas que no pueden incrustarse tal cual:
+#   jpeg          JPEG calidad 95 (comportamiento original)
+#   near_lossless JPEG calidad 100 sin submuestreo de color (4:4:4)
+#   lossless      píxeles RGB sin pérdida (FlateDecode)
+PAGE_ENCODINGS = ('jpeg', 'near_lossless', 'lossless')
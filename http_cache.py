@@ -0,0 +1,226 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Mapping, Optional
+
+# Junto a cada descarga parcial (.part) se guarda el validador de su respuesta
+PART_VALIDATOR_SUFFIX = '.validador'
+
+
+def resume_validator(headers: Mapping[str, str]) -> Optional[str]:
+    """Validador válido para If-Range: un ETag fuerte o, si no, Last-Modified"""
+    etag = headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return headers.get('Last-Modified')
+
+
+def discard_part(part_path: str):
+    """Borrar una descarga parcial y su validador"""
+    for path in (part_path, part_path + PART_VALIDATOR_SUFFIX):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def resume_headers(part_path: str) -> Dict[str, str]:
+    """Cabeceras Range + If-Range para reanudar un .part
+
+    Sin validador no hay forma de saber si el archivo cambió en el servidor:
+    el .part se descarta y se devuelve {} para empezar de cero. Si el
+    validador ya no coincide el servidor responde 200 con el archivo entero.
+    """
+    if not os.path.exists(part_path):
+        return {}
+    try:
+        with open(part_path + PART_VALIDATOR_SUFFIX, 'r', encoding='utf-8') as f:
+            validator = f.read().strip()
+    except OSError:
+        validator = ''
+    size = os.path.getsize(part_path)
+    if not validator or not size:
+        discard_part(part_path)
+        return {}
+    return {'Range': f'bytes={size}-', 'If-Range': validator}
+
+
+def content_range_start(headers: Mapping[str, str]) -> Optional[int]:
+    """Primer byte de una respuesta 206 según Content-Range ('bytes 100-199/200')"""
+    value = headers.get('Content-Range', '')
+    unit, _, byte_range = value.partition(' ')
+    start = byte_range.split('-')[0]
+    if unit.strip().lower() != 'bytes' or not start.isdigit():
+        return None
+    return int(start)
+
+
+def save_part_validator(part_path: str, headers: Mapping[str, str]):
+    """Guardar el validador de una respuesta completa antes de volcarla al .part"""
+    validator = resume_validator(headers)
+    path = part_path + PART_VALIDATOR_SUFFIX
+    if validator:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(validator)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+class HttpValidatorCache:
+    """Caché en disco de validadores HTTP (ETag / Last-Modified) por URL
+
+    Guarda, para cada URL descargada, sus validadores y el archivo local al
+    que corresponden. Con ellos se envían peticiones condicionales y una
+    respuesta 304 se trata como acierto contra el archivo local. Cuando el
+    índice supera max_bytes (tamaño aproximado en disco) se expulsan las
+    entradas usadas hace más tiempo.
+
+    Los hilos de descarga solo tocan la memoria: un hilo aparte escribe el
+    índice cada SAVE_INTERVAL segundos si ha cambiado, y close() hace la
+    escritura final.
+    """
+
+    SAVE_INTERVAL = 5.0
+    # Separadores y nombres de campo de cada entrada en el JSON
+    ENTRY_OVERHEAD = 80
+
+    def __init__(self, path: str, max_bytes: int = 4 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max(1, max_bytes)
+        self._lock = threading.Lock()
+        # Una sola escritura a la vez; no bloquea las consultas
+        self._save_lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._stop_flusher = threading.Event()
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._bytes = 0
+        self._dirty = False
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entries = json.load(f)
+                # Se guardan en orden de uso, del más antiguo al más reciente
+                for url, entry in entries.items():
+                    self._entries[url] = entry
+                    self._bytes += self._entry_size(url, entry)
+                self._evict()
+            except (OSError, ValueError):
+                pass
+
+    def _entry_size(self, url: str, entry: dict) -> int:
+        return (len(url) + len(entry['path']) + len(entry.get('etag') or '')
+                + len(entry.get('last_modified') or '') + self.ENTRY_OVERHEAD)
+
+    def _evict(self):
+        """Expulsar las entradas más antiguas hasta caber en max_bytes (con el lock tomado)"""
+        while self._bytes > self.max_bytes and self._entries:
+            url, entry = self._entries.popitem(last=False)
+            self._bytes -= self._entry_size(url, entry)
+            self.stats['evictions'] += 1
+
+    def conditional_headers(self, url: str, filepath: str) -> Dict[str, str]:
+        """Cabeceras If-None-Match / If-Modified-Since si el archivo local sigue intacto"""
+        with self._lock:
+            entry = self._entries.get(url)
+        if not entry or entry['path'] != os.path.abspath(filepath):
+            return {}
+        if not os.path.exists(filepath) or os.path.getsize(filepath) != entry['size']:
+            return {}
+
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def record_hit(self, url: str):
+        """Anotar una respuesta 304"""
+        with self._lock:
+            self.stats['hits'] += 1
+            if url in self._entries:
+                self._entries.move_to_end(url)
+                self._dirty = True
+        self._start_flusher()
+
+    def store(self, url: str, filepath: str, headers: Mapping[str, str]):
+        """Guardar los validadores de una respuesta 200 completa"""
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+
+        with self._lock:
+            self.stats['misses'] += 1
+            if not etag and not last_modified:
+                return
+            previous = self._entries.get(url)
+            if previous is not None:
+                self._bytes -= self._entry_size(url, previous)
+            entry = {
+                'path': os.path.abspath(filepath),
+                'size': os.path.getsize(filepath),
+                'etag': etag,
+                'last_modified': last_modified,
+            }
+            self._entries[url] = entry
+            self._entries.move_to_end(url)
+            self._bytes += self._entry_size(url, entry)
+            self.stats['stores'] += 1
+            self._evict()
+            self._dirty = True
+        self._start_flusher()
+
+    def _start_flusher(self):
+        """Arrancar (una vez) el hilo que guarda el índice en segundo plano"""
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is not None or self._stop_flusher.is_set():
+                return
+
+            def flush():
+                while not self._stop_flusher.wait(self.SAVE_INTERVAL):
+                    try:
+                        self.save()
+                    except OSError:
+                        # Se reintenta en la siguiente vuelta y en close()
+                        pass
+
+            self._flusher = threading.Thread(target=flush, name="cache-http", daemon=True)
+            self._flusher.start()
+
+    def close(self):
+        """Detener el guardado en segundo plano y escribir el índice"""
+        self._stop_flusher.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self.save()
+
+    def save(self):
+        """Escritura atómica del índice en disco
+
+        Bajo el lock solo se copia la lista de entradas (las entradas no se
+        modifican, se sustituyen); la serialización y la escritura se hacen
+        fuera para no bloquear a los hilos de descarga.
+        """
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                entries = dict(self._entries)
+                self._dirty = False
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(entries, f)
+                os.replace(temp_path, self.path)
+            except OSError:
+                with self._lock:
+                    self._dirty = True
+                raise
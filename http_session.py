@@ -0,0 +1,64 @@
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Códigos HTTP transitorios que merece la pena reintentar
+RETRY_STATUSES = (408, 425, 429, 500, 502, 503, 504)
+
+
+def create_session(pool_size: int = 8, headers: Optional[Dict[str, str]] = None,
+                   host_pools: int = 20) -> requests.Session:
+    """Crear una Session con pools de conexiones dimensionados a los hilos de descarga"""
+    session = requests.Session()
+    # Los reintentos los gestiona RetryPolicy para no bloquear hilos de descarga
+    adapter = HTTPAdapter(pool_connections=host_pools, pool_maxsize=pool_size, max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Convertir la cabecera Retry-After (segundos o fecha HTTP) en segundos de espera"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Política de reintentos con espera exponencial y jitter"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 1.0, max_delay: float = 30.0,
+                 max_retry_after: float = 300.0, retry_statuses=RETRY_STATUSES):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.retry_statuses = set(retry_statuses)
+
+    def should_retry(self, attempt: int, status_code: Optional[int] = None) -> bool:
+        """Decidir si el intento número attempt (desde 0) admite otro más"""
+        if attempt + 1 >= self.max_attempts:
+            return False
+        # Sin código HTTP es un fallo de red o un archivo incompleto
+        return status_code is None or status_code in self.retry_statuses
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Segundos de espera antes del siguiente intento ("full jitter")"""
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        server_delay = parse_retry_after(retry_after)
+        if server_delay is not None:
+            # El servidor manda: nunca reintentar antes de lo que pide
+            return min(self.max_retry_after, max(server_delay, backoff))
+        return backoff
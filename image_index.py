@@ -0,0 +1,90 @@
+import json
+import os
+import threading
+from typing import Dict, List, Tuple
+
+from PIL import Image
+
+INDEX_FILENAME = ".dimensiones.json"
+
+
+def probe_image(path: str) -> dict:
+    """Leer solo la cabecera de la imagen: dimensiones, formato y modo"""
+    # Image.open es perezoso: no decodifica píxeles hasta que se piden
+    with Image.open(path) as img:
+        return {'width': img.width, 'height': img.height, 'format': img.format, 'mode': img.mode}
+
+
+def page_size(info: dict, target_width: int) -> Tuple[int, int]:
+    """Tamaño de página al escalar la imagen al ancho objetivo"""
+    if info['width'] == target_width:
+        return target_width, info['height']
+    return target_width, int(info['height'] * target_width / info['width'])
+
+
+class DimensionIndex:
+    """Índice de dimensiones de las imágenes de un directorio
+
+    Se guarda junto a las imágenes descargadas; cada entrada se invalida si
+    cambian el tamaño o la fecha de modificación del archivo.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.path = os.path.join(directory, INDEX_FILENAME)
+        self._entries: Dict[str, dict] = {}
+        self._dirty = False
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+
+    def get(self, image_path: str) -> dict:
+        filename = os.path.basename(image_path)
+        stat = os.stat(image_path)
+        entry = self._entries.get(filename)
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            return entry
+
+        entry = probe_image(image_path)
+        entry.update(size=stat.st_size, mtime=stat.st_mtime_ns)
+        self._entries[filename] = entry
+        self._dirty = True
+        return entry
+
+    def save(self):
+        if not self._dirty:
+            return
+        temp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+            os.replace(temp_path, self.path)
+            self._dirty = False
+        except OSError:
+            # El índice es solo una caché; sin permisos de escritura se recalcula
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+def index_images(image_paths: List[str]) -> Dict[str, dict]:
+    """Dimensiones de cada imagen usando (y actualizando) el índice de su directorio"""
+    indexes: Dict[str, DimensionIndex] = {}
+    result = {}
+    for image_path in image_paths:
+        directory = os.path.dirname(os.path.abspath(image_path))
+        index = indexes.get(directory)
+        if index is None:
+            index = indexes[directory] = DimensionIndex(directory)
+        try:
+            result[image_path] = index.get(image_path)
+        except Exception:
+            # Imagen ilegible: se omite igual que antes
+            continue
+
+    for index in indexes.values():
+        index.save()
+    return result
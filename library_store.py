@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+🗄️ ESTADO DE LA BIBLIOTECA (SQLite)
+🔧 Títulos, capítulos, páginas y archivos generados en una base de datos única
+   (downloads/biblioteca.sqlite3) que consultan todas las herramientas
+
+Uso:
+    python library_store.py estado                 # resumen por título
+    python library_store.py estado 141482-demon    # solo los títulos que contienen el texto
+    python library_store.py reindexar              # importar lo que ya hay en disco
+    python library_store.py reindexar --nuevos     # solo títulos y capítulos aún no registrados
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from chapter_manifest import ChapterManifest
+
+LIBRARY_NAME = "biblioteca.sqlite3"
+
+# Extensiones de página que reconocen las herramientas (no solo WebP)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+
+# Carpetas de salida por formato dentro de la carpeta del título
+OUTPUT_DIRS = {'pdf': 'pdfs', 'cbz': 'cbz', 'epub': 'epub'}
+
+# Las rutas se guardan relativas a la carpeta de descargas para poder moverla.
+# chapter_id = 0 en artifacts identifica el archivo unificado del título;
+# blob_urls asocia cada URL descargada con su contenido en el almacén de blobs
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS titles (
+    id INTEGER PRIMARY KEY,
+    slug TEXT NOT NULL UNIQUE,
+    dir TEXT NOT NULL,
+    url TEXT,
+    name TEXT,
+    cover TEXT,
+    checked REAL
+);
+CREATE TABLE IF NOT EXISTS chapters (
+    id INTEGER PRIMARY KEY,
+    title_id INTEGER NOT NULL REFERENCES titles(id) ON DELETE CASCADE,
+    number REAL NOT NULL,
+    name TEXT,
+    url TEXT,
+    dir TEXT NOT NULL,
+    updated REAL,
+    -- Agregados de sus páginas, mantenidos por replace_pages para consultas rápidas
+    pages INTEGER NOT NULL DEFAULT 0,
+    missing INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (title_id, number)
+);
+CREATE TABLE IF NOT EXISTS pages (
+    chapter_id INTEGER NOT NULL REFERENCES chapters(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    file TEXT NOT NULL,
+    url TEXT,
+    size INTEGER,
+    sha256 TEXT,
+    width INTEGER,
+    height INTEGER,
+    status TEXT NOT NULL,
+    PRIMARY KEY (chapter_id, idx)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS pages_sha256 ON pages (sha256);
+CREATE TABLE IF NOT EXISTS artifacts (
+    title_id INTEGER NOT NULL REFERENCES titles(id) ON DELETE CASCADE,
+    chapter_id INTEGER NOT NULL,
+    format TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER,
+    pages INTEGER,
+    updated REAL,
+    PRIMARY KEY (title_id, format, chapter_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS blob_urls (
+    url TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class LibraryStore:
+    """Estado de la biblioteca en SQLite
+
+    Una sola conexión compartida por los hilos del proceso (protegida con un
+    cerrojo) y modo WAL para que las consultas de estado de otros procesos no
+    bloqueen una descarga en curso. Las páginas se escriben por capítulo en
+    una única transacción.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.root = os.path.dirname(os.path.abspath(path))
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+
+    @contextmanager
+    def transaction(self):
+        with self._lock, self._conn:
+            yield self._conn
+
+    def _query(self, sql: str, params=()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def relative(self, path: str) -> str:
+        return os.path.relpath(os.path.abspath(path), self.root)
+
+    def absolute(self, path: str) -> str:
+        return os.path.normpath(os.path.join(self.root, path))
+
+    # Títulos
+
+    def upsert_title(self, slug: str, title_dir: str, url: Optional[str] = None,
+                     name: Optional[str] = None, cover: Optional[str] = None,
+                     checked: Optional[float] = None) -> int:
+        """Crear o actualizar un título (los campos None conservan su valor)"""
+        with self.transaction() as conn:
+            conn.execute("""
+                INSERT INTO titles (slug, dir, url, name, cover, checked) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (slug) DO UPDATE SET
+                    dir = excluded.dir,
+                    url = COALESCE(excluded.url, url),
+                    name = COALESCE(excluded.name, name),
+                    cover = COALESCE(excluded.cover, cover),
+                    checked = COALESCE(excluded.checked, checked)
+            """, (slug, self.relative(title_dir), url, name, cover, checked))
+            return conn.execute("SELECT id FROM titles WHERE slug = ?", (slug,)).fetchone()[0]
+
+    def title(self, slug: str) -> Optional[dict]:
+        rows = self._query("SELECT * FROM titles WHERE slug = ?", (slug,))
+        return dict(rows[0]) if rows else None
+
+    def is_empty(self) -> bool:
+        return not self._query("SELECT 1 FROM titles LIMIT 1")
+
+    def titles(self, pattern: str = "") -> List[dict]:
+        return [dict(row) for row in self._query(
+            "SELECT * FROM titles WHERE slug LIKE ? ORDER BY slug", (f"%{pattern}%",))]
+
+    # Capítulos y páginas
+
+    def upsert_chapter(self, title_id: int, number: float, name: Optional[str], url: Optional[str],
+                       chapter_dir: str) -> int:
+        with self.transaction() as conn:
+            conn.execute("""
+                INSERT INTO chapters (title_id, number, name, url, dir, updated) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (title_id, number) DO UPDATE SET
+                    name = COALESCE(excluded.name, name),
+                    url = COALESCE(excluded.url, url),
+                    dir = excluded.dir,
+                    updated = excluded.updated
+            """, (title_id, float(number), name, url, self.relative(chapter_dir), time.time()))
+            return conn.execute("SELECT id FROM chapters WHERE title_id = ? AND number = ?",
+                                (title_id, float(number))).fetchone()[0]
+
+    def chapters(self, title_id: int) -> List[dict]:
+        return [dict(row) for row in self._query(
+            "SELECT * FROM chapters WHERE title_id = ? ORDER BY number", (title_id,))]
+
+    def replace_pages(self, chapter_id: int, pages: List[dict]):
+        """Sustituir las páginas de un capítulo (una transacción por capítulo)"""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM pages WHERE chapter_id = ?", (chapter_id,))
+            conn.executemany("""
+                INSERT INTO pages (chapter_id, idx, file, url, size, sha256, width, height, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(chapter_id, i, page['file'], page.get('url'), page.get('size'), page.get('sha256'),
+                   page.get('width'), page.get('height'), page.get('status', 'complete'))
+                  for i, page in enumerate(pages)])
+            conn.execute("UPDATE chapters SET pages = ?, missing = ?, bytes = ? WHERE id = ?", (
+                len(pages),
+                sum(1 for page in pages if page.get('status', 'complete') != 'complete'),
+                sum(page.get('size') or 0 for page in pages),
+                chapter_id))
+
+    def chapter_pages(self, slug: str = "") -> Iterator[dict]:
+        """Capítulos con sus páginas completas en disco, por título y número
+
+        Se consulta título a título (memoria acotada aunque la biblioteca tenga
+        millones de páginas), en el orden del índice (capítulo, página); cada
+        capítulo se entrega con 'files' en el orden de lectura.
+        """
+        for title in self.titles(slug):
+            rows = self._query("""
+                SELECT c.id AS chapter_id, c.number, c.name, c.url, c.dir, p.file
+                FROM chapters c
+                JOIN pages p ON p.chapter_id = c.id AND p.status = 'complete'
+                WHERE c.title_id = ?
+                ORDER BY c.number, p.idx
+            """, (title['id'],))
+
+            chapter = None
+            for row in rows:
+                if chapter is None or chapter['chapter_id'] != row['chapter_id']:
+                    if chapter is not None:
+                        yield chapter
+                    chapter = {key: row[key] for key in ('chapter_id', 'number', 'name', 'url')}
+                    chapter.update(title_id=title['id'], slug=title['slug'], title_name=title['name'],
+                                   title_dir=self.absolute(title['dir']), chapter_dir=self.absolute(row['dir']),
+                                   files=[])
+                chapter['files'].append(os.path.join(chapter['chapter_dir'], row['file']))
+            if chapter is not None:
+                yield chapter
+
+    # Archivos generados (PDF / CBZ / EPUB por capítulo y unificados)
+
+    def record_artifact(self, title_id: int, chapter_id: Optional[int], output_format: str,
+                        path: str, pages: Optional[int] = None):
+        with self.transaction() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO artifacts (title_id, chapter_id, format, path, size, pages, updated)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (title_id, chapter_id or 0, output_format, self.relative(path),
+                  os.path.getsize(path) if os.path.exists(path) else None, pages, time.time()))
+
+    def clear_artifacts(self, chapter_id: int):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM artifacts WHERE chapter_id = ?", (chapter_id,))
+
+    def artifacts(self, title_id: int, output_format: str) -> List[dict]:
+        """Archivos por capítulo de un formato, ordenados por número de capítulo"""
+        rows = self._query("""
+            SELECT c.id AS chapter_id, c.number, c.name, c.url, a.path, a.size, a.pages
+            FROM artifacts a JOIN chapters c ON c.id = a.chapter_id
+            WHERE a.title_id = ? AND a.format = ?
+            ORDER BY c.number
+        """, (title_id, output_format))
+        return [dict(row, path=self.absolute(row['path'])) for row in rows]
+
+    # Contenido por URL (ver BlobStore)
+
+    def blob_for_url(self, url: str) -> Optional[str]:
+        rows = self._query("SELECT sha256 FROM blob_urls WHERE url = ?", (url,))
+        return rows[0][0] if rows else None
+
+    def record_blob_urls(self, entries: Dict[str, str]):
+        """Anotar varias URL -> sha256 en una transacción"""
+        with self.transaction() as conn:
+            conn.executemany("INSERT OR REPLACE INTO blob_urls (url, sha256) VALUES (?, ?)", entries.items())
+
+    # Consultas de estado
+
+    def status(self, pattern: str = "") -> List[dict]:
+        """Resumen por título: capítulos, páginas, bytes y archivos generados por formato"""
+        # Solo se recorren títulos y capítulos: las páginas ya están agregadas por capítulo
+        rows = self._query("""
+            SELECT t.slug, t.url, t.checked,
+                   COUNT(c.id) AS chapters,
+                   COALESCE(SUM(c.pages), 0) AS pages,
+                   COALESCE(SUM(c.missing), 0) AS missing_pages,
+                   COALESCE(SUM(c.bytes), 0) AS bytes
+            FROM titles t
+            LEFT JOIN chapters c ON c.title_id = t.id
+            WHERE t.slug LIKE ?
+            GROUP BY t.id
+            ORDER BY t.slug
+        """, (f"%{pattern}%",))
+        artifacts: Dict[str, Dict[str, dict]] = {}
+        for row in self._query("""
+            SELECT t.slug, a.format, SUM(a.chapter_id != 0) AS chapters, MAX(a.chapter_id = 0) AS unified,
+                   SUM(a.size) AS bytes
+            FROM artifacts a JOIN titles t ON t.id = a.title_id
+            WHERE t.slug LIKE ?
+            GROUP BY t.slug, a.format
+        """, (f"%{pattern}%",)):
+            artifacts.setdefault(row['slug'], {})[row['format']] = {
+                'chapters': row['chapters'], 'unified': bool(row['unified']), 'bytes': row['bytes'] or 0}
+        return [dict(row, artifacts=artifacts.get(row['slug'], {})) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # Importación desde disco (bibliotecas anteriores al almacén)
+
+    def import_title(self, title_dir: str, slug: Optional[str] = None, only_new: bool = False) -> int:
+        """Registrar un título a partir de sus carpetas: capitulo_N/, manifiestos y salidas
+
+        Con only_new, un título ya registrado solo añade las carpetas de
+        capítulo que la biblioteca no conoce (descargas interrumpidas,
+        carpetas copiadas a mano).
+        """
+        from title_record import LEGACY_FILENAME
+
+        slug = slug or os.path.basename(os.path.abspath(title_dir))
+        existing = self.title(slug) if only_new else None
+        legacy = {}
+        legacy_path = os.path.join(title_dir, LEGACY_FILENAME)
+        if existing is None and os.path.exists(legacy_path):
+            try:
+                with open(legacy_path, 'r', encoding='utf-8') as f:
+                    legacy = json.load(f)
+            except (OSError, ValueError):
+                legacy = {}
+        if existing is not None:
+            title_id = existing['id']
+        else:
+            title_id = self.upsert_title(slug, title_dir, url=legacy.get('url'), cover=legacy.get('cover'),
+                                         checked=legacy.get('checked'))
+        known = legacy.get('chapters', {})
+        known_dirs = {chapter['dir'] for chapter in self.chapters(title_id)} if existing is not None else set()
+
+        for entry in sorted(os.scandir(title_dir), key=lambda entry: entry.name):
+            if not entry.is_dir() or not entry.name.startswith('capitulo_'):
+                continue
+            if self.relative(entry.path) in known_dirs:
+                continue
+            try:
+                number = float(entry.name[len('capitulo_'):])
+            except ValueError:
+                continue
+            info = known.get(str(number), {})
+            chapter_id = self.upsert_chapter(title_id, number, info.get('title'), info.get('url'), entry.path)
+            self.replace_pages(chapter_id, chapter_page_rows(entry.path))
+            for output_format, output_dir in OUTPUT_DIRS.items():
+                output = os.path.join(title_dir, output_dir, f"{entry.name}.{output_format}")
+                if os.path.exists(output):
+                    self.record_artifact(title_id, chapter_id, output_format, output)
+
+        for output_format in OUTPUT_DIRS:
+            unified = os.path.join(title_dir, f"{slug}_completo.{output_format}")
+            if os.path.exists(unified):
+                self.record_artifact(title_id, None, output_format, unified)
+        return title_id
+
+
+def chapter_page_rows(chapter_dir: str) -> List[dict]:
+    """Páginas de un capítulo según su manifiesto y el índice de dimensiones
+
+    Las imágenes sin entrada en el manifiesto (descargas antiguas) se
+    registran igualmente si están en disco, sea cual sea su formato.
+    """
+    from image_index import INDEX_FILENAME
+
+    manifest = ChapterManifest(chapter_dir).data['pages']
+    dimensions = {}
+    try:
+        with open(os.path.join(chapter_dir, INDEX_FILENAME), 'r', encoding='utf-8') as f:
+            dimensions = json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    files = set(manifest)
+    files.update(name for name in os.listdir(chapter_dir)
+                 if name.startswith('pagina_') and os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS)
+    rows = []
+    for name in sorted(files):
+        entry = manifest.get(name, {})
+        path = os.path.join(chapter_dir, name)
+        exists = os.path.exists(path)
+        size = os.path.getsize(path) if exists else entry.get('size')
+        status = entry.get('status', 'complete') if exists else 'missing'
+        dims = dimensions.get(name, {})
+        rows.append({'file': name, 'url': entry.get('url'), 'size': size, 'sha256': entry.get('sha256'),
+                     'width': dims.get('width'), 'height': dims.get('height'), 'status': status})
+    return rows
+
+
+def title_dirs(download_dir: str) -> Iterator[str]:
+    """Carpetas de título: las que contienen capitulo_N/ (incluida la propia raíz, formato antiguo)"""
+    def has_chapters(directory):
+        return any(entry.is_dir() and entry.name.startswith('capitulo_') for entry in os.scandir(directory))
+
+    if has_chapters(download_dir):
+        yield download_dir
+    for entry in sorted(os.scandir(download_dir), key=lambda entry: entry.name):
+        if entry.is_dir() and has_chapters(entry.path):
+            yield entry.path
+
+
+def reindex(store: LibraryStore, download_dir: str, only_new: bool = False) -> int:
+    """Importar todos los títulos que hay en disco; devuelve cuántos"""
+    count = 0
+    for title_dir in title_dirs(download_dir):
+        store.import_title(title_dir, only_new=only_new)
+        count += 1
+    return count
+
+
+def open_library(download_dir: str = "downloads") -> LibraryStore:
+    """Abrir el almacén de la carpeta de descargas
+
+    Solo la primera vez (base de datos nueva o vacía) se importa lo que ya
+    hay en disco; después no se recorre la carpeta. Lo copiado a mano se
+    importa con `library_store.py reindexar`.
+    """
+    store = LibraryStore(os.path.join(download_dir, LIBRARY_NAME))
+    if store.is_empty() and os.path.isdir(download_dir):
+        reindex(store, download_dir)
+    return store
+
+
+def print_status(store: LibraryStore, pattern: str = ""):
+    rows = store.status(pattern)
+    if not rows:
+        print("📭 No hay títulos en la biblioteca")
+        return
+    for row in rows:
+        outputs = ", ".join(
+            f"{fmt.upper()} {info['chapters']}/{row['chapters']}{' + unificado' if info['unified'] else ''}"
+            for fmt, info in sorted(row['artifacts'].items())) or "sin archivos"
+        missing = f", {row['missing_pages']} pendientes" if row['missing_pages'] else ""
+        checked = time.strftime('%Y-%m-%d %H:%M', time.localtime(row['checked'])) if row['checked'] else "nunca"
+        print(f"📖 {row['slug']}: {row['chapters']} capítulos, {row['pages']} páginas{missing} "
+              f"({row['bytes'] / (1024 * 1024):.1f} MB) | {outputs} | revisado: {checked}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estado de la biblioteca descargada")
+    parser.add_argument('accion', choices=('estado', 'reindexar'))
+    parser.add_argument('titulo', nargs='?', default='', help="filtrar por texto del identificador")
+    parser.add_argument('--directorio', default='downloads')
+    parser.add_argument('--nuevos', action='store_true',
+                        help="al reindexar, no volver a leer los capítulos ya registrados")
+    args = parser.parse_args()
+
+    store = LibraryStore(os.path.join(args.directorio, LIBRARY_NAME))
+    try:
+        if args.accion == 'reindexar':
+            start = time.time()
+            count = reindex(store, args.directorio, only_new=args.nuevos)
+            print(f"✅ {count} títulos importados en {time.time() - start:.1f}s")
+        print_status(store, args.titulo)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
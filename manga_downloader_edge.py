@@ -1,165 +1,297 @@
 import logging
 import os
 import re
-import requests
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from selenium import webdriver
-from selenium.webdriver.edge.service import Service
-from selenium.webdriver.edge.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.microsoft import EdgeChromiumDriverManager
-from PIL import Image
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from typing import List, Optional
-from urllib.parse import urlparse, urljoin
-import PyPDF2
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+from blob_store import BLOB_DIR, BlobStore
+from chapter_manifest import ChapterManifest
+from download_scheduler import DownloadScheduler, RetryLater
+from driver_pool import EdgeDriverPool, resolve_edge_driver_path
+from http_cache import (HttpValidatorCache, content_range_start, discard_part, resume_headers,
+                        save_part_validator)
+from http_session import RetryPolicy, create_session
+from library_store import LIBRARY_NAME, LibraryStore
+from formats import OUTPUT_FORMATS
+from page_readiness import PageReadiness
+from metrics import PROMETHEUS_PREFIX, RunMetrics, current_run
+from pdf_engine import PdfEngine
+from pipeline import StagePipeline
+from static_scraper import parse_chapter_images, parse_chapters, parse_cover
+from telemetry import TransferTelemetry
+from title_record import TitleRecord
+
+# Selectores que indican que cada tipo de página ya tiene su contenido
+CHAPTER_LINK_SELECTOR = 'a[href*="/ch_"], a[href*="-ch_"]'
+CHAPTER_IMAGE_SELECTOR = ('div[name="image-items"] img, div[name="image-item"] img, '
+                          '.chapter-images img, .reader img, .manga-reader img')
+COVER_SELECTOR = ('img[src*="thumb"], .manga-cover img, .cover img, img[src*="cover"], '
+                  '.thumbnail img, img[alt*="cover"]')
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+def configure_logging(log_file: Optional[str] = 'manga_downloader.log'):
+    """Registro en consola y en `log_file`; lo llaman los scripts de entrada
+
+    El descargador no toca la configuración de logging al construirse, de modo
+    que quien lo use como biblioteca decide dónde van los mensajes.
+    """
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT, handlers=handlers)
+
 
 class EdgeMangaDownloader:
-    def __init__(self, download_dir: str = "downloads"):
+    def __init__(self, download_dir: str = "downloads", driver_pool_size: int = 1,
+                 pages_per_driver: int = 50, download_workers: int = 2,
+                 encode_workers: int = 1, pipeline_queue_size: int = 2,
+                 max_download_threads: int = 8, per_host_limit: int = 8,
+                 scheduler: Optional[DownloadScheduler] = None,
+                 download_engine: str = "threads", max_in_flight: int = 200,
+                 max_retries: int = 3, retry_policy: Optional[RetryPolicy] = None,
+                 site_timeouts: Optional[Dict[str, Dict[str, float]]] = None,
+                 static_scraping: bool = True, page_workers: Optional[int] = None,
+                 page_encoding: str = "jpeg", metrics_textfile: Optional[str] = None,
+                 dedup_images: bool = True, shared_with: Optional["EdgeMangaDownloader"] = None):
         self.download_dir = download_dir
         self.driver = None
-        self.session = requests.Session()
-        
-        # Configurar logging sin emojis
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.StreamHandler(),
-                logging.FileHandler('manga_downloader.log', encoding='utf-8')
-            ]
-        )
+        
+        # Modo lote: varios títulos del mismo proceso reutilizan la sesión HTTP, la
+        # caché de validadores, la telemetría, los navegadores, el planificador y los
+        # motores de descarga y conversión de `shared_with`, que es quien los cierra
+        self._shared_with = shared_with
+        shared = shared_with
+        
+        # Hilos por etapa del pipeline de capítulos (extraer -> descargar -> codificar).
+        # Varios hilos de descarga solo mantienen capítulos en vuelo en el planificador
+        self.scrape_workers = driver_pool_size
+        self.download_workers = download_workers
+        self.encode_workers = encode_workers
+        self.pipeline_queue_size = pipeline_queue_size
+        
+        # Métricas de la ejecución en curso (se renuevan en cada download_manga).
+        # metrics_textfile: ruta .prom para el textfile collector de node_exporter;
+        # por defecto se escribe metricas.prom en la carpeta del manga
+        self.metrics = RunMetrics()
+        self.metrics_textfile = metrics_textfile
+        
+        # Pool de conexiones a la medida de los hilos de descarga
+        self.session = shared.session if shared else create_session(
+            pool_size=max(max_download_threads, per_host_limit) + 2)
+        self.retry_policy = retry_policy or (shared.retry_policy if shared else RetryPolicy(max_attempts=max_retries))
+        
+        # ETag / Last-Modified de lo ya descargado para peticiones condicionales
+        self.http_cache = shared.http_cache if shared else HttpValidatorCache(
+            os.path.join(download_dir, ".http_cache.json"))
+        
+        # El logging lo configuran los scripts de entrada (ver configure_logging)
         self.logger = logging.getLogger(__name__)
         
+        # Conversión y combinación (PDF / CBZ / EPUB), sin navegador ni red.
+        # page_workers: procesos para preparar páginas (1 = en el propio proceso);
+        # page_encoding: codificación de las páginas que no se incrustan tal cual
+        self.pdf_engine = shared.pdf_engine if shared else PdfEngine(
+            page_workers=page_workers, page_encoding=page_encoding, logger=self.logger)
+        
+        # TTFB, latencia y bytes de cada petición de imagen, por host (ver get_transfer_stats)
+        self.telemetry = shared.telemetry if shared else TransferTelemetry(logger=self.logger)
+        
+        # Estado de la biblioteca (títulos, capítulos, páginas y archivos) en SQLite
+        self.library = shared.library if shared else LibraryStore(os.path.join(download_dir, LIBRARY_NAME))
+        
+        # Imágenes guardadas una vez por contenido y enlazadas desde cada capítulo;
+        # una URL ya conocida se enlaza sin descargarla (dedup_images=False lo desactiva)
+        self.blobs = shared.blobs if shared else (
+            BlobStore(os.path.join(download_dir, BLOB_DIR), self.library, self.logger) if dedup_images else None)
+        
         # Headers realistas
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
             'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br',
+            # Sin 'br': requests solo decodifica brotli si está instalado el paquete brotli
+            'Accept-Encoding': 'gzip, deflate',
             'DNT': '1',
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
         })
+        
+        # Un mismo navegador sirve toda la ejecución; se recicla cada N páginas
+        self.driver_pool = shared.driver_pool if shared else EdgeDriverPool(
+            self._create_edge_driver,
+            size=driver_pool_size,
+            max_uses=pages_per_driver,
+            logger=self.logger
+        )
+        
+        # Probar primero requests + lxml y recurrir a Edge solo si no se encuentra nada
+        self.static_scraping = static_scraping
+        
+        # Esperas por eventos de la página en lugar de pausas fijas
+        self.readiness = PageReadiness(
+            site_timeouts=site_timeouts,
+            logger=self.logger,
+            on_wait=lambda kind, seconds: self.metrics.add_time('espera', seconds)
+        )
+        
+        # Planificador de descargas único para toda la ejecución (o compartido entre títulos)
+        self._owns_scheduler = scheduler is None and shared is None
+        self.scheduler = scheduler or (shared.scheduler if shared else DownloadScheduler(
+            max_workers=max_download_threads,
+            per_host_limit=per_host_limit,
+            logger=self.logger
+        ))
+        
+        # Motor alternativo asyncio/HTTP2 para las imágenes (opcional, requiere httpx)
+        self.async_engine = None
+        if shared:
+            self.async_engine = shared.async_engine
+        elif download_engine == "async":
+            from async_downloader import AsyncDownloadEngine
+            self.async_engine = AsyncDownloadEngine(
+                headers=dict(self.session.headers),
+                max_in_flight=max_in_flight,
+                retry_policy=self.retry_policy,
+                http_cache=self.http_cache,
+                telemetry=self.telemetry,
+                logger=self.logger
+            )
+        elif download_engine != "threads":
+            raise ValueError(f"Motor de descarga desconocido: {download_engine}")
+
+    def _create_edge_driver(self, slot: int = 0):
+        """Crear una instancia de Microsoft Edge con perfil temporal propio"""
+        # Selenium solo se carga cuando hace falta un navegador de verdad
+        from selenium import webdriver
+        from selenium.webdriver.edge.options import Options
+        from selenium.webdriver.edge.service import Service
+        
+        edge_options = Options()
+        
+        # Configuraciones de rendimiento ULTRA RÁPIDAS
+        edge_options.add_argument('--no-sandbox')
+        edge_options.add_argument('--disable-dev-shm-usage')
+        edge_options.add_argument('--disable-gpu')
+        edge_options.add_argument('--disable-extensions')
+        edge_options.add_argument('--disable-plugins')
+        edge_options.add_argument('--disable-images')  # No cargar imágenes para velocidad
+        edge_options.add_argument('--aggressive-cache-discard')
+        edge_options.add_argument('--memory-pressure-off')
+        edge_options.add_argument('--max-old-space-size=4096')
+        
+        # Usar perfil temporal inspirado en el real de Edge (uno por instancia del pool)
+        profile_name = "edge_temp_profile" if slot == 0 else f"edge_temp_profile_{slot}"
+        temp_profile = os.path.join(os.getcwd(), profile_name)
+        edge_options.add_argument(f'--user-data-dir={temp_profile}')
+        edge_options.add_argument('--profile-directory=Default')
+        self.logger.info("Usando perfil temporal para Microsoft Edge")
+        
+        # Configuraciones anti-detección
+        edge_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+        edge_options.add_experimental_option('useAutomationExtension', False)
+        edge_options.add_argument('--disable-blink-features=AutomationControlled')
+        
+        # La ruta del driver se resuelve una sola vez por proceso
+        driver_path = resolve_edge_driver_path(self.logger)
+        # En modo lote el pool es del descargador propietario: el arranque se
+        # atribuye al título cuya etapa pidió el navegador
+        with (current_run() or self.metrics).stage('navegador'):
+            if driver_path:
+                driver = webdriver.Edge(service=Service(driver_path), options=edge_options)
+            else:
+                driver = webdriver.Edge(options=edge_options)
+        
+        # Script anti-detección
+        driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        
+        self.logger.info("Driver de Microsoft Edge configurado exitosamente")
+        return driver
 
     def setup_edge_driver(self):
         """Configurar Microsoft Edge con perfil real"""
         try:
-            edge_options = Options()
-            
-            # Configuraciones de rendimiento ULTRA RÁPIDAS
-            edge_options.add_argument('--no-sandbox')
-            edge_options.add_argument('--disable-dev-shm-usage')
-            edge_options.add_argument('--disable-gpu')
-            edge_options.add_argument('--disable-extensions')
-            edge_options.add_argument('--disable-plugins')
-            edge_options.add_argument('--disable-images')  # No cargar imágenes para velocidad
-            edge_options.add_argument('--aggressive-cache-discard')
-            edge_options.add_argument('--memory-pressure-off')
-            edge_options.add_argument('--max-old-space-size=4096')
-            
-            # Usar perfil temporal inspirado en el real de Edge
-            temp_profile = os.path.join(os.getcwd(), "edge_temp_profile")
-            edge_options.add_argument(f'--user-data-dir={temp_profile}')
-            edge_options.add_argument('--profile-directory=Default')
-            self.logger.info("Usando perfil temporal para Microsoft Edge")
-            
-            # Configuraciones anti-detección
-            edge_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-            edge_options.add_experimental_option('useAutomationExtension', False)
-            edge_options.add_argument('--disable-blink-features=AutomationControlled')
-            
-            # Intentar con EdgeChromiumDriverManager primero, luego manual
-            try:
-                service = Service(EdgeChromiumDriverManager().install())
-                self.logger.info("Driver descargado automáticamente")
-            except:
-                # Fallback: usar Edge instalado en el sistema
-                edge_path = r"C:\Program Files (x86)\Microsoft\Edge\Application\msedgedriver.exe"
-                if not os.path.exists(edge_path):
-                    edge_path = r"C:\Program Files\Microsoft\Edge\Application\msedgedriver.exe"
-                
-                if os.path.exists(edge_path):
-                    service = Service(edge_path)
-                    self.logger.info("Usando driver de Edge del sistema")
-                else:
-                    # Último recurso: Edge sin service específico
-                    service = None
-                    self.logger.info("Intentando Edge sin service específico")
-            
-            if service:
-                self.driver = webdriver.Edge(service=service, options=edge_options)
-            else:
-                self.driver = webdriver.Edge(options=edge_options)
-            
-            # Script anti-detección
-            self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-            
-            self.logger.info("Driver de Microsoft Edge configurado exitosamente")
+            self.driver = self._create_edge_driver()
             return True
-            
         except Exception as e:
             self.logger.error(f"Error configurando Edge: {str(e)}")
             return False
 
+    def _static_scrape(self, url: str, parser):
+        """Descargar la página con la Session y extraer datos con lxml sin navegador"""
+        if not self.static_scraping:
+            return None
+        try:
+            response = self.session.get(url, timeout=30)
+            response.raise_for_status()
+            result = parser(response.text, response.url)
+            if not result:
+                self.logger.warning(f"La página respondió pero el HTML estático no contiene datos, se usará Edge: {url}")
+            return result
+        except Exception as e:
+            self.logger.info(f"Extracción sin navegador no disponible, se usará Edge: {str(e)}")
+            return None
+
     def get_chapters_list(self, manga_url: str) -> List[tuple]:
         """Obtener lista de capítulos"""
         try:
             self.logger.info(f"Obteniendo lista de capítulos de: {manga_url}")
             
-            if not self.setup_edge_driver():
-                return []
-            
-            self.driver.get(manga_url)
-            time.sleep(3)
-            
-            # Buscar enlaces de capítulos con JavaScript
-            chapter_script = """
-            const chapters = [];
-            const links = document.querySelectorAll('a[href*="/ch_"], a[href*="-ch_"], a[href*="chapter"]');
-            
-            links.forEach(link => {
-                const href = link.href;
-                const text = link.textContent.trim();
-                if (href && text && (href.includes('/ch_') || href.includes('-ch_'))) {
-                    chapters.push({
-                        url: href,
-                        title: text,
-                        number: href.match(/ch_(\d+(?:\.\d+)?)/)?.[1] || chapters.length + 1
+            # Vía rápida: HTML estático sin navegador
+            chapters_data = self._static_scrape(manga_url, parse_chapters)
+            if chapters_data:
+                self.logger.info("Capítulos obtenidos sin navegador")
+            else:
+                with self.driver_pool.driver() as driver:
+                    driver.get(manga_url)
+                    self.readiness.wait_for_selector(driver, manga_url, CHAPTER_LINK_SELECTOR)
+                    self.readiness.wait_for_network_idle(driver, manga_url)
+            
+                    # Buscar enlaces de capítulos con JavaScript
+                    chapter_script = """
+                    const chapters = [];
+                    const links = document.querySelectorAll('a[href*="/ch_"], a[href*="-ch_"], a[href*="chapter"]');
+            
+                    links.forEach(link => {
+                        const href = link.href;
+                        const text = link.textContent.trim();
+                        if (href && text && (href.includes('/ch_') || href.includes('-ch_'))) {
+                            chapters.push({
+                                url: href,
+                                title: text,
+                                number: href.match(/ch_(\d+(?:\.\d+)?)/)?.[1] || chapters.length + 1
+                            });
+                        }
                     });
-                }
-            });
-            
-            return chapters;
-            """
-            
-            chapters_data = self.driver.execute_script(chapter_script)
-            
-            if not chapters_data:
-                self.logger.warning("No se encontraron capítulos con JavaScript, intentando con CSS")
-                # Fallback con selectores CSS
-                links = self.driver.find_elements(By.CSS_SELECTOR, 'a[href*="ch_"], a[href*="-ch_"]')
-                chapters_data = []
-                for link in links:
-                    href = link.get_attribute('href')
-                    text = link.text.strip()
-                    if href and text:
-                        match = re.search(r'ch_(\d+(?:\.\d+)?)', href)
-                        number = match.group(1) if match else len(chapters_data) + 1
-                        chapters_data.append({
-                            'url': href,
-                            'title': text,
-                            'number': number
-                        })
+            
+                    return chapters;
+                    """
+            
+                    chapters_data = driver.execute_script(chapter_script)
+            
+                    if not chapters_data:
+                        self.logger.warning("No se encontraron capítulos con JavaScript, intentando con CSS")
+                        # Fallback con selectores CSS
+                        from selenium.webdriver.common.by import By
+                        links = driver.find_elements(By.CSS_SELECTOR, 'a[href*="ch_"], a[href*="-ch_"]')
+                        chapters_data = []
+                        for link in links:
+                            href = link.get_attribute('href')
+                            text = link.text.strip()
+                            if href and text:
+                                match = re.search(r'ch_(\d+(?:\.\d+)?)', href)
+                                number = match.group(1) if match else len(chapters_data) + 1
+                                chapters_data.append({
+                                    'url': href,
+                                    'title': text,
+                                    'number': number
+                                })
             
             # Convertir a lista de tuplas y eliminar duplicados
             chapters = []
             seen_urls = set()
-            
+        
             for chapter in chapters_data:
                 url = chapter['url']
                 if url not in seen_urls:
@@ -169,190 +301,326 @@ class EdgeMangaDownloader:
                         chapter['title'],
                         url
                     ))
-            
+        
             # Ordenar por número de capítulo
             chapters.sort(key=lambda x: x[0])
-            
+        
             self.logger.info(f"Enlaces encontrados: {len(chapters_data)}")
             self.logger.info(f"Capítulos encontrados: {len(chapters)}")
-            
+        
             return chapters
-            
+        
         except Exception as e:
             self.logger.error(f"Error obteniendo capítulos: {str(e)}")
             return []
-        finally:
-            if self.driver:
-                self.driver.quit()
 
     def get_chapter_images(self, chapter_url: str) -> List[str]:
         """Obtener URLs de imágenes de un capítulo - OPTIMIZADO PARA EDGE"""
         try:
-            if not self.setup_edge_driver():
-                return []
-            
-            self.driver.get(chapter_url)
-            time.sleep(5)  # Esperar carga
-            
-            # Script optimizado para encontrar imágenes
-            image_script = """
-            const images = [];
-            
-            // Prioridad 1: Buscar en div[name="image-items"] como mostraste
-            const imageItems = document.querySelector('div[name="image-items"]');
-            if (imageItems) {
-                const imgs = imageItems.querySelectorAll('img[src]');
-                imgs.forEach(img => {
-                    if (img.src && !img.src.includes('data:')) {
-                        images.push(img.src);
+            # Vía rápida: HTML estático sin navegador
+            image_urls = self._static_scrape(chapter_url, parse_chapter_images)
+            if image_urls:
+                self.logger.info("Imágenes obtenidas sin navegador")
+            else:
+                with self.driver_pool.driver() as driver:
+                    driver.get(chapter_url)
+                    # Esperar a que el lector pinte sus imágenes y deje de añadir más
+                    self.readiness.wait_for_selector(driver, chapter_url, CHAPTER_IMAGE_SELECTOR)
+                    if not self.readiness.wait_for_image_count(driver, chapter_url, 'div[name="image-items"]'):
+                        self.readiness.wait_for_network_idle(driver, chapter_url)
+            
+                    # Script optimizado para encontrar imágenes
+                    image_script = """
+                    const images = [];
+            
+                    // Prioridad 1: Buscar en div[name="image-items"] como mostraste
+                    const imageItems = document.querySelector('div[name="image-items"]');
+                    if (imageItems) {
+                        const imgs = imageItems.querySelectorAll('img[src]');
+                        imgs.forEach(img => {
+                            if (img.src && !img.src.includes('data:')) {
+                                images.push(img.src);
+                            }
+                        });
                     }
-                });
-            }
-            
-            // Prioridad 2: Buscar en contenedores comunes si no encontró nada
-            if (images.length === 0) {
-                const selectors = [
-                    'div[name="image-item"] img',
-                    '.chapter-images img',
-                    '.reader img',
-                    '.manga-reader img',
-                    'img[src*="media"]',
-                    'img[src*="chapter"]'
-                ];
+            
+                    // Prioridad 2: Buscar en contenedores comunes si no encontró nada
+                    if (images.length === 0) {
+                        const selectors = [
+                            'div[name="image-item"] img',
+                            '.chapter-images img',
+                            '.reader img',
+                            '.manga-reader img',
+                            'img[src*="media"]',
+                            'img[src*="chapter"]'
+                        ];
                 
-                for (const selector of selectors) {
-                    const imgs = document.querySelectorAll(selector);
-                    imgs.forEach(img => {
-                        if (img.src && !img.src.includes('data:') && !images.includes(img.src)) {
-                            images.push(img.src);
+                        for (const selector of selectors) {
+                            const imgs = document.querySelectorAll(selector);
+                            imgs.forEach(img => {
+                                if (img.src && !img.src.includes('data:') && !images.includes(img.src)) {
+                                    images.push(img.src);
+                                }
+                            });
+                            if (images.length > 0) break;
                         }
-                    });
-                    if (images.length > 0) break;
-                }
-            }
+                    }
             
-            return images.filter(url => url && url.length > 10);
-            """
+                    return images.filter(url => url && url.length > 10);
+                    """
             
-            image_urls = self.driver.execute_script(image_script)
+                    image_urls = driver.execute_script(image_script)
             
-            if not image_urls:
-                self.logger.warning("JavaScript no encontró imágenes, intentando con Selenium")
-                # Fallback con Selenium
-                img_elements = self.driver.find_elements(By.CSS_SELECTOR, 'img[src]')
-                image_urls = []
-                for img in img_elements:
-                    src = img.get_attribute('src')
-                    if src and 'data:' not in src and len(src) > 10:
-                        image_urls.append(src)
+                    if not image_urls:
+                        self.logger.warning("JavaScript no encontró imágenes, intentando con Selenium")
+                        # Fallback con Selenium
+                        from selenium.webdriver.common.by import By
+                        img_elements = driver.find_elements(By.CSS_SELECTOR, 'img[src]')
+                        image_urls = []
+                        for img in img_elements:
+                            src = img.get_attribute('src')
+                            if src and 'data:' not in src and len(src) > 10:
+                                image_urls.append(src)
             
             # Filtrar y limpiar URLs
             filtered_urls = []
             for url in image_urls:
                 if url and not any(skip in url.lower() for skip in ['avatar', 'logo', 'icon', 'banner']):
                     filtered_urls.append(url)
-            
+        
             self.logger.info(f"Encontradas {len(filtered_urls)} imágenes")
             return filtered_urls
-            
+        
         except Exception as e:
             self.logger.error(f"Error obteniendo imágenes: {str(e)}")
             return []
-        finally:
-            if self.driver:
-                self.driver.quit()
 
-    def download_single_image(self, url: str, filepath: str) -> bool:
-        """Descargar una imagen individual con reintentos"""
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                response = self.session.get(url, timeout=30, stream=True)
+    def _fetch_image(self, url: str, filepath: str, attempt: int = 0) -> bool:
+        """Un único intento de descarga; lanza RetryLater si conviene reintentar"""
+        filename = os.path.basename(filepath)
+        status_code = None
+        retry_after = None
+        received = 0
+        ttfb = None
+        
+        # Se descarga a .part y solo se renombra al completarse; un .part previo se reanuda
+        # con If-Range, de modo que si la imagen cambió el servidor la envía entera
+        part_path = filepath + '.part'
+        headers = resume_headers(part_path)
+        if not headers:
+            # Petición condicional si ya tenemos este archivo con sus validadores
+            headers = self.http_cache.conditional_headers(url, filepath)
+        
+        start = time.perf_counter()
+        try:
+            # Con stream=True get() vuelve al recibir las cabeceras: es el TTFB
+            response = self.session.get(url, timeout=30, stream=True, headers=headers)
+            # El bloque with cierra la conexión también si la respuesta es un error
+            with response:
+                ttfb = time.perf_counter() - start
+                status_code = response.status_code
+                retry_after = response.headers.get('Retry-After')
+            
+                if status_code == 304:
+                    self.http_cache.record_hit(url)
+                    self.telemetry.record(url, ttfb, time.perf_counter() - start, 0, attempt, status_code)
+                    self.logger.info(f"Sin cambios: {filename}")
+                    return True
+            
+                if status_code == 416:
+                    # El rango ya no es válido (el archivo cambió): empezar de cero
+                    discard_part(part_path)
+                    status_code = None
+                    raise ValueError("rango no satisfacible, se reinicia la descarga")
                 response.raise_for_status()
-                
-                with open(filepath, 'wb') as f:
+                if status_code == 206 and content_range_start(response.headers) != os.path.getsize(part_path):
+                    # El servidor no continúa donde acaba el .part: empezar de cero
+                    discard_part(part_path)
+                    status_code = None
+                    raise ValueError("Content-Range no coincide con la descarga parcial, se reinicia")
+            
+                # 206: el .part sigue valiendo; 200: archivo nuevo o cambiado, se reescribe entero
+                mode = 'ab' if status_code == 206 else 'wb'
+                if mode == 'wb':
+                    save_part_validator(part_path, response.headers)
+                with open(part_path, mode) as f:
                     for chunk in response.iter_content(chunk_size=8192):
                         if chunk:
                             f.write(chunk)
-                
+                            received += len(chunk)
+            
                 # Verificar que el archivo se descargó correctamente
-                if os.path.exists(filepath) and os.path.getsize(filepath) > 1000:
-                    filename = os.path.basename(filepath)
-                    self.logger.info(f"Descargada: {filename}")
+                if os.path.getsize(part_path) > 1000:
+                    os.replace(part_path, filepath)
+                    discard_part(part_path)
+                    self.http_cache.store(url, filepath, response.headers)
+                    latency = time.perf_counter() - start
+                    self.telemetry.record(url, ttfb, latency, received, attempt, status_code)
+                    self.logger.info(f"Descargada: {filename} ({received / 1024:.0f} KB en {latency * 1000:.0f} ms)")
                     return True
-                
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    self.logger.warning(f"Reintento {attempt + 1} para {os.path.basename(filepath)}: {str(e)}")
-                    time.sleep(2)
-                else:
-                    self.logger.error(f"Error descargando {os.path.basename(filepath)}: {str(e)}")
+            
+                status_code = None
+                error = "archivo incompleto"
+            
+        except Exception as e:
+            error = str(e)
+        
+        self.telemetry.record(url, ttfb, time.perf_counter() - start, received, attempt, status_code, ok=False)
         
+        if self.retry_policy.should_retry(attempt, status_code):
+            delay = self.retry_policy.delay(attempt, retry_after)
+            self.logger.warning(f"Reintento {attempt + 1} para {filename} en {delay:.1f}s: {error}")
+            raise RetryLater(delay)
+        
+        self.logger.error(f"Error descargando {filename}: {error}")
         return False
 
-    def download_chapter_images(self, chapter_dir: str, image_urls: List[str]) -> List[str]:
-        """Descargar imágenes de un capítulo en paralelo - ULTRA RÁPIDO"""
+    def download_single_image(self, url: str, filepath: str) -> bool:
+        """Descargar una imagen individual con reintentos"""
+        attempt = 0
+        while True:
+            try:
+                return self._fetch_image(url, filepath, attempt)
+            except RetryLater as retry:
+                time.sleep(retry.delay)
+                attempt += 1
+
+    def submit_chapter_images(self, chapter_dir: str, image_urls: List[str], priority=(0, 0)) -> Future:
+        """Encolar las imágenes de un capítulo en el planificador global"""
         os.makedirs(chapter_dir, exist_ok=True)
-        downloaded_files = []
         
-        def download_image_task(args):
-            i, url = args
+        def page_path(i, url):
             extension = url.split('.')[-1].split('?')[0] if '.' in url else 'jpg'
             if extension not in ['jpg', 'jpeg', 'png', 'webp', 'gif']:
                 extension = 'jpg'
             
             filename = f"pagina_{i+1:03d}.{extension}"
-            filepath = os.path.join(chapter_dir, filename)
+            return os.path.join(chapter_dir, filename)
+        
+        # Las páginas ya válidas según el manifiesto no se vuelven a descargar
+        manifest = ChapterManifest(chapter_dir)
+        manifest.set_image_urls(image_urls)
+        
+        pages = [(url, page_path(i, url)) for i, url in enumerate(image_urls)]
+        # Páginas sobrantes de una versión anterior del capítulo
+        pruned = manifest.prune_pages([os.path.basename(filepath) for _, filepath in pages])
+        if pruned:
+            self.logger.info(f"{pruned} páginas de una versión anterior borradas en {os.path.basename(chapter_dir)}")
+        results = [filepath if manifest.has_valid_page(filepath, url) else None for url, filepath in pages]
+        skipped = sum(1 for done in results if done)
+        
+        # Imágenes cuya URL ya está en el almacén (créditos, páginas resubidas...): se enlazan sin red
+        linked = 0
+        if self.blobs:
+            for i, (url, filepath) in enumerate(pages):
+                if results[i] is None:
+                    sha256 = self.blobs.fetch(url, filepath)
+                    if sha256:
+                        manifest.record_page(filepath, url, sha256=sha256)
+                        results[i] = filepath
+                        linked += 1
+        pending = [(url, filepath) for (url, filepath), done in zip(pages, results) if not done]
+        
+        if skipped:
+            self.logger.info(f"{skipped}/{len(pages)} páginas ya descargadas en {os.path.basename(chapter_dir)}")
+        if linked:
+            self.logger.info(f"{linked}/{len(pages)} páginas enlazadas desde el almacén en {os.path.basename(chapter_dir)}")
+        
+        # Las descargas corren en otros hilos: el capítulo se indica explícitamente
+        chapter = os.path.basename(chapter_dir)
+        metrics = self.metrics
+        metrics.count('paginas_omitidas', skipped, chapter)
+        metrics.count('paginas_enlazadas', linked, chapter)
+        
+        def on_page(url, filepath):
+            # Al almacén por contenido: si la imagen ya existía queda como enlace al blob
+            sha256 = self.blobs.ingest(filepath, url) if self.blobs else None
+            manifest.record_page(filepath, url, sha256=sha256)
+            metrics.count('paginas', 1, chapter)
+            metrics.count('bytes', os.path.getsize(filepath), chapter)
+        
+        def on_retry(url):
+            metrics.count('reintentos', 1, chapter)
+        
+        def make_job(url, filepath):
+            attempts = [0]
             
-            if self.download_single_image(url, filepath):
+            # Los reintentos vuelven al planificador en lugar de dormir en el hilo
+            def download_image_task():
+                try:
+                    ok = self._fetch_image(url, filepath, attempts[0])
+                except RetryLater:
+                    attempts[0] += 1
+                    on_retry(url)
+                    raise
+                if not ok:
+                    return None
+                on_page(url, filepath)
                 return filepath
-            return None
-        
-        # Usar más threads para Edge (es más estable)
-        with ThreadPoolExecutor(max_workers=8) as executor:
-            future_to_url = {
-                executor.submit(download_image_task, (i, url)): url 
-                for i, url in enumerate(image_urls)
-            }
             
-            for future in as_completed(future_to_url):
-                result = future.result()
-                if result:
-                    downloaded_files.append(result)
+            return url, download_image_task
+        
+        if self.async_engine:
+            inner = self.async_engine.submit_chapter(pending, priority, on_page=on_page, on_retry=on_retry)
+        else:
+            jobs = [make_job(url, filepath) for url, filepath in pending]
+            inner = self.scheduler.submit_chapter(jobs, priority)
+        
+        outer = Future()
+        
+        def merge_results(future):
+            try:
+                downloaded = iter(future.result())
+                merged = [done if done else next(downloaded) for done in results]
+                metrics.count('fallos', merged.count(None), chapter)
+                manifest.save()
+                if self.blobs:
+                    self.blobs.flush()
+                outer.set_result(merged)
+            except Exception as e:
+                outer.set_exception(e)
         
-        return sorted(downloaded_files)
+        inner.add_done_callback(merge_results)
+        return outer
+
+    def download_chapter_images(self, chapter_dir: str, image_urls: List[str], priority=(0, 0)) -> List[str]:
+        """Descargar imágenes de un capítulo en paralelo - ULTRA RÁPIDO"""
+        results = self.submit_chapter_images(chapter_dir, image_urls, priority).result()
+        return sorted(filepath for filepath in results if filepath)
 
     def get_cover_image(self, manga_url: str) -> Optional[str]:
         """Obtener imagen de portada del manga"""
         try:
-            if not self.setup_edge_driver():
-                return None
-            
             self.logger.info("Extrayendo imagen de portada...")
-            self.driver.get(manga_url)
-            time.sleep(3)
-            
-            # Script para encontrar la portada
-            cover_script = """
-            const selectors = [
-                'img[src*="thumb"]',
-                '.manga-cover img',
-                '.cover img',
-                'img[src*="cover"]',
-                '.thumbnail img',
-                'img[alt*="cover"]'
-            ];
-            
-            for (const selector of selectors) {
-                const img = document.querySelector(selector);
-                if (img && img.src && !img.src.includes('data:')) {
-                    return img.src;
-                }
-            }
-            return null;
-            """
-            
-            cover_url = self.driver.execute_script(cover_script)
+            
+            # Vía rápida: HTML estático sin navegador
+            cover_url = self._static_scrape(manga_url, parse_cover)
+            if not cover_url:
+                with self.driver_pool.driver() as driver:
+                    driver.get(manga_url)
+                    self.readiness.wait_for_selector(driver, manga_url, COVER_SELECTOR)
+                
+                    # Script para encontrar la portada
+                    cover_script = """
+                    const selectors = [
+                        'img[src*="thumb"]',
+                        '.manga-cover img',
+                        '.cover img',
+                        'img[src*="cover"]',
+                        '.thumbnail img',
+                        'img[alt*="cover"]'
+                    ];
+                
+                    for (const selector of selectors) {
+                        const img = document.querySelector(selector);
+                        if (img && img.src && !img.src.includes('data:')) {
+                            return img.src;
+                        }
+                    }
+                    return null;
+                    """
+                
+                    cover_url = driver.execute_script(cover_script)
             
             if cover_url:
                 self.logger.info(f"Imagen de portada encontrada: {cover_url}")
@@ -364,9 +632,6 @@ class EdgeMangaDownloader:
         except Exception as e:
             self.logger.error(f"Error obteniendo portada: {str(e)}")
             return None
-        finally:
-            if self.driver:
-                self.driver.quit()
 
     def download_cover_image(self, cover_url: str, manga_dir: str) -> Optional[str]:
         """Descargar imagen de portada"""
@@ -379,7 +644,14 @@ class EdgeMangaDownloader:
             
             cover_path = os.path.join(manga_dir, f"portada.{extension}")
             
+            # La misma portada en otro espejo o en una ejecución anterior no se descarga
+            if self.blobs and self.blobs.fetch(cover_url, cover_path):
+                self.logger.info(f"Portada enlazada desde el almacén: {cover_path}")
+                return cover_path
+            
             if self.download_single_image(cover_url, cover_path):
+                if self.blobs:
+                    self.blobs.ingest(cover_path, cover_url)
                 self.logger.info(f"Portada descargada: {cover_path}")
                 return cover_path
             
@@ -389,130 +661,45 @@ class EdgeMangaDownloader:
             self.logger.error(f"Error descargando portada: {str(e)}")
             return None
 
-    def images_to_pdf(self, image_files: List[str], output_path: str, cover_image: Optional[str] = None) -> bool:
-        """Convertir imágenes a PDF con ancho uniforme"""
-        try:
-            if not image_files:
-                self.logger.warning("No hay imágenes para convertir a PDF")
-                return False
-            
-            # Crear lista de imágenes con portada al inicio si existe
-            all_images = []
-            if cover_image and os.path.exists(cover_image):
-                all_images.append(cover_image)
-                self.logger.info("Añadiendo portada al PDF")
-            all_images.extend(image_files)
-            
-            # Analizar anchos para encontrar el ancho estándar
-            widths = []
-            for image_path in all_images:
-                try:
-                    with Image.open(image_path) as img:
-                        widths.append(img.width)
-                except:
-                    continue
-            
-            if not widths:
-                self.logger.error("No se pudieron analizar las imágenes")
-                return False
-            
-            # Encontrar el ancho más común
-            from collections import Counter
-            width_counts = Counter(widths)
-            target_width = width_counts.most_common(1)[0][0]
-            
-            self.logger.info(f"Ancho objetivo: {target_width}px (alto original mantenido)")
-            
-            # Crear PDF con ancho uniforme
-            c = None
-            
-            for i, image_file in enumerate(all_images):
-                try:
-                    with Image.open(image_file) as img:
-                        if img.mode != 'RGB':
-                            img = img.convert('RGB')
-                        
-                        original_width, original_height = img.size
-                        
-                        # Solo redimensionar el ancho si es diferente
-                        if original_width != target_width:
-                            scale_factor = target_width / original_width
-                            new_height = int(original_height * scale_factor)
-                            img = img.resize((target_width, new_height), Image.Resampling.LANCZOS)
-                        else:
-                            new_height = original_height
-                        
-                        # Guardar imagen temporal
-                        temp_path = f"temp_resized_{i}.jpg"
-                        img.save(temp_path, "JPEG", quality=95)
-                        
-                        # Crear/configurar canvas
-                        if c is None:
-                            c = canvas.Canvas(output_path, pagesize=(target_width, new_height))
-                        
-                        c.setPageSize((target_width, new_height))
-                        c.drawImage(temp_path, 0, 0, target_width, new_height)
-                        c.showPage()
-                        
-                        # Limpiar archivo temporal
-                        try:
-                            os.remove(temp_path)
-                        except:
-                            pass
-                    
-                    if (i + 1) % 10 == 0:
-                        self.logger.info(f"Procesadas {i + 1}/{len(all_images)} imágenes")
-                        
-                except Exception as e:
-                    self.logger.error(f"Error procesando imagen {image_file}: {e}")
-                    continue
-            
-            if c:
-                c.save()
-                self.logger.info(f"PDF creado: {output_path}")
-                
-                # Verificar tamaño del archivo
-                pdf_size = os.path.getsize(output_path) / (1024 * 1024)  # MB
-                self.logger.info(f"Tamaño del PDF: {pdf_size:.2f} MB")
-                return True
-            
-            return False
-            
-        except Exception as e:
-            self.logger.error(f"Error creando PDF: {str(e)}")
-            return False
+    def build_cover_pdf(self, cover_path: str, pdfs_dir: str) -> Optional[str]:
+        """PDF de una página con la portada (ver PdfEngine.build_cover_pdf)"""
+        return self.pdf_engine.build_cover_pdf(cover_path, pdfs_dir)
 
-    def merge_pdfs(self, pdf_files: List[str], output_path: str) -> bool:
-        """Combinar múltiples PDFs en uno solo"""
-        try:
-            self.logger.info(f"Combinando {len(pdf_files)} PDFs...")
-            
-            merger = PyPDF2.PdfMerger()
-            
-            for pdf_file in pdf_files:
-                if os.path.exists(pdf_file):
-                    merger.append(pdf_file)
-                    self.logger.info(f"Añadido: {os.path.basename(pdf_file)}")
-            
-            with open(output_path, 'wb') as output_file:
-                merger.write(output_file)
-            
-            merger.close()
-            
-            # Verificar tamaño del archivo final
-            if os.path.exists(output_path):
-                final_size = os.path.getsize(output_path) / (1024 * 1024)  # MB
-                self.logger.info(f"PDF unificado creado: {output_path} ({final_size:.2f} MB)")
-                return True
-            
-            return False
-            
-        except Exception as e:
-            self.logger.error(f"Error combinando PDFs: {str(e)}")
-            return False
+    def images_to_pdf(self, image_files: List[str], output_path: str, cover_image: Optional[str] = None,
+                      report: Optional[dict] = None) -> bool:
+        """Convertir imágenes a PDF con ancho uniforme (ver PdfEngine.images_to_pdf)"""
+        return self.pdf_engine.images_to_pdf(image_files, output_path, cover_image, report)
 
-    def download_manga(self, manga_url: str, start_chapter: int = 1, end_chapter: int = None) -> bool:
-        """Descargar manga completo - VERSIÓN EDGE ULTRA RÁPIDA"""
+    def merge_pdfs(self, pdf_files: List[str], output_path: str, incremental: bool = True) -> bool:
+        """Combinar múltiples PDFs en uno solo (ver PdfEngine.merge_pdfs)"""
+        return self.pdf_engine.merge_pdfs(pdf_files, output_path, incremental)
+
+    def images_to_archive(self, image_files: List[str], output_path: str, output_format: str,
+                          title: str, series: Optional[str] = None, number=None) -> bool:
+        """Empaquetar las imágenes en CBZ o EPUB (ver PdfEngine.images_to_archive)"""
+        return self.pdf_engine.images_to_archive(image_files, output_path, output_format, title, series, number)
+
+    def merge_archives(self, archive_files: List[str], output_path: str, output_format: str, title: str,
+                       cover_image: Optional[str] = None, bookmarks: Optional[List[str]] = None) -> bool:
+        """Volumen CBZ / EPUB unificado (ver PdfEngine.merge_archives)"""
+        return self.pdf_engine.merge_archives(archive_files, output_path, output_format, title,
+                                              cover_image, bookmarks)
+
+    def download_manga(self, manga_url: str, start_chapter: int = 1, end_chapter: int = None,
+                       output_format: str = "pdf", priority: int = 0, update: bool = False) -> bool:
+        """Descargar manga completo - VERSIÓN EDGE ULTRA RÁPIDA
+        
+        output_format: 'pdf', o 'cbz' / 'epub' para empaquetar las imágenes tal cual
+        priority: prioridad del título en el planificador (mayor = antes); solo
+        importa cuando varios títulos comparten planificador (modo lote)
+        update: modo actualización; solo se procesan los capítulos que no están en
+        la biblioteca (ver TitleRecord) o cuya URL ha cambiado, y el archivo
+        unificado se amplía con ellos
+        """
+        if output_format not in OUTPUT_FORMATS:
+            self.logger.error(f"Formato de salida no válido: {output_format}")
+            return False
+        
         try:
             start_time = time.time()
             
@@ -522,16 +709,31 @@ class EdgeMangaDownloader:
             
             manga_dir = os.path.join(self.download_dir, manga_id)
             pdfs_dir = os.path.join(manga_dir, "pdfs")
-            os.makedirs(pdfs_dir, exist_ok=True)
             
-            # Obtener imagen de portada
-            cover_url = self.get_cover_image(manga_url)
-            cover_path = None
-            if cover_url:
-                cover_path = self.download_cover_image(cover_url, manga_dir)
+            # Métricas nuevas para esta ejecución
+            metrics = self.metrics = RunMetrics(manga_id)
+            
+            # Cada formato en su carpeta: pdfs/, cbz/ o epub/
+            output_dir = pdfs_dir if output_format == "pdf" else os.path.join(manga_dir, output_format)
+            os.makedirs(output_dir, exist_ok=True)
+            
+            # Capítulos y portada ya procesados en ejecuciones anteriores
+            record = TitleRecord(self.library, manga_dir, manga_name)
+            
+            # Obtener imagen de portada (al actualizar se reutiliza la guardada)
+            cover_path = record.cover if update else None
+            if cover_path is None:
+                with metrics.stage('extraccion'):
+                    cover_url = self.get_cover_image(manga_url)
+                if cover_url:
+                    with metrics.stage('descarga'):
+                        cover_path = self.download_cover_image(cover_url, manga_dir)
+                if cover_path:
+                    record.set_cover(cover_path)
             
             # Obtener lista de capítulos
-            chapters = self.get_chapters_list(manga_url)
+            with metrics.stage('extraccion'):
+                chapters = self.get_chapters_list(manga_url)
             if not chapters:
                 self.logger.error("No se pudieron obtener los capítulos")
                 return False
@@ -542,129 +744,246 @@ class EdgeMangaDownloader:
             else:
                 chapters = [ch for ch in chapters if ch[0] >= start_chapter]
             
-            self.logger.info(f"Capítulos a procesar: {len(chapters)}")
-            
-            pdf_files = []
-            successful_chapters = 0
+            # Al actualizar solo interesan los capítulos nuevos o cambiados; los que
+            # cambian de URL se vuelven a extraer aunque su manifiesto esté completo
+            changed = set()
+            if update:
+                pending = record.pending(chapters, output_format, output_dir)
+                for (chapter_num, _, _), reason in pending:
+                    self.logger.info(f"🆕 Capítulo {chapter_num}: {reason}")
+                changed = {chapter[0] for chapter, reason in pending if reason == 'cambiado'}
+                chapters = [chapter for chapter, _ in pending]
             
-            # Procesar cada capítulo
-            for i, (chapter_num, chapter_title, chapter_url) in enumerate(chapters, 1):
-                chapter_start_time = time.time()
-                self.logger.info(f"[{i}/{len(chapters)}] Procesando capítulo {chapter_num}: {chapter_title}")
+            self.logger.info(f"Capítulos a procesar: {len(chapters)}")
+            metrics.count('capitulos', len(chapters))
+            
+            total = len(chapters)
+            
+            # La portada se guarda una sola vez y solo va al archivo unificado
+            cover_pdf = None
+            if cover_path and output_format == "pdf":
+                cover_pdf = self.build_cover_pdf(cover_path, pdfs_dir)
+            
+            # Si cambia la codificación de páginas hay que regenerar los PDFs
+            # (la predeterminada no cambia la clave; CBZ y EPUB no recodifican)
+            page_encoding = self.pdf_engine.page_encoding
+            output_key = f"|{page_encoding}" if output_format == "pdf" and page_encoding != "jpeg" else ""
+            
+            # Etapa 1: extraer URLs de imágenes con el navegador
+            def scrape_stage(job):
+                job['start'] = time.time()
+                job['chapter_dir'] = os.path.join(manga_dir, f"capitulo_{job['number']}")
+                job['output_path'] = os.path.join(output_dir, f"capitulo_{job['number']}.{output_format}")
+                self.logger.info(f"[{job['index']}/{total}] Procesando capítulo {job['number']}: {job['title']}")
                 
-                # Crear directorio del capítulo
-                chapter_dir = os.path.join(manga_dir, f"capitulo_{chapter_num}")
+                # Capítulos completos según su manifiesto no necesitan navegador
+                manifest = ChapterManifest(job['chapter_dir'])
+                if job['number'] not in changed and manifest.is_complete():
+                    if manifest.pdf_up_to_date(job['output_path'], output_key):
+                        self.logger.info(f"Capítulo {job['number']} ya está al día, se omite")
+                        metrics.count('capitulos_omitidos')
+                        job['output'] = job['output_path']
+                        job['skip'] = True
+                        return job
+                    job['image_urls'] = manifest.image_urls
+                    return job
                 
-                # Obtener imágenes del capítulo
-                self.logger.info(f"Obteniendo imágenes del capítulo: {chapter_url}")
-                image_urls = self.get_chapter_images(chapter_url)
+                self.logger.info(f"Obteniendo imágenes del capítulo: {job['url']}")
+                job['image_urls'] = self.get_chapter_images(job['url'])
                 
-                if not image_urls:
-                    self.logger.warning(f"No se encontraron imágenes para el capítulo {chapter_num}")
-                    continue
+                if not job['image_urls']:
+                    self.logger.warning(f"No se encontraron imágenes para el capítulo {job['number']}")
+                    return None
+                return job
+            
+            # Etapa 2: descargar las imágenes del capítulo
+            def download_stage(job):
+                if job.get('skip'):
+                    return job
                 
-                # Descargar imágenes
-                self.logger.info(f"Descargando {len(image_urls)} imágenes del capítulo {chapter_num}")
-                downloaded_images = self.download_chapter_images(chapter_dir, image_urls)
+                self.logger.info(f"Descargando {len(job['image_urls'])} imágenes del capítulo {job['number']}")
+                job['images'] = self.download_chapter_images(job['chapter_dir'], job['image_urls'],
+                                                             (-priority, job['index']))
                 
-                if not downloaded_images:
-                    self.logger.warning(f"No se descargaron imágenes para el capítulo {chapter_num}")
-                    continue
+                if not job['images']:
+                    self.logger.warning(f"No se descargaron imágenes para el capítulo {job['number']}")
+                    return None
                 
-                # Crear PDF del capítulo
-                pdf_filename = f"capitulo_{chapter_num}.pdf"
-                pdf_path = os.path.join(pdfs_dir, pdf_filename)
+                # A la biblioteca ya, aunque luego falle la conversión o se interrumpa la ejecución
+                record.record_download(job['number'], job['title'], job['url'], job['chapter_dir'])
+                return job
+            
+            # Etapa 3: crear el PDF (o CBZ / EPUB) del capítulo
+            def encode_stage(job):
+                if job.get('skip'):
+                    return job
                 
-                if self.images_to_pdf(downloaded_images, pdf_path, cover_path):
-                    pdf_files.append(pdf_path)
-                    successful_chapters += 1
-                    
-                    chapter_time = time.time() - chapter_start_time
-                    self.logger.info(f"✅ Capítulo {chapter_num} completado en {chapter_time:.1f}s")
+                output_path = job['output_path']
+                if output_format == "pdf":
+                    created = self.images_to_pdf(job['images'], output_path)
                 else:
-                    self.logger.error(f"❌ Error creando PDF del capítulo {chapter_num}")
-            
-            # Crear PDF unificado
-            if pdf_files:
-                unified_pdf = os.path.join(manga_dir, f"{manga_id}_completo.pdf")
-                self.merge_pdfs(pdf_files, unified_pdf)
+                    created = self.images_to_archive(job['images'], output_path, output_format,
+                                                     job['title'], manga_name, job['number'])
+                if not created:
+                    self.logger.error(f"❌ Error creando {output_format.upper()} del capítulo {job['number']}")
+                    return None
+                
+                # Solo se da por al día si no faltó ninguna página
+                if len(job['images']) == len(job['image_urls']):
+                    ChapterManifest(job['chapter_dir']).record_pdf(output_path, output_key)
+                job['output'] = output_path
+                metrics.count('capitulos_creados')
+                chapter_time = time.time() - job['start']
+                self.logger.info(f"✅ Capítulo {job['number']} completado en {chapter_time:.1f}s")
+                return job
+            
+            # Cada etapa se cronometra por capítulo; el arranque del navegador y las
+            # esperas de página ocurridas dentro se atribuyen también al capítulo
+            def timed(stage, func):
+                def run(job):
+                    chapter = f"capitulo_{job['number']}"
+                    with metrics.for_chapter(chapter), metrics.stage(stage, chapter):
+                        return func(job)
+                return run
+            
+            # Mientras se extrae el capítulo N+1 se descarga el N y se codifica el N-1
+            pipeline = StagePipeline([
+                ('extraer', timed('extraccion', scrape_stage), self.scrape_workers),
+                ('descargar', timed('descarga', download_stage), self.download_workers),
+                ('codificar', timed('codificacion', encode_stage), self.encode_workers),
+            ], queue_size=self.pipeline_queue_size, logger=self.logger)
+            
+            jobs = [
+                {'index': i, 'number': chapter_num, 'title': chapter_title, 'url': chapter_url}
+                for i, (chapter_num, chapter_title, chapter_url) in enumerate(chapters, 1)
+            ]
+            completed = []
+            if jobs:
+                # Rendimiento de las descargas en el registro mientras dura la ejecución
+                # (con recursos compartidos lo gestiona el propietario de la telemetría)
+                if self._shared_with is None:
+                    self.telemetry.start_reporter()
+                try:
+                    completed = sorted(pipeline.run(jobs), key=lambda job: job['index'])
+                finally:
+                    if self._shared_with is None:
+                        self.telemetry.stop_reporter()
+            else:
+                self.logger.info("📭 No hay capítulos nuevos")
+            
+            for job in completed:
+                record.record_chapter(job['number'], job['title'], job['url'], output_format, job['output'],
+                                      job['chapter_dir'])
+            record.save(manga_url)
+            
+            successful_chapters = len(completed)
+            unified_file = os.path.join(manga_dir, f"{manga_id}_completo.{output_format}")
+            if update:
+                # El unificado reúne todo lo registrado, no solo lo procesado ahora;
+                # los PDF nuevos al final se añaden sin reescribir el archivo
+                chapter_outputs = [(entry['number'], entry['title'], entry['path'])
+                                   for entry in record.outputs(output_format)]
+            else:
+                chapter_outputs = [(job['number'], job['title'], job['output']) for job in completed]
+            output_files = [path for _, _, path in chapter_outputs]
+            
+            # Crear archivo unificado (al actualizar sin novedades solo si falta)
+            if output_files and (completed or not update or not os.path.exists(unified_file)):
+                with metrics.stage('combinacion'):
+                    if output_format == "pdf":
+                        merged = self.merge_pdfs(([cover_pdf] if cover_pdf else []) + output_files, unified_file)
+                    else:
+                        # Copia directa de las imágenes de cada capítulo, con un marcador por capítulo
+                        merged = self.merge_archives(output_files, unified_file, output_format, manga_name, cover_path,
+                                                     [f"Capítulo {number}: {title}" for number, title, _ in chapter_outputs])
+                if merged:
+                    record.record_unified(output_format, unified_file)
+            
+            metrics.finish()
+            self.export_metrics(manga_dir)
             
             # Estadísticas finales
             total_time = time.time() - start_time
             self.logger.info("=" * 50)
             self.logger.info("🎉 DESCARGA COMPLETADA CON EDGE")
             self.logger.info(f"📚 Capítulos procesados: {successful_chapters}/{len(chapters)}")
-            self.logger.info(f"📄 PDFs individuales: {len(pdf_files)}")
-            if pdf_files:
-                self.logger.info(f"📁 PDF unificado: {unified_pdf}")
+            self.logger.info(f"📄 {output_format.upper()} individuales: {len(output_files)}")
+            if output_files:
+                self.logger.info(f"📁 {output_format.upper()} unificado: {unified_file}")
+            for wait_name, wait in self.readiness.summary().items():
+                self.logger.info(f"⏳ Espera {wait_name}: {wait['count']} veces, media {wait['avg']:.1f}s, "
+                                 f"máx {wait['max']:.1f}s, agotadas {wait['timeouts']}")
+            cache_stats = self.http_cache.stats
+            if self.blobs:
+                blob_stats = self.blobs.stats
+                self.logger.info(f"🧱 Almacén de imágenes: {blob_stats['linked']} enlazadas sin descargar, "
+                                 f"{blob_stats['duplicates']} duplicadas, "
+                                 f"{blob_stats['bytes_saved'] / (1024 * 1024):.1f} MB ahorrados")
+            self.logger.info(f"🗂️ Caché HTTP: {cache_stats['hits']} sin cambios, {cache_stats['misses']} descargas completas")
+            for host, transfer in self.get_transfer_stats()['hosts'].items():
+                self.logger.info(f"🌐 {host}: {transfer['pages']} páginas, {transfer['bytes'] / (1024 * 1024):.1f} MB, "
+                                 f"TTFB p50 ≤ {transfer['ttfb']['p50']}s p95 ≤ {transfer['ttfb']['p95']}s, "
+                                 f"reintentos {transfer['retries']}, errores {transfer['errors']}")
+            run_metrics = metrics.snapshot()
+            self.logger.info("⏱️ Etapas: " + ", ".join(
+                f"{stage} {seconds:.1f}s" for stage, seconds in run_metrics['stages'].items()))
+            counters = run_metrics['counters']
+            self.logger.info(f"📈 Páginas: {counters.get('paginas', 0)} "
+                             f"({counters.get('bytes', 0) / (1024 * 1024):.1f} MB), "
+                             f"reintentos {counters.get('reintentos', 0)}, fallos {counters.get('fallos', 0)}")
             self.logger.info(f"⏱️ Tiempo total: {total_time/60:.1f} minutos")
             self.logger.info("=" * 50)
             
-            return successful_chapters > 0
+            return successful_chapters > 0 or (update and not chapters)
             
         except Exception as e:
             self.logger.error(f"Error en descarga completa: {str(e)}")
             return False
 
+    def get_transfer_stats(self) -> dict:
+        """Telemetría de transferencias: por host (peticiones, bytes, reintentos,
+        histogramas de TTFB y latencia) y rendimiento en vivo (bytes/s, páginas/s)"""
+        return self.telemetry.stats()
+
+    def export_metrics(self, manga_dir: str):
+        """Guardar las métricas de la ejecución: metricas.jsonl y el textfile de Prometheus
+
+        La telemetría de transferencia solo se incluye si es propia: en un lote
+        la comparten todos los títulos y la exporta el lote una sola vez.
+        """
+        extra_lines = None
+        if self._shared_with is None:
+            extra_lines = self.telemetry.prometheus_lines(PROMETHEUS_PREFIX, {'manga': self.metrics.run_name})
+        try:
+            self.metrics.write_jsonl(os.path.join(manga_dir, "metricas.jsonl"))
+            self.metrics.write_prometheus(
+                self.metrics_textfile or os.path.join(manga_dir, "metricas.prom"),
+                extra_lines=extra_lines
+            )
+        except OSError as e:
+            self.logger.warning(f"No se pudieron guardar las métricas: {e}")
+
     def cleanup(self):
-        """Limpiar recursos"""
+        """Limpiar recursos (los compartidos con otro descargador los cierra él)"""
         if self.driver:
             try:
                 self.driver.quit()
             except:
                 pass
+        if self._shared_with is not None:
+            return
+        self.driver_pool.close()
+        if self._owns_scheduler:
+            self.scheduler.shutdown()
+        if self.async_engine:
+            self.async_engine.close()
+        self.http_cache.close()
+        self.pdf_engine.close()
+        if self.blobs:
+            self.blobs.flush()
+        self.library.close()
         self.session.close()
 
     def combine_all_pdfs(self, manga_dir, manga_id):
-        """Combinar TODOS los PDFs individuales en un archivo final"""
-        try:
-            pdf_dir = os.path.join(manga_dir, "pdfs")
-            
-            if not os.path.exists(pdf_dir):
-                self.logger.error("❌ Directorio de PDFs no encontrado")
-                return False
-            
-            # Obtener todos los PDFs individuales
-            pdf_files = []
-            for file in os.listdir(pdf_dir):
-                if file.startswith('capitulo_') and file.endswith('.pdf'):
-                    pdf_files.append(os.path.join(pdf_dir, file))
-            
-            if not pdf_files:
-                self.logger.error("❌ No se encontraron PDFs individuales para combinar")
-                return False
-            
-            # Ordenar PDFs por número de capítulo
-            def extract_chapter_number(filename):
-                try:
-                    base_name = os.path.basename(filename)
-                    chapter_part = base_name.replace('capitulo_', '').replace('.pdf', '')
-                    return float(chapter_part)
-                except:
-                    return 0
-            
-            pdf_files.sort(key=extract_chapter_number)
-            
-            self.logger.info(f"🔄 Combinando {len(pdf_files)} PDFs...")
-            
-            # Crear PDF unificado usando el método existente
-            output_path = os.path.join(manga_dir, f"{manga_id}_completo.pdf")
-            
-            success = self.merge_pdfs(pdf_files, output_path)
-            
-            if success and os.path.exists(output_path):
-                file_size = os.path.getsize(output_path)
-                file_size_mb = file_size / (1024 * 1024)
-                
-                self.logger.info(f"🎉 PDF COMPLETO REGENERADO: {output_path}")
-                self.logger.info(f"📊 Tamaño: {file_size_mb:.2f} MB")
-                self.logger.info(f"📚 Capítulos incluidos: {len(pdf_files)}")
-                
-                return True
-            else:
-                self.logger.error("❌ Error: El archivo PDF no se creó correctamente")
-                return False
-                
-        except Exception as e:
-            self.logger.error(f"❌ Error combinando PDFs: {str(e)}")
-            return False
\ No newline at end of file
+        """Combinar TODOS los PDFs individuales en un archivo final (ver PdfEngine.combine_all_pdfs)"""
+        return self.pdf_engine.combine_all_pdfs(manga_dir, manga_id, self.library)
@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Etapas medidas en download_manga
+STAGES = ('navegador', 'espera', 'extraccion', 'descarga', 'codificacion', 'combinacion')
+
+# Contadores por capítulo y por ejecución
+COUNTERS = ('paginas', 'bytes', 'reintentos', 'fallos', 'paginas_omitidas',
+            'paginas_enlazadas', 'capitulos', 'capitulos_creados', 'capitulos_omitidos')
+
+PROMETHEUS_PREFIX = "manga_downloader"
+
+_current = threading.local()
+
+
+def current_run() -> Optional["RunMetrics"]:
+    """Métricas de la ejecución que está midiendo una etapa en este hilo, si hay alguna
+
+    Sirve para los recursos compartidos entre títulos (el pool de navegadores):
+    lo que hacen dentro de una etapa se atribuye al título que los usa.
+    """
+    return getattr(_current, 'run', None)
+
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def write_textfile(path: str, lines: List[str]):
+    """Escribir un textfile de Prometheus de forma atómica
+
+    El colector podría leer un archivo a medio escribir: se escribe aparte y se renombra.
+    """
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(temp_path, path)
+
+
+class RunMetrics:
+    """Tiempos por etapa y contadores de una ejecución de download_manga
+
+    Cada medida se asocia a un capítulo (o solo a la ejecución). Los hilos que
+    trabajan para un capítulo pueden declararlo con `for_chapter` para que las
+    medidas anidadas (arranque del navegador, esperas) se le atribuyan.
+    """
+
+    def __init__(self, run_name: str = ""):
+        self.run_name = run_name
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stages: Dict[str, float] = defaultdict(float)
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._chapters: Dict[str, dict] = {}
+
+    def _chapter(self, chapter: str) -> dict:
+        record = self._chapters.get(chapter)
+        if record is None:
+            record = self._chapters[chapter] = {'stages': defaultdict(float), 'counters': defaultdict(int)}
+        return record
+
+    @contextmanager
+    def for_chapter(self, chapter: str):
+        """Atribuir al capítulo las medidas hechas en este hilo sin capítulo explícito"""
+        previous = getattr(_current, 'chapter', None)
+        _current.chapter = chapter
+        try:
+            yield
+        finally:
+            _current.chapter = previous
+
+    def add_time(self, stage: str, seconds: float, chapter: Optional[str] = None):
+        chapter = chapter or getattr(_current, 'chapter', None)
+        with self._lock:
+            self._stages[stage] += seconds
+            if chapter is not None:
+                self._chapter(chapter)['stages'][stage] += seconds
+
+    def count(self, name: str, value: int = 1, chapter: Optional[str] = None):
+        chapter = chapter or getattr(_current, 'chapter', None)
+        with self._lock:
+            self._counters[name] += value
+            if chapter is not None:
+                self._chapter(chapter)['counters'][name] += value
+
+    @contextmanager
+    def stage(self, stage: str, chapter: Optional[str] = None):
+        """Cronometrar un bloque como parte de una etapa (ver current_run)"""
+        previous = getattr(_current, 'run', None)
+        _current.run = self
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            _current.run = previous
+            self.add_time(stage, time.perf_counter() - start, chapter)
+
+    def finish(self):
+        self.finished = time.time()
+
+    @property
+    def duration(self) -> float:
+        return (self.finished or time.time()) - self.started
+
+    def snapshot(self) -> dict:
+        """Copia de los datos: totales de la ejecución y detalle por capítulo"""
+        with self._lock:
+            return {
+                'run': self.run_name,
+                'started': self.started,
+                'duration': self.duration,
+                'stages': dict(self._stages),
+                'counters': dict(self._counters),
+                'chapters': {
+                    chapter: {'stages': dict(record['stages']), 'counters': dict(record['counters'])}
+                    for chapter, record in self._chapters.items()
+                },
+            }
+
+    def write_jsonl(self, path: str):
+        """Añadir una línea por capítulo y una de resumen de la ejecución"""
+        data = self.snapshot()
+        with open(path, 'a', encoding='utf-8') as f:
+            for chapter, record in data['chapters'].items():
+                f.write(json.dumps({'type': 'chapter', 'run': data['run'], 'started': data['started'],
+                                    'chapter': chapter, **record}, ensure_ascii=False) + "\n")
+            f.write(json.dumps({'type': 'run', 'run': data['run'], 'started': data['started'],
+                                'duration': data['duration'], 'stages': data['stages'],
+                                'counters': data['counters'], 'chapters': len(data['chapters'])},
+                               ensure_ascii=False) + "\n")
+
+    def write_prometheus(self, path: str, extra_lines: Optional[List[str]] = None):
+        """Archivo de texto para el textfile collector de node_exporter (escritura atómica)"""
+        data = self.snapshot()
+        run = data['run']
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {PROMETHEUS_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{_escape_label(val)}"' for key, val in labels.items())
+                lines.append(f"{PROMETHEUS_PREFIX}_{name}{{{label_text}}} {value}")
+
+        metric('run_duration_seconds', 'gauge', "Duración de la última ejecución",
+               [({'manga': run}, f"{data['duration']:.3f}")])
+        metric('run_start_timestamp_seconds', 'gauge', "Inicio de la última ejecución",
+               [({'manga': run}, f"{data['started']:.0f}")])
+        metric('run_stage_seconds', 'gauge', "Tiempo acumulado por etapa en la última ejecución",
+               [({'manga': run, 'stage': stage}, f"{data['stages'].get(stage, 0.0):.3f}") for stage in STAGES])
+        metric('run_total', 'gauge', "Contadores de la última ejecución",
+               [({'manga': run, 'counter': name}, data['counters'].get(name, 0)) for name in COUNTERS])
+        metric('chapter_stage_seconds', 'gauge', "Tiempo por etapa y capítulo en la última ejecución",
+               [({'manga': run, 'chapter': chapter, 'stage': stage}, f"{seconds:.3f}")
+                for chapter, record in sorted(data['chapters'].items())
+                for stage, seconds in sorted(record['stages'].items())])
+        metric('chapter_total', 'gauge', "Contadores por capítulo en la última ejecución",
+               [({'manga': run, 'chapter': chapter, 'counter': name}, value)
+                for chapter, record in sorted(data['chapters'].items())
+                for name, value in sorted(record['counters'].items())])
+
+        lines.extend(extra_lines or [])
+        write_textfile(path, lines)
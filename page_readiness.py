@@ -0,0 +1,160 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Optional
+from urllib.parse import urlparse
+
+# Selenium se importa dentro de cada espera: solo se necesita con un navegador
+# abierto y cargarlo al arrancar encarece las ejecuciones sin Edge
+
+# Tiempos máximos de espera (segundos) por tipo de espera
+DEFAULT_TIMEOUTS = {'selector': 10.0, 'images': 15.0, 'network': 5.0}
+
+# Ajustes por sitio; se combinan con DEFAULT_TIMEOUTS
+SITE_TIMEOUTS = {
+    'bato.to': {'selector': 12.0, 'images': 20.0},
+    'xbato.com': {'selector': 12.0, 'images': 20.0},
+}
+
+# Número de recursos cargados según la Performance API del navegador
+RESOURCE_COUNT_SCRIPT = """
+return [document.readyState, performance.getEntriesByType('resource').length];
+"""
+
+# Imágenes reales (no placeholders data:) dentro de un contenedor
+IMAGE_COUNT_SCRIPT = """
+const container = document.querySelector(arguments[0]);
+if (!container) return -1;
+return Array.from(container.querySelectorAll('img[src]'))
+    .filter(img => img.src && !img.src.includes('data:')).length;
+"""
+
+
+class PageReadiness:
+    """Esperas basadas en eventos de la página en lugar de time.sleep fijos
+
+    Cada espera termina en cuanto se cumple su condición y registra cuánto
+    tardó, para poder ajustar los tiempos máximos por sitio.
+    """
+
+    def __init__(self, site_timeouts: Optional[Dict[str, Dict[str, float]]] = None,
+                 poll_interval: float = 0.2, logger: Optional[logging.Logger] = None,
+                 on_wait: Optional[Callable[[str, float], None]] = None):
+        self.site_timeouts = dict(SITE_TIMEOUTS)
+        self.site_timeouts.update(site_timeouts or {})
+        self.poll_interval = poll_interval
+        self.logger = logger or logging.getLogger(__name__)
+        # on_wait(espera, segundos) tras cada espera, para las métricas de la ejecución
+        self.on_wait = on_wait
+        self._lock = threading.Lock()
+        # (host, espera) -> lista de (segundos, agotó el tiempo)
+        self._waits = defaultdict(list)
+
+    def timeout_for(self, url: str, kind: str) -> float:
+        host = urlparse(url).netloc.lower()
+        for site, timeouts in self.site_timeouts.items():
+            if host == site or host.endswith('.' + site):
+                if kind in timeouts:
+                    return timeouts[kind]
+        return DEFAULT_TIMEOUTS[kind]
+
+    def _record(self, url: str, kind: str, start: float, timed_out: bool):
+        elapsed = time.monotonic() - start
+        with self._lock:
+            self._waits[(urlparse(url).netloc, kind)].append((elapsed, timed_out))
+        if self.on_wait:
+            self.on_wait(kind, elapsed)
+        if timed_out:
+            self.logger.warning(f"Espera '{kind}' agotada tras {elapsed:.1f}s")
+
+    def wait_for_selector(self, driver, url: str, css_selector: str) -> bool:
+        """Esperar a que exista algún elemento que cumpla el selector"""
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        start = time.monotonic()
+        try:
+            WebDriverWait(driver, self.timeout_for(url, 'selector'), self.poll_interval).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, css_selector))
+            )
+            self._record(url, 'selector', start, False)
+            return True
+        except TimeoutException:
+            self._record(url, 'selector', start, True)
+            return False
+
+    def wait_for_image_count(self, driver, url: str, container_selector: str,
+                             stable_for: float = 1.0) -> int:
+        """Esperar a que el número de imágenes del contenedor deje de crecer
+
+        Devuelve el número de imágenes, o 0 si el contenedor no existe.
+        """
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        start = time.monotonic()
+        state = {'count': None, 'since': start}
+
+        def stabilized(d):
+            count = d.execute_script(IMAGE_COUNT_SCRIPT, container_selector)
+            if count < 0:
+                # Sin contenedor no hay nada que esperar aquí
+                state['count'] = 0
+                return True
+            now = time.monotonic()
+            if count != state['count']:
+                state['count'] = count
+                state['since'] = now
+                return False
+            return count > 0 and now - state['since'] >= stable_for
+
+        try:
+            WebDriverWait(driver, self.timeout_for(url, 'images'), self.poll_interval).until(stabilized)
+            self._record(url, 'images', start, False)
+        except TimeoutException:
+            self._record(url, 'images', start, True)
+        return state['count'] or 0
+
+    def wait_for_network_idle(self, driver, url: str, idle_for: float = 0.5) -> bool:
+        """Esperar a que el documento termine y no se pidan recursos nuevos"""
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        start = time.monotonic()
+        state = {'count': -1, 'since': start}
+
+        def idle(d):
+            ready_state, count = d.execute_script(RESOURCE_COUNT_SCRIPT)
+            now = time.monotonic()
+            if ready_state != 'complete' or count != state['count']:
+                state['count'] = count
+                state['since'] = now
+                return False
+            return now - state['since'] >= idle_for
+
+        try:
+            WebDriverWait(driver, self.timeout_for(url, 'network'), self.poll_interval).until(idle)
+            self._record(url, 'network', start, False)
+            return True
+        except TimeoutException:
+            self._record(url, 'network', start, True)
+            return False
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Resumen de esperas por host y tipo: número, media, máximo y agotadas"""
+        with self._lock:
+            waits = dict(self._waits)
+
+        result = {}
+        for (host, kind), samples in waits.items():
+            durations = [elapsed for elapsed, _ in samples]
+            result[f"{host}/{kind}"] = {
+                'count': len(samples),
+                'avg': sum(durations) / len(durations),
+                'max': max(durations),
+                'timeouts': sum(1 for _, timed_out in samples if timed_out),
+            }
+        return result
@@ -1,43 +1,49 @@
 #!/usr/bin/env python3
 """
 📄 CONVERSOR SIMPLE A PDF
-🔧 Convierte imágenes WebP a PDF directamente
+🔧 Convierte las imágenes descargadas a PDF directamente (o a CBZ / EPUB con --formato)
 """
 
+import argparse
 import os
 from pathlib import Path
 from PIL import Image
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
-from reportlab.lib.utils import ImageReader
 import io
+from formats import OUTPUT_FORMATS
+from library_store import OUTPUT_DIRS, open_library
+from pdf_pages import PASSTHROUGH_MODES, EncodedJPEG, page_reader, prepare_page
 
-def convert_images_to_pdf_simple(chapter_num, image_files, output_dir):
-    """Convertir imágenes a PDF usando método simple"""
+def convert_images_to_pdf_simple(chapter_num, image_files, output_dir, encoding='jpeg'):
+    """Convertir imágenes a PDF usando método simple
+
+    Las páginas se escalan en el propio PDF, así que los JPEG RGB o en escala
+    de grises se incrustan sin recodificar; el resto se codifica según
+    `encoding` ('jpeg' calidad 85, 'near_lossless' o 'lossless').
+    """
     
     if not image_files:
         print(f"❌ No hay imágenes para capítulo {chapter_num}")
         return None
     
     # Crear path de salida
-    output_path = output_dir / f"capitulo_{chapter_num:03d}.pdf"
+    output_path = output_dir / f"capitulo_{chapter_num:03}.pdf"
     
     print(f"📄 Creando PDF: {output_path}")
     
     try:
         # Crear canvas PDF
         c = canvas.Canvas(str(output_path))
+        passthrough = transcoded = 0
         
         for i, image_file in enumerate(image_files, 1):
             try:
                 # Abrir imagen
                 with Image.open(image_file) as img:
-                    # Convertir a RGB si es necesario
-                    if img.mode != 'RGB':
-                        img = img.convert('RGB')
-                    
                     # Obtener dimensiones
                     width, height = img.size
+                    is_passthrough = img.format == 'JPEG' and img.mode in PASSTHROUGH_MODES
                     
                     # Calcular escala para ajustar a página
                     page_width = 595  # A4 width en puntos
@@ -54,16 +60,28 @@ def convert_images_to_pdf_simple(chapter_num, image_files, output_dir):
                     x = (page_width - new_width) / 2
                     y = (page_height - new_height) / 2
                     
-                    # Convertir imagen a bytes
-                    img_buffer = io.BytesIO()
-                    img.save(img_buffer, format='JPEG', quality=85)
-                    img_buffer.seek(0)
+                    if is_passthrough or encoding != 'jpeg':
+                        # JPEG original tal cual, o codificación sin pérdida / casi sin pérdida
+                        reader = page_reader(prepare_page(str(image_file), width, height,
+                                                          encoding, is_passthrough))
+                    else:
+                        # Convertir imagen a bytes
+                        if img.mode != 'RGB':
+                            img = img.convert('RGB')
+                        img_buffer = io.BytesIO()
+                        img.save(img_buffer, format='JPEG', quality=85)
+                        reader = EncodedJPEG(img_buffer.getvalue())
                     
-                    # Agregar imagen al PDF
+                    # Agregar imagen al PDF (el JPEG en memoria se incrusta sin decodificarlo otra vez)
                     c.setPageSize((page_width, page_height))
-                    c.drawImage(ImageReader(img_buffer), x, y, width=new_width, height=new_height)
+                    c.drawImage(reader, x, y, width=new_width, height=new_height)
                     c.showPage()
                     
+                    if is_passthrough:
+                        passthrough += 1
+                    else:
+                        transcoded += 1
+                    
                     print(f"   ✅ Página {i}/{len(image_files)}: {Path(image_file).name}")
                     
             except Exception as e:
@@ -76,6 +94,7 @@ def convert_images_to_pdf_simple(chapter_num, image_files, output_dir):
         # Verificar tamaño
         size_mb = output_path.stat().st_size / (1024 * 1024)
         print(f"✅ PDF creado: {output_path.name} ({size_mb:.1f} MB)")
+        print(f"   📊 Páginas sin recodificar: {passthrough}, recodificadas ({encoding}): {transcoded}")
         
         return str(output_path)
         
@@ -83,67 +102,94 @@ def convert_images_to_pdf_simple(chapter_num, image_files, output_dir):
         print(f"❌ Error creando PDF: {e}")
         return None
 
+def convert_images_to_archive_simple(chapter_num, image_files, output_dir, output_format):
+    """Empaquetar las imágenes en CBZ o EPUB tal cual, sin decodificarlas"""
+    
+    output_path = output_dir / f"capitulo_{chapter_num:03}.{output_format}"
+    print(f"📦 Creando {output_format.upper()}: {output_path}")
+    
+    try:
+        from comic_archive import images_to_archive
+        pages = images_to_archive([str(f) for f in image_files], str(output_path), output_format,
+                                  f"Capítulo {chapter_num}", number=chapter_num)
+        size_mb = output_path.stat().st_size / (1024 * 1024)
+        print(f"✅ {output_format.upper()} creado: {output_path.name} ({pages} páginas, {size_mb:.1f} MB)")
+        return str(output_path)
+        
+    except Exception as e:
+        print(f"❌ Error creando {output_format.upper()}: {e}")
+        return None
+
 def main():
     """Convertir todos los capítulos descargados"""
     
-    print("📄 CONVERSOR SIMPLE A PDF")
+    parser = argparse.ArgumentParser(description="Conversor simple de capítulos descargados")
+    parser.add_argument('--formato', default='pdf', choices=OUTPUT_FORMATS,
+                        help="pdf, o cbz / epub para empaquetar las imágenes sin recodificar")
+    output_format = parser.parse_args().formato
+    label = output_format.upper()
+    
+    print(f"📄 CONVERSOR SIMPLE A {label}")
     print("=" * 50)
     
     downloads_dir = Path("downloads")
     
-    # Crear directorio PDFs
-    pdf_dir = downloads_dir / "pdfs"
-    pdf_dir.mkdir(exist_ok=True)
+    # Capítulos y páginas según la biblioteca (cualquier extensión de imagen)
+    library = open_library(str(downloads_dir))
+    chapters = list(library.chapter_pages())
     
-    # Buscar directorios de capítulos
-    chapter_dirs = sorted(downloads_dir.glob("capitulo_*"))
-    
-    if not chapter_dirs:
+    if not chapters:
         print("❌ No se encontraron capítulos descargados")
+        library.close()
         return
     
-    print(f"📁 Encontrados {len(chapter_dirs)} capítulos:")
+    print(f"📁 Encontrados {len(chapters)} capítulos:")
     
     converted = 0
-    for chapter_dir in chapter_dirs:
+    created_files = []
+    for chapter in chapters:
         try:
-            # Extraer número
-            chapter_num = int(chapter_dir.name.split('_')[1])
-            
-            # Buscar imágenes
-            image_files = sorted(chapter_dir.glob("pagina_*.webp"))
+            chapter_num = int(chapter['number']) if chapter['number'].is_integer() else chapter['number']
+            image_files = chapter['files']
             
             print(f"\n📖 Capítulo {chapter_num}: {len(image_files)} imágenes")
             
-            if not image_files:
-                print("   ⚠️ Sin imágenes")
-                continue
+            # Crear directorio de salida del título (pdfs/, cbz/ o epub/)
+            pdf_dir = Path(chapter['title_dir']) / OUTPUT_DIRS[output_format]
+            pdf_dir.mkdir(exist_ok=True)
             
             # Convertir
-            pdf_path = convert_images_to_pdf_simple(chapter_num, image_files, pdf_dir)
+            if output_format == "pdf":
+                pdf_path = convert_images_to_pdf_simple(chapter_num, image_files, pdf_dir)
+            else:
+                pdf_path = convert_images_to_archive_simple(chapter_num, image_files, pdf_dir, output_format)
             
             if pdf_path:
+                library.record_artifact(chapter['title_id'], chapter['chapter_id'], output_format,
+                                        pdf_path, len(image_files))
+                created_files.append(pdf_path)
                 converted += 1
             
         except Exception as e:
-            print(f"❌ Error con {chapter_dir.name}: {e}")
+            print(f"❌ Error con {os.path.basename(chapter['chapter_dir'])}: {e}")
+    
+    library.close()
     
     print(f"\n{'='*50}")
     print(f"📊 RESUMEN FINAL:")
-    print(f"   📁 Capítulos procesados: {len(chapter_dirs)}")
-    print(f"   ✅ PDFs creados: {converted}")
+    print(f"   📁 Capítulos procesados: {len(chapters)}")
+    print(f"   ✅ {label} creados: {converted}")
     
     if converted > 0:
-        print(f"\n📄 PDFs creados en: {pdf_dir}")
+        print(f"\n📄 {label} creados:")
         
         # Listar archivos finales
-        pdf_files = sorted(pdf_dir.glob("*.pdf"))
         total_size = 0
         
-        for pdf_file in pdf_files:
-            size_mb = pdf_file.stat().st_size / (1024 * 1024)
+        for pdf_file in created_files:
+            size_mb = os.path.getsize(pdf_file) / (1024 * 1024)
             total_size += size_mb
-            print(f"   📖 {pdf_file.name} ({size_mb:.1f} MB)")
+            print(f"   📖 {pdf_file} ({size_mb:.1f} MB)")
         
         print(f"\n💾 Tamaño total: {total_size:.1f} MB")
 
@@ -0,0 +1,288 @@
+import logging
+import multiprocessing
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from formats import PAGE_ENCODINGS
+
+# PDF de la portada, junto a los PDFs de capítulos; solo se incluye en el PDF unificado
+COVER_PDF_NAME = "portada.pdf"
+
+
+class PdfEngine:
+    """Conversión de imágenes a PDF / CBZ / EPUB y combinación de volúmenes
+
+    No depende del navegador ni de la red: las herramientas sin conexión
+    (convert_to_pdf, regenerate_complete_pdf) lo usan directamente. PIL,
+    reportlab y PyPDF2 se importan al usarse por primera vez, de modo que
+    importar este módulo no cuesta nada al arrancar.
+    """
+
+    def __init__(self, page_workers: Optional[int] = None, page_encoding: str = "jpeg",
+                 logger: Optional[logging.Logger] = None):
+        # Procesos para preparar páginas del PDF (1 = en el propio proceso)
+        self.page_workers = page_workers if page_workers is not None else (os.cpu_count() or 1)
+        self._page_pool = None
+        self._page_pool_lock = threading.Lock()
+
+        # Codificación de las páginas que no se pueden incrustar tal cual (ver pdf_pages)
+        if page_encoding not in PAGE_ENCODINGS:
+            raise ValueError(f"Codificación de página no válida: {page_encoding}")
+        self.page_encoding = page_encoding
+
+        self.logger = logger or logging.getLogger(__name__)
+
+    def _get_page_pool(self) -> Optional[ProcessPoolExecutor]:
+        """Pool de procesos compartido para decodificar/redimensionar/codificar páginas"""
+        if self.page_workers <= 1:
+            return None
+        with self._page_pool_lock:
+            if self._page_pool is None:
+                # spawn y no fork: a estas alturas ya corren el planificador, el bucle
+                # asíncrono y otros hilos, y un hijo bifurcado puede heredar un lock tomado
+                self._page_pool = ProcessPoolExecutor(max_workers=self.page_workers,
+                                                      mp_context=multiprocessing.get_context('spawn'))
+            return self._page_pool
+
+    def build_cover_pdf(self, cover_path: str, pdfs_dir: str) -> Optional[str]:
+        """PDF de una página con la portada, reutilizado mientras la imagen no cambie"""
+        cover_pdf = os.path.join(pdfs_dir, COVER_PDF_NAME)
+        if os.path.exists(cover_pdf) and os.path.getmtime(cover_pdf) >= os.path.getmtime(cover_path):
+            return cover_pdf
+
+        self.logger.info("Creando PDF de portada")
+        return cover_pdf if self.images_to_pdf([cover_path], cover_pdf) else None
+
+    def images_to_pdf(self, image_files: List[str], output_path: str, cover_image: Optional[str] = None,
+                      report: Optional[dict] = None) -> bool:
+        """Convertir imágenes a PDF con ancho uniforme
+
+        Los JPEG que ya tienen el ancho objetivo se incrustan sin recodificar;
+        si se pasa `report`, se rellena con las páginas incrustadas tal cual
+        ('passthrough') y las recodificadas ('transcoded').
+        """
+        try:
+            from reportlab.pdfgen import canvas
+            from image_index import index_images, page_size
+            from pdf_pages import can_passthrough, encode_pages, page_reader
+
+            if not image_files:
+                self.logger.warning("No hay imágenes para convertir a PDF")
+                return False
+
+            # Crear lista de imágenes con portada al inicio si existe
+            all_images = []
+            if cover_image and os.path.exists(cover_image):
+                all_images.append(cover_image)
+                self.logger.info("Añadiendo portada al PDF")
+            all_images.extend(image_files)
+
+            # Analizar anchos con el índice de dimensiones (solo cabeceras, cacheado en disco)
+            dimensions = index_images(all_images)
+            widths = [dimensions[image_path]['width'] for image_path in all_images if image_path in dimensions]
+
+            if not widths:
+                self.logger.error("No se pudieron analizar las imágenes")
+                return False
+
+            # Encontrar el ancho más común
+            width_counts = Counter(widths)
+            target_width = width_counts.most_common(1)[0][0]
+
+            self.logger.info(f"Ancho objetivo: {target_width}px (alto original mantenido)")
+
+            # Plan de páginas: (ruta, ancho, alto, incrustar tal cual) a partir del índice
+            plan = []
+            for image_file in all_images:
+                if image_file in dimensions:
+                    page_width, page_height = page_size(dimensions[image_file], target_width)
+                    passthrough = can_passthrough(dimensions[image_file], page_width, page_height)
+                    plan.append((image_file, page_width, page_height, passthrough))
+                else:
+                    self.logger.error(f"Error procesando imagen {image_file}: no se pudo leer la cabecera")
+
+            # Las páginas se preparan en paralelo en el pool de procesos y un único
+            # escritor las va añadiendo al PDF en orden (en memoria, sin temporales)
+            c = None
+            counts = Counter()
+            pages = encode_pages(plan, self._get_page_pool(), self.page_encoding)
+
+            for i, (image_file, page, error) in enumerate(pages):
+                try:
+                    if error is not None:
+                        raise error
+                    kind, _, page_width, page_height = page
+
+                    # Crear/configurar canvas
+                    if c is None:
+                        c = canvas.Canvas(output_path, pagesize=(page_width, page_height))
+
+                    c.setPageSize((page_width, page_height))
+                    c.drawImage(page_reader(page), 0, 0, page_width, page_height)
+                    c.showPage()
+                    counts['passthrough' if kind == 'passthrough' else 'transcoded'] += 1
+
+                    if (i + 1) % 10 == 0:
+                        self.logger.info(f"Procesadas {i + 1}/{len(plan)} imágenes")
+
+                except Exception as e:
+                    self.logger.error(f"Error procesando imagen {image_file}: {e}")
+                    continue
+
+            if report is not None:
+                report['passthrough'] = counts['passthrough']
+                report['transcoded'] = counts['transcoded']
+
+            if c:
+                c.save()
+                self.logger.info(f"PDF creado: {output_path}")
+                self.logger.info(f"Páginas incrustadas sin recodificar: {counts['passthrough']}, "
+                                 f"recodificadas ({self.page_encoding}): {counts['transcoded']}")
+
+                # Verificar tamaño del archivo
+                pdf_size = os.path.getsize(output_path) / (1024 * 1024)  # MB
+                self.logger.info(f"Tamaño del PDF: {pdf_size:.2f} MB")
+                return True
+
+            return False
+
+        except Exception as e:
+            self.logger.error(f"Error creando PDF: {str(e)}")
+            return False
+
+    def merge_pdfs(self, pdf_files: List[str], output_path: str, incremental: bool = True) -> bool:
+        """Combinar múltiples PDFs en uno solo
+
+        La copia se hace en streaming (memoria acotada) y, si el PDF unificado
+        ya tiene los primeros capítulos, solo se le añaden los nuevos.
+        """
+        try:
+            import pdf_merge
+
+            self.logger.info(f"Combinando {len(pdf_files)} PDFs...")
+
+            result = pdf_merge.merge_pdfs(
+                pdf_files, output_path, incremental=incremental,
+                on_added=lambda pdf_file: self.logger.info(f"Añadido: {os.path.basename(pdf_file)}"))
+
+            if result['mode'] == 'unchanged':
+                self.logger.info(f"PDF unificado ya al día: {output_path}")
+            elif result['mode'] == 'appended':
+                self.logger.info(f"PDF unificado ampliado con {result['added']} capítulos nuevos")
+            if result['duplicates']:
+                self.logger.info(f"Imágenes repetidas reutilizadas: {result['duplicates']} "
+                                 f"({result['bytes_saved'] / (1024 * 1024):.2f} MB ahorrados)")
+
+            # Verificar tamaño del archivo final
+            if os.path.exists(output_path):
+                final_size = os.path.getsize(output_path) / (1024 * 1024)  # MB
+                self.logger.info(f"PDF unificado creado: {output_path} ({final_size:.2f} MB, {result['pages']} páginas)")
+                return True
+
+            return False
+
+        except Exception as e:
+            self.logger.error(f"Error combinando PDFs: {str(e)}")
+            return False
+
+    def images_to_archive(self, image_files: List[str], output_path: str, output_format: str,
+                          title: str, series: Optional[str] = None, number=None) -> bool:
+        """Empaquetar las imágenes en CBZ o EPUB sin decodificarlas ni recodificarlas"""
+        try:
+            import comic_archive
+
+            if not image_files:
+                self.logger.warning(f"No hay imágenes para crear el {output_format.upper()}")
+                return False
+
+            pages = comic_archive.images_to_archive(image_files, output_path, output_format, title, series, number)
+            size = os.path.getsize(output_path) / (1024 * 1024)  # MB
+            self.logger.info(f"{output_format.upper()} creado: {output_path} ({pages} páginas, {size:.2f} MB)")
+            return pages > 0
+
+        except Exception as e:
+            self.logger.error(f"Error creando {output_format.upper()}: {str(e)}")
+            return False
+
+    def merge_archives(self, archive_files: List[str], output_path: str, output_format: str, title: str,
+                       cover_image: Optional[str] = None, bookmarks: Optional[List[str]] = None) -> bool:
+        """Volumen CBZ / EPUB unificado: copia de las imágenes de cada capítulo"""
+        try:
+            import comic_archive
+
+            self.logger.info(f"Combinando {len(archive_files)} archivos {output_format.upper()}...")
+            pages = comic_archive.merge_archives(archive_files, output_path, output_format, title,
+                                                 cover_image, bookmarks)
+            final_size = os.path.getsize(output_path) / (1024 * 1024)  # MB
+            self.logger.info(f"{output_format.upper()} unificado creado: {output_path} "
+                             f"({final_size:.2f} MB, {pages} páginas)")
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Error combinando archivos {output_format.upper()}: {str(e)}")
+            return False
+
+    def combine_all_pdfs(self, manga_dir, manga_id, library=None):
+        """Combinar TODOS los PDFs individuales en un archivo final
+
+        Los capítulos y su orden salen del almacén de la biblioteca (`library`,
+        o el de la carpeta de descargas que contiene `manga_dir`).
+        """
+        from library_store import open_library
+        from title_record import TitleRecord
+
+        store = library or open_library(os.path.dirname(os.path.abspath(manga_dir)))
+        try:
+            pdf_dir = os.path.join(manga_dir, "pdfs")
+
+            if not os.path.exists(pdf_dir):
+                self.logger.error("❌ Directorio de PDFs no encontrado")
+                return False
+
+            # PDFs individuales registrados, ya ordenados por número de capítulo
+            record = TitleRecord(store, manga_dir)
+            pdf_files = [entry['path'] for entry in record.outputs('pdf')]
+
+            if not pdf_files:
+                self.logger.error("❌ No se encontraron PDFs individuales para combinar")
+                return False
+
+            self.logger.info(f"🔄 Combinando {len(pdf_files)} PDFs...")
+
+            # La portada (si existe) abre el PDF unificado
+            cover_pdf = os.path.join(pdf_dir, COVER_PDF_NAME)
+
+            # Crear PDF unificado usando el método existente
+            output_path = os.path.join(manga_dir, f"{manga_id}_completo.pdf")
+
+            success = self.merge_pdfs(([cover_pdf] if os.path.exists(cover_pdf) else []) + pdf_files, output_path)
+
+            if success and os.path.exists(output_path):
+                record.record_unified('pdf', output_path)
+                file_size = os.path.getsize(output_path)
+                file_size_mb = file_size / (1024 * 1024)
+
+                self.logger.info(f"🎉 PDF COMPLETO REGENERADO: {output_path}")
+                self.logger.info(f"📊 Tamaño: {file_size_mb:.2f} MB")
+                self.logger.info(f"📚 Capítulos incluidos: {len(pdf_files)}")
+
+                return True
+            else:
+                self.logger.error("❌ Error: El archivo PDF no se creó correctamente")
+                return False
+
+        except Exception as e:
+            self.logger.error(f"❌ Error combinando PDFs: {str(e)}")
+            return False
+        finally:
+            if library is None:
+                store.close()
+
+    def close(self):
+        """Cerrar el pool de procesos de páginas, si llegó a crearse"""
+        if self._page_pool is not None:
+            self._page_pool.shutdown()
+            self._page_pool = None
@@ -0,0 +1,321 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+import PyPDF2
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+# Números fijos del catálogo y del árbol de páginas en el PDF unificado
+CATALOG_NUMBER = 1
+PAGES_NUMBER = 2
+
+INDEX_SUFFIX = ".indice.json"
+
+PDF_HEADER = b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n"
+
+
+def index_path(output_path: str) -> str:
+    """Índice que acompaña al PDF unificado (capítulos incluidos y estructura)"""
+    return os.path.splitext(output_path)[0] + INDEX_SUFFIX
+
+
+def _file_signature(path: str) -> dict:
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+class _PdfStreamWriter:
+    """Escribe objetos PDF directamente en el archivo según se copian
+
+    Solo guarda en memoria el desplazamiento de cada objeto escrito y el hash
+    de cada imagen, así que el consumo no depende del tamaño de los capítulos.
+    Las imágenes idénticas (páginas de créditos repetidas en cada capítulo)
+    se escriben una sola vez y el resto de páginas reutilizan ese objeto.
+    """
+
+    def __init__(self, out, next_number: int, images: Optional[Dict[str, int]] = None):
+        self.out = out
+        self.next_number = next_number
+        self.offsets: Dict[int, int] = {}
+        # hash del contenido de la imagen -> número de objeto ya escrito
+        self.images: Dict[str, int] = images if images is not None else {}
+        self.duplicates = 0
+        self.bytes_saved = 0
+
+    def allocate(self) -> int:
+        number = self.next_number
+        self.next_number += 1
+        return number
+
+    def write_object(self, number: int, value, ref: Callable[[IndirectObject], int]):
+        self.offsets[number] = self.out.tell()
+        self.out.write(f"{number} 0 obj\n".encode())
+        self._write_value(value, ref)
+        self.out.write(b"\nendobj\n")
+
+    def write_raw_object(self, number: int, body: bytes):
+        self.offsets[number] = self.out.tell()
+        self.out.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+
+    def _write_value(self, value, ref):
+        out = self.out
+        if isinstance(value, IndirectObject):
+            out.write(f"{ref(value)} 0 R".encode())
+        elif isinstance(value, StreamObject):
+            # Los datos se copian tal cual (comprimidos), sin decodificar
+            data = value._data
+            self._write_dict(value, ref, length=len(data))
+            out.write(b"\nstream\n")
+            out.write(data)
+            out.write(b"\nendstream")
+        elif isinstance(value, DictionaryObject):
+            self._write_dict(value, ref)
+        elif isinstance(value, ArrayObject):
+            out.write(b"[")
+            for item in value:
+                out.write(b" ")
+                self._write_value(item, ref)
+            out.write(b" ]")
+        else:
+            value.write_to_stream(out, None)
+
+    def _write_dict(self, value: DictionaryObject, ref, length: Optional[int] = None):
+        out = self.out
+        is_page = value.get('/Type') == '/Page'
+        out.write(b"<<")
+        for key, item in value.items():
+            if key == '/Length' and length is not None:
+                continue
+            out.write(b"\n")
+            key.write_to_stream(out, None)
+            out.write(b" ")
+            if is_page and key == '/Parent':
+                # Todas las páginas cuelgan del árbol de páginas del PDF unificado
+                out.write(f"{PAGES_NUMBER} 0 R".encode())
+            else:
+                self._write_value(item, ref)
+        if length is not None:
+            out.write(f"\n/Length {length}".encode())
+        out.write(b"\n>>")
+
+    def _image_digest(self, value) -> Optional[str]:
+        """Hash de una imagen autocontenida (diccionario sin referencias más datos)"""
+        if not isinstance(value, StreamObject) or value.get('/Subtype') != '/Image':
+            return None
+        if any(isinstance(item, IndirectObject) for item in value.values()):
+            # Máscaras o espacios de color en otros objetos: no se comparan
+            return None
+
+        def no_refs(indirect):
+            raise ValueError("referencia indirecta")
+
+        header = io.BytesIO()
+        saved_out, self.out = self.out, header
+        try:
+            self._write_dict(value, no_refs, length=len(value._data))
+        except ValueError:
+            return None
+        finally:
+            self.out = saved_out
+        digest = hashlib.sha256(header.getvalue())
+        digest.update(value._data)
+        return digest.hexdigest()
+
+    def write_xref(self, prev: Optional[int] = None) -> int:
+        """Tabla xref con los objetos escritos en esta sección y el trailer"""
+        start = self.out.tell()
+        # La entrada 0 se repite también en las actualizaciones incrementales:
+        # algunos lectores esperan que cada sección empiece en el objeto 0
+        self.out.write(b"xref\n0 1\n0000000000 65535 f \n")
+
+        # Subsecciones de números consecutivos
+        numbers = sorted(self.offsets)
+        run: List[int] = []
+        for number in numbers + [None]:
+            if run and (number is None or number != run[-1] + 1):
+                self.out.write(f"{run[0]} {len(run)}\n".encode())
+                for item in run:
+                    self.out.write(f"{self.offsets[item]:010d} 00000 n \n".encode())
+                run = []
+            if number is not None:
+                run.append(number)
+
+        trailer = f"trailer\n<<\n/Size {self.next_number}\n/Root {CATALOG_NUMBER} 0 R"
+        if prev is not None:
+            trailer += f"\n/Prev {prev}"
+        self.out.write(f"{trailer}\n>>\nstartxref\n{start}\n%%EOF\n".encode())
+        return start
+
+    def copy_pages(self, pdf_path: str) -> List[int]:
+        """Copiar las páginas de un PDF y todo lo que referencian; devuelve sus números"""
+        with open(pdf_path, 'rb') as f:
+            # Con un archivo abierto PyPDF2 lee bajo demanda en lugar de cargarlo entero
+            reader = PyPDF2.PdfReader(f)
+            if reader.is_encrypted:
+                raise ValueError(f"PDF cifrado: {os.path.basename(pdf_path)}")
+
+            refs: Dict[tuple, int] = {}
+            pending = deque()
+
+            def ref(indirect: IndirectObject) -> int:
+                key = (indirect.idnum, indirect.generation)
+                number = refs.get(key)
+                if number is None:
+                    value = indirect.get_object()
+                    digest = self._image_digest(value)
+                    if digest is not None and digest in self.images:
+                        # Imagen ya escrita (en este u otro capítulo): se reutiliza
+                        self.duplicates += 1
+                        self.bytes_saved += len(value._data)
+                        number = refs[key] = self.images[digest]
+                        return number
+                    number = refs[key] = self.allocate()
+                    if digest is not None:
+                        self.images[digest] = number
+                    pending.append((number, value))
+                return number
+
+            # Números de página primero: las anotaciones que apuntan a páginas los reutilizan
+            pages = list(reader.pages)
+            page_numbers = []
+            for page in pages:
+                page_ref = page.indirect_reference
+                number = self.allocate()
+                if page_ref is not None:
+                    refs[(page_ref.idnum, page_ref.generation)] = number
+                page_numbers.append(number)
+
+            for page, number in zip(pages, page_numbers):
+                # El diccionario aplanado ya incluye los atributos heredados
+                self.write_object(number, page, ref)
+                while pending:
+                    item_number, value = pending.popleft()
+                    if isinstance(value, DictionaryObject) and value.get('/Type') in ('/Pages', '/Catalog'):
+                        # Estructura del PDF de origen: no se copia
+                        self.write_raw_object(item_number, b"null")
+                    else:
+                        self.write_object(item_number, value, ref)
+                # Los objetos ya escritos no se vuelven a necesitar
+                reader.resolved_objects.clear()
+            return page_numbers
+
+
+def _write_pages_tree(writer: _PdfStreamWriter, kids: List[int]):
+    kids_refs = " ".join(f"{number} 0 R" for number in kids)
+    writer.write_raw_object(
+        PAGES_NUMBER, f"<<\n/Type /Pages\n/Count {len(kids)}\n/Kids [ {kids_refs} ]\n>>".encode())
+
+
+def _load_index(output_path: str) -> Optional[dict]:
+    path = index_path(output_path)
+    if not os.path.exists(path) or not os.path.exists(output_path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # Si el PDF cambió por fuera del índice, no se puede ampliar
+    if index.get('pdf') != _file_signature(output_path):
+        return None
+    return index
+
+
+def _save_index(output_path: str, index: dict):
+    index['pdf'] = _file_signature(output_path)
+    path = index_path(output_path)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    os.replace(temp_path, path)
+
+
+def _chapter_entries(pdf_files: List[str]) -> List[dict]:
+    return [dict(file=os.path.basename(path), **_file_signature(path)) for path in pdf_files]
+
+
+def _rebuild(pdf_files: List[str], chapters: List[dict], output_path: str,
+             on_added: Optional[Callable[[str], None]]) -> dict:
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    kids: List[int] = []
+    try:
+        with open(temp_path, 'wb') as out:
+            out.write(PDF_HEADER)
+            writer = _PdfStreamWriter(out, next_number=PAGES_NUMBER + 1)
+            writer.write_raw_object(CATALOG_NUMBER, f"<<\n/Type /Catalog\n/Pages {PAGES_NUMBER} 0 R\n>>".encode())
+            for pdf_file in pdf_files:
+                kids.extend(writer.copy_pages(pdf_file))
+                if on_added:
+                    on_added(pdf_file)
+            _write_pages_tree(writer, kids)
+            startxref = writer.write_xref()
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    return {'startxref': startxref, 'size': writer.next_number, 'kids': kids, 'chapters': chapters,
+            'images': writer.images, 'duplicates': writer.duplicates, 'bytes_saved': writer.bytes_saved}
+
+
+def _append(index: dict, pdf_files: List[str], chapters: List[dict], output_path: str,
+            on_added: Optional[Callable[[str], None]]) -> dict:
+    """Actualización incremental: objetos nuevos, árbol de páginas nuevo y xref con /Prev"""
+    kids = list(index['kids'])
+    original_size = os.path.getsize(output_path)
+    with open(output_path, 'r+b') as out:
+        out.seek(0, os.SEEK_END)
+        try:
+            writer = _PdfStreamWriter(out, next_number=index['size'], images=dict(index.get('images', {})))
+            for pdf_file in pdf_files:
+                kids.extend(writer.copy_pages(pdf_file))
+                if on_added:
+                    on_added(pdf_file)
+            _write_pages_tree(writer, kids)
+            startxref = writer.write_xref(prev=index['startxref'])
+        except Exception:
+            # Dejar el PDF como estaba antes de la actualización
+            out.truncate(original_size)
+            raise
+
+    return {'startxref': startxref, 'size': writer.next_number, 'kids': kids,
+            'chapters': index['chapters'] + chapters, 'images': writer.images,
+            'duplicates': writer.duplicates, 'bytes_saved': writer.bytes_saved}
+
+
+def merge_pdfs(pdf_files: List[str], output_path: str, incremental: bool = True,
+               on_added: Optional[Callable[[str], None]] = None) -> dict:
+    """Combinar PDFs en uno con memoria acotada
+
+    Cada página se copia objeto a objeto directamente al archivo de salida.
+    Si el PDF unificado ya contiene (según su índice) los primeros capítulos
+    de la lista sin cambios, solo se añaden los nuevos con una actualización
+    incremental; si no, se reconstruye entero.
+
+    Devuelve {'mode': 'rebuilt' | 'appended' | 'unchanged', 'added', 'pages',
+    'duplicates', 'bytes_saved'}, donde los dos últimos cuentan las imágenes
+    repetidas que se reutilizaron en lugar de escribirse de nuevo.
+    """
+    pdf_files = [path for path in pdf_files if os.path.exists(path)]
+    chapters = _chapter_entries(pdf_files)
+
+    index = _load_index(output_path) if incremental else None
+    done = len(index['chapters']) if index is not None else 0
+    if index is not None and chapters[:done] == index['chapters']:
+        if done == len(chapters):
+            return {'mode': 'unchanged', 'added': 0, 'pages': len(index['kids']),
+                    'duplicates': 0, 'bytes_saved': 0}
+        index = _append(index, pdf_files[done:], chapters[done:], output_path, on_added)
+        result = {'mode': 'appended', 'added': len(chapters) - done}
+    else:
+        index = _rebuild(pdf_files, chapters, output_path, on_added)
+        result = {'mode': 'rebuilt', 'added': len(chapters)}
+
+    result.update(pages=len(index['kids']), duplicates=index.pop('duplicates'),
+                  bytes_saved=index.pop('bytes_saved'))
+    _save_index(output_path, index)
+    return result
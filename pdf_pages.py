@@ -0,0 +1,138 @@
+import io
+import itertools
+import os
+from collections import deque
+from concurrent.futures import Executor
+from typing import Iterator, List, Optional, Tuple
+
+from PIL import Image
+from reportlab.lib.utils import ImageReader
+
+# Modos JPEG que un lector PDF muestra correctamente con DCTDecode directo
+PASSTHROUGH_MODES = ('RGB', 'L')
+
+# Una página preparada: (tipo, datos, ancho, alto) con tipo passthrough, jpeg o raw
+PreparedPage = Tuple[str, bytes, int, int]
+
+
+class EncodedJPEG(ImageReader):
+    """ImageReader sobre un JPEG ya codificado en memoria
+
+    reportlab incrusta los JPEG tal cual (DCTDecode), pero para decidir si la
+    imagen ya está en el documento decodifica el ImageReader y calcula un hash
+    de los píxeles. Aquí la firma se calcula sobre los bytes comprimidos, así
+    cada página se decodifica una sola vez y nunca toca el disco.
+    """
+
+    def __init__(self, data: bytes):
+        super().__init__(io.BytesIO(data))
+        self._encoded = data
+        self._dataA = None
+
+    def getRGBData(self):
+        return self._encoded
+
+
+def can_passthrough(info: dict, width: int, height: int) -> bool:
+    """La imagen es un JPEG que ya tiene el tamaño de página: se incrusta sin recodificar"""
+    return (info.get('format') == 'JPEG' and info.get('mode') in PASSTHROUGH_MODES
+            and (info['width'], info['height']) == (width, height))
+
+
+def _load_page(image_path: str, target_width: int, target_height: Optional[int]) -> Image.Image:
+    """Abrir la imagen en RGB ajustada al tamaño de página"""
+    with Image.open(image_path) as img:
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        else:
+            img.load()
+
+        original_width, original_height = img.size
+        if target_height is None:
+            target_height = (original_height if original_width == target_width
+                             else int(original_height * target_width / original_width))
+
+        # Solo redimensionar si el tamaño es diferente
+        if (original_width, original_height) != (target_width, target_height):
+            img = img.resize((target_width, target_height), Image.Resampling.LANCZOS)
+        return img
+
+
+def encode_page(image_path: str, target_width: int, target_height: Optional[int] = None,
+                quality: int = 95, **save_options) -> Tuple[bytes, int, int]:
+    """Decodificar, ajustar al ancho objetivo y codificar una página en JPEG
+
+    Si se conoce el alto de página (por el índice de dimensiones) se usa tal
+    cual; si no, se calcula manteniendo la proporción.
+    """
+    img = _load_page(image_path, target_width, target_height)
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=quality, **save_options)
+    return buffer.getvalue(), img.width, img.height
+
+
+def prepare_page(image_path: str, width: int, height: int, encoding: str = 'jpeg',
+                 passthrough: bool = False) -> PreparedPage:
+    """Preparar una página para el PDF según el modo de codificación"""
+    if passthrough:
+        # El flujo JPEG original se incrusta tal cual, sin decodificar
+        with open(image_path, 'rb') as f:
+            return 'passthrough', f.read(), width, height
+
+    if encoding == 'lossless':
+        img = _load_page(image_path, width, height)
+        return 'raw', img.tobytes(), img.width, img.height
+
+    if encoding == 'near_lossless':
+        data, width, height = encode_page(image_path, width, height, quality=100, subsampling=0)
+    else:
+        data, width, height = encode_page(image_path, width, height)
+    return 'jpeg', data, width, height
+
+
+def page_reader(page: PreparedPage) -> ImageReader:
+    """ImageReader listo para canvas.drawImage a partir de una página preparada"""
+    kind, data, width, height = page
+    if kind == 'raw':
+        # reportlab comprime los píxeles con Flate (sin pérdida)
+        return ImageReader(Image.frombytes('RGB', (width, height), data))
+    return EncodedJPEG(data)
+
+
+def encode_pages(plan: List[Tuple[str, int, int, bool]], executor: Optional[Executor] = None,
+                 encoding: str = 'jpeg', window: Optional[int] = None
+                 ) -> Iterator[Tuple[str, Optional[PreparedPage], Optional[Exception]]]:
+    """Preparar las páginas (en paralelo si hay executor) y entregarlas en orden
+
+    plan es una lista de (ruta, ancho, alto, passthrough). Produce
+    (ruta, página preparada, error) en el mismo orden; como mucho `window`
+    páginas preparadas esperan en memoria a que el escritor del PDF las consuma.
+    """
+    if executor is None:
+        for image_path, width, height, passthrough in plan:
+            try:
+                yield image_path, prepare_page(image_path, width, height, encoding, passthrough), None
+            except Exception as e:
+                yield image_path, None, e
+        return
+
+    window = window or 2 * (getattr(executor, '_max_workers', None) or os.cpu_count() or 1)
+    pending = deque()
+    pages = iter(plan)
+
+    def submit(image_path, width, height, passthrough):
+        future = executor.submit(prepare_page, image_path, width, height, encoding, passthrough)
+        pending.append((image_path, future))
+
+    for entry in itertools.islice(pages, window):
+        submit(*entry)
+
+    while pending:
+        image_path, future = pending.popleft()
+        # Mantener la ventana llena mientras el escritor consume
+        for entry in itertools.islice(pages, 1):
+            submit(*entry)
+        try:
+            yield image_path, future.result(), None
+        except Exception as e:
+            yield image_path, None, e
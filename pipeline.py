@@ -0,0 +1,85 @@
+import logging
+import queue
+import threading
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+# Marca de fin de trabajo que recorre el pipeline detrás del último elemento
+_FIN = object()
+
+
+class StagePipeline:
+    """Pipeline por etapas con colas acotadas entre ellas
+
+    Cada etapa es (nombre, función, hilos). La función recibe el trabajo de la
+    etapa anterior y devuelve el trabajo para la siguiente, o None para
+    descartarlo. Las colas acotadas frenan a las etapas rápidas (backpressure)
+    para que memoria y disco no crezcan sin límite.
+    """
+
+    def __init__(self, stages: List[Tuple[str, Callable[[Any], Any], int]],
+                 queue_size: int = 2, logger: Optional[logging.Logger] = None):
+        if not stages:
+            raise ValueError("El pipeline necesita al menos una etapa")
+        self.stages = [(name, func, max(1, workers)) for name, func, workers in stages]
+        self.queue_size = max(1, queue_size)
+        self.logger = logger or logging.getLogger(__name__)
+
+    def run(self, items: Iterable[Any]) -> List[Any]:
+        """Procesar todos los trabajos y devolver los que llegaron al final"""
+        # Una cola de entrada por etapa más la cola de resultados
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        queues.append(queue.Queue())
+
+        threads = []
+
+        def feed():
+            for item in items:
+                queues[0].put(item)
+            for _ in range(self.stages[0][2]):
+                queues[0].put(_FIN)
+
+        for index, (name, func, workers) in enumerate(self.stages):
+            remaining = [workers]
+            lock = threading.Lock()
+            # La etapa siguiente necesita una marca de fin por cada hilo
+            next_fins = self.stages[index + 1][2] if index + 1 < len(self.stages) else 1
+
+            def work(name=name, func=func, inbox=queues[index], outbox=queues[index + 1],
+                     remaining=remaining, lock=lock, next_fins=next_fins):
+                while True:
+                    item = inbox.get()
+                    if item is _FIN:
+                        break
+                    try:
+                        result = func(item)
+                    except Exception as e:
+                        self.logger.error(f"Error en etapa '{name}': {str(e)}")
+                        continue
+                    if result is not None:
+                        outbox.put(result)
+
+                # El último hilo en terminar avisa a la etapa siguiente
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    for _ in range(next_fins):
+                        outbox.put(_FIN)
+
+            for n in range(workers):
+                threads.append(threading.Thread(target=work, name=f"{name}-{n}", daemon=True))
+
+        threads.append(threading.Thread(target=feed, name="pipeline-feed", daemon=True))
+        for thread in threads:
+            thread.start()
+
+        results = []
+        while True:
+            item = queues[-1].get()
+            if item is _FIN:
+                break
+            results.append(item)
+
+        for thread in threads:
+            thread.join()
+        return results
@@ -5,9 +5,10 @@ Combina todos los PDFs individuales existentes en un archivo final
 """
 
 import os
-import sys
 import logging
-from manga_downloader_edge import EdgeMangaDownloader
+from library_store import open_library
+from pdf_engine import PdfEngine
+from title_record import TitleRecord
 
 def setup_logging():
     """Configurar logging"""
@@ -35,29 +36,20 @@ def main():
         logger.error("❌ Directorio de PDFs no encontrado")
         return
     
-    # Contar PDFs existentes
-    pdf_files = []
-    for file in os.listdir(pdf_dir):
-        if file.startswith('capitulo_') and file.endswith('.pdf'):
-            pdf_files.append(file)
+    # PDFs existentes según la biblioteca (se importa lo que hay en disco la primera vez)
+    library = open_library(base_dir)
+    pdf_files = TitleRecord(library, manga_dir).outputs('pdf')
     
     if not pdf_files:
         logger.error("❌ No se encontraron PDFs individuales")
+        library.close()
         return
     
     logger.info(f"📁 Encontrados {len(pdf_files)} PDFs individuales")
     
-    # Mostrar lista de capítulos
-    chapter_numbers = []
-    for file in pdf_files:
-        try:
-            chapter_part = file.replace('capitulo_', '').replace('.pdf', '')
-            chapter_num = float(chapter_part)
-            chapter_numbers.append(int(chapter_num) if chapter_num.is_integer() else chapter_num)
-        except:
-            continue
-    
-    chapter_numbers.sort()
+    # Mostrar lista de capítulos (ya ordenados por número)
+    chapter_numbers = [int(entry['number']) if entry['number'].is_integer() else entry['number']
+                       for entry in pdf_files]
     logger.info(f"📚 Capítulos disponibles: {chapter_numbers}")
     
     # Preguntar confirmación
@@ -66,15 +58,16 @@ def main():
     
     if respuesta == 'n':
         print("❌ Regeneración cancelada")
+        library.close()
         return
     
-    # Crear el descargador solo para usar el método de combinación
-    downloader = EdgeMangaDownloader()
+    # Solo hace falta el motor de combinación, no el descargador con Edge
+    engine = PdfEngine(logger=logger)
     
     logger.info("🔄 Regenerando PDF completo...")
     
     try:
-        success = downloader.combine_all_pdfs(manga_dir, manga_id)
+        success = engine.combine_all_pdfs(manga_dir, manga_id, library)
         
         if success:
             final_pdf = os.path.join(manga_dir, f"{manga_id}_completo.pdf")
@@ -97,7 +90,8 @@ def main():
     
     finally:
         try:
-            downloader.cleanup()
+            engine.close()
+            library.close()
         except:
             pass
 
@@ -0,0 +1,97 @@
+import re
+from typing import List, Optional
+
+import lxml.html
+
+# Extracción sin navegador: mismas reglas que los scripts JavaScript de
+# EdgeMangaDownloader, aplicadas con lxml sobre el HTML estático
+
+
+def _has_class(name: str) -> str:
+    """Equivalente XPath del selector CSS .name"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# Mismo orden de prioridad que image_script en get_chapter_images
+IMAGE_XPATHS = [
+    '//div[@name="image-item"]//img[@src]',
+    f'//*[{_has_class("chapter-images")}]//img[@src]',
+    f'//*[{_has_class("reader")}]//img[@src]',
+    f'//*[{_has_class("manga-reader")}]//img[@src]',
+    '//img[contains(@src, "media")]',
+    '//img[contains(@src, "chapter")]',
+]
+
+# Mismo orden que cover_script en get_cover_image
+COVER_XPATHS = [
+    '//img[contains(@src, "thumb")]',
+    f'//*[{_has_class("manga-cover")}]//img[@src]',
+    f'//*[{_has_class("cover")}]//img[@src]',
+    '//img[contains(@src, "cover")]',
+    f'//*[{_has_class("thumbnail")}]//img[@src]',
+    '//img[contains(@alt, "cover")]',
+]
+
+CHAPTER_LINKS_XPATH = '//a[contains(@href, "/ch_") or contains(@href, "-ch_") or contains(@href, "chapter")]'
+
+
+def _parse(html: str, base_url: str):
+    document = lxml.html.fromstring(html)
+    document.make_links_absolute(base_url, resolve_base_href=True)
+    return document
+
+
+def parse_chapters(html: str, base_url: str) -> List[dict]:
+    """Enlaces de capítulos como {'url', 'title', 'number'}"""
+    chapters = []
+    for link in _parse(html, base_url).xpath(CHAPTER_LINKS_XPATH):
+        href = link.get('href')
+        text = link.text_content().strip()
+        if href and text and ('/ch_' in href or '-ch_' in href):
+            match = re.search(r'ch_(\d+(?:\.\d+)?)', href)
+            chapters.append({
+                'url': href,
+                'title': text,
+                'number': match.group(1) if match else len(chapters) + 1
+            })
+    return chapters
+
+
+def _image_sources(elements, images: List[str]):
+    for img in elements:
+        src = img.get('src')
+        if src and 'data:' not in src and src not in images:
+            images.append(src)
+
+
+def parse_chapter_images(html: str, base_url: str) -> List[str]:
+    """URLs de las páginas de un capítulo"""
+    document = _parse(html, base_url)
+    images = []
+
+    # Prioridad 1: div[name="image-items"]
+    container = document.xpath('//div[@name="image-items"]')
+    if container:
+        _image_sources(container[0].xpath('.//img[@src]'), images)
+
+    # Prioridad 2: contenedores comunes
+    if not images:
+        for xpath in IMAGE_XPATHS:
+            _image_sources(document.xpath(xpath), images)
+            if images:
+                break
+
+    return [url for url in images if url and len(url) > 10]
+
+
+def parse_cover(html: str, base_url: str) -> Optional[str]:
+    """URL de la portada del manga"""
+    document = _parse(html, base_url)
+    for xpath in COVER_XPATHS:
+        for img in document.xpath(xpath):
+            src = img.get('src')
+            if src and 'data:' not in src:
+                return src
+            # Como querySelector: solo cuenta la primera coincidencia
+            break
+    return None
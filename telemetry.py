@@ -0,0 +1,185 @@
+import bisect
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from metrics import _escape_label
+
+# Límites superiores (segundos) de los histogramas de TTFB y latencia
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Histograma acumulativo al estilo Prometheus (conteo por límite superior)"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Cota superior del cuantil según los límites del histograma"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float('inf')
+
+    def snapshot(self) -> dict:
+        cumulative, seen = {}, 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            cumulative['+Inf' if bound == float('inf') else str(bound)] = seen
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'avg': self.sum / self.count if self.count else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'buckets': cumulative,
+        }
+
+
+class _HostStats:
+    def __init__(self, buckets):
+        self.requests = 0
+        self.pages = 0
+        self.errors = 0
+        self.retries = 0
+        self.not_modified = 0
+        self.bytes = 0
+        self.ttfb = Histogram(buckets)
+        self.latency = Histogram(buckets)
+
+
+class TransferTelemetry:
+    """Telemetría de las transferencias de imágenes, agregada por host
+
+    Cada petición aporta su tiempo hasta el primer byte, su latencia total,
+    los bytes recibidos y si era un reintento. Además se mantiene una ventana
+    deslizante de páginas completadas para el rendimiento en vivo.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window: float = 10.0,
+                 logger: Optional[logging.Logger] = None):
+        self.buckets = tuple(buckets)
+        self.window = window
+        self.logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, _HostStats] = defaultdict(lambda: _HostStats(self.buckets))
+        # (instante, bytes) de cada petición terminada dentro de la ventana
+        self._recent = deque()
+        self._started = time.monotonic()
+        self._reporter: Optional[threading.Thread] = None
+        self._stop_reporter = threading.Event()
+
+    def record(self, url: str, ttfb: Optional[float], latency: float, nbytes: int = 0,
+               attempt: int = 0, status: Optional[int] = None, ok: bool = True):
+        """Anotar una petición (un intento); ttfb es None si no llegó respuesta"""
+        now = time.monotonic()
+        with self._lock:
+            host = self._hosts[urlparse(url).netloc]
+            host.requests += 1
+            host.bytes += nbytes
+            if attempt:
+                host.retries += 1
+            if ttfb is not None:
+                host.ttfb.observe(ttfb)
+            host.latency.observe(latency)
+            if not ok:
+                host.errors += 1
+                return
+            host.pages += 1
+            if status == 304:
+                host.not_modified += 1
+            self._recent.append((now, nbytes))
+            self._trim(now)
+
+    def _trim(self, now: float):
+        while self._recent and now - self._recent[0][0] > self.window:
+            self._recent.popleft()
+
+    def throughput(self) -> dict:
+        """Bytes y páginas por segundo en la ventana reciente"""
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            span = min(self.window, now - self._started) or 1e-9
+            nbytes = sum(size for _, size in self._recent)
+            return {'bytes_per_second': nbytes / span, 'pages_per_second': len(self._recent) / span}
+
+    def stats(self) -> dict:
+        """Estadísticas por host (histogramas incluidos) y rendimiento en vivo"""
+        throughput = self.throughput()
+        with self._lock:
+            hosts = {
+                name: {
+                    'requests': host.requests,
+                    'pages': host.pages,
+                    'errors': host.errors,
+                    'retries': host.retries,
+                    'not_modified': host.not_modified,
+                    'bytes': host.bytes,
+                    'ttfb': host.ttfb.snapshot(),
+                    'latency': host.latency.snapshot(),
+                }
+                for name, host in self._hosts.items()
+            }
+        return {
+            'hosts': hosts,
+            'totals': {key: sum(host[key] for host in hosts.values())
+                       for key in ('requests', 'pages', 'errors', 'retries', 'bytes')},
+            'throughput': throughput,
+        }
+
+    def prometheus_lines(self, prefix: str, labels: Dict[str, str]) -> List[str]:
+        """Histogramas por host en formato de texto de Prometheus"""
+        base = "".join(f'{key}="{_escape_label(value)}",' for key, value in labels.items())
+        lines = []
+        for metric in ('ttfb', 'latency'):
+            name = f"{prefix}_transfer_{metric}_seconds"
+            lines.append(f"# HELP {name} {'Tiempo hasta el primer byte' if metric == 'ttfb' else 'Latencia total'} por host")
+            lines.append(f"# TYPE {name} histogram")
+            for host_name, host in self.stats()['hosts'].items():
+                host_name = _escape_label(host_name)
+                histogram = host[metric]
+                for bound, count in histogram['buckets'].items():
+                    lines.append(f'{name}_bucket{{{base}host="{host_name}",le="{bound}"}} {count}')
+                lines.append(f'{name}_sum{{{base}host="{host_name}"}} {histogram["sum"]:.3f}')
+                lines.append(f'{name}_count{{{base}host="{host_name}"}} {histogram["count"]}')
+        return lines
+
+    def start_reporter(self, interval: float = 10.0):
+        """Registrar el rendimiento en vivo cada `interval` segundos mientras haya actividad"""
+        if self._reporter is not None:
+            return
+        self._stop_reporter.clear()
+
+        def report():
+            while not self._stop_reporter.wait(interval):
+                current = self.throughput()
+                if current['pages_per_second'] > 0:
+                    self.logger.info(f"📶 Transferencia: {current['bytes_per_second'] / (1024 * 1024):.2f} MB/s, "
+                                     f"{current['pages_per_second']:.1f} páginas/s")
+
+        self._reporter = threading.Thread(target=report, name="telemetria", daemon=True)
+        self._reporter.start()
+
+    def stop_reporter(self):
+        if self._reporter is not None:
+            self._stop_reporter.set()
+            self._reporter.join()
+            self._reporter = None
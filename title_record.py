@@ -0,0 +1,110 @@
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from library_store import LibraryStore, chapter_page_rows
+
+# Capítulo tal como lo devuelve get_chapters_list: (número, título, URL)
+Chapter = Tuple[float, str, str]
+
+# Registro JSON por título de versiones anteriores; se importa una vez al almacén
+LEGACY_FILENAME = "titulo.json"
+
+
+class TitleRecord:
+    """Vista de un título en el almacén de la biblioteca
+
+    Los capítulos ya procesados, sus páginas y sus archivos generados viven
+    en la base de datos (ver LibraryStore). El modo de actualización compara
+    este registro con la lista de capítulos del sitio para procesar solo los
+    nuevos o los que han cambiado. Un título que aún no está en el almacén se
+    importa desde sus carpetas (y su titulo.json, si lo tiene).
+    """
+
+    def __init__(self, store: LibraryStore, manga_dir: str, name: Optional[str] = None):
+        self.store = store
+        self.manga_dir = manga_dir
+        self.slug = os.path.basename(os.path.abspath(manga_dir))
+        self.name = name
+
+        title = store.title(self.slug)
+        if title is not None:
+            self.title_id = title['id']
+        elif os.path.isdir(manga_dir):
+            self.title_id = store.import_title(manga_dir, self.slug)
+        else:
+            self.title_id = store.upsert_title(self.slug, manga_dir, name=name)
+
+    @staticmethod
+    def _same_chapter(url: Optional[str], other: str) -> bool:
+        # Solo cuenta la ruta: el mismo capítulo se sirve desde varios dominios espejo.
+        # Los capítulos importados de disco sin URL se dan por iguales
+        if url is None:
+            return True
+        return urlparse(url).path.rstrip('/') == urlparse(other).path.rstrip('/')
+
+    @property
+    def cover(self) -> Optional[str]:
+        """Portada guardada en una ejecución anterior, si sigue en disco"""
+        cover = self.store.title(self.slug)['cover']
+        path = os.path.join(self.manga_dir, cover) if cover else None
+        return path if path and os.path.exists(path) else None
+
+    def set_cover(self, cover_path: str):
+        self.store.upsert_title(self.slug, self.manga_dir, cover=os.path.basename(cover_path))
+
+    def pending(self, chapters: List[Chapter], output_format: str,
+                output_dir: str) -> List[Tuple[Chapter, str]]:
+        """Capítulos a procesar y el motivo: 'nuevo', 'cambiado' (otra ruta) o 'sin archivo'"""
+        known = {entry['number']: entry for entry in self.store.chapters(self.title_id)}
+        outputs = {entry['number']: entry['path'] for entry in self.store.artifacts(self.title_id, output_format)}
+        result = []
+        for chapter in chapters:
+            number, _, url = chapter
+            entry = known.get(float(number))
+            output = outputs.get(float(number))
+            if entry is None:
+                result.append((chapter, 'nuevo'))
+            elif not self._same_chapter(entry['url'], url):
+                result.append((chapter, 'cambiado'))
+            elif not output or not os.path.exists(output):
+                result.append((chapter, 'sin archivo'))
+        return result
+
+    def record_download(self, number, title: str, url: str, chapter_dir: str) -> Tuple[int, int]:
+        """Anotar un capítulo descargado y sus páginas (del manifiesto), antes de convertirlo
+
+        Así un capítulo cuya conversión falla o se interrumpe sigue en la
+        biblioteca y las herramientas sin conexión pueden convertirlo.
+        Devuelve (id del capítulo, páginas completas).
+        """
+        previous = {entry['number']: entry for entry in self.store.chapters(self.title_id)}.get(float(number))
+        chapter_id = self.store.upsert_chapter(self.title_id, number, title, url, chapter_dir)
+        if previous is not None and not self._same_chapter(previous['url'], url):
+            # Capítulo sustituido: los archivos de otros formatos ya no valen
+            self.store.clear_artifacts(chapter_id)
+        pages = chapter_page_rows(chapter_dir) if os.path.isdir(chapter_dir) else []
+        self.store.replace_pages(chapter_id, pages)
+        return chapter_id, sum(1 for page in pages if page['status'] == 'complete')
+
+    def record_chapter(self, number, title: str, url: str, output_format: str, output_path: str,
+                       chapter_dir: str):
+        """Anotar un capítulo terminado: sus páginas y su archivo"""
+        chapter_id, pages = self.record_download(number, title, url, chapter_dir)
+        self.store.record_artifact(self.title_id, chapter_id, output_format, output_path, pages)
+
+    def record_unified(self, output_format: str, output_path: str):
+        self.store.record_artifact(self.title_id, None, output_format, output_path)
+
+    def outputs(self, output_format: str) -> List[Dict]:
+        """Capítulos con archivo en este formato (en disco), ordenados por número"""
+        return [
+            {'number': entry['number'], 'title': entry['name'], 'path': entry['path']}
+            for entry in self.store.artifacts(self.title_id, output_format)
+            if os.path.exists(entry['path'])
+        ]
+
+    def save(self, manga_url: Optional[str] = None):
+        """Anotar la URL del título y la fecha de la última revisión"""
+        self.store.upsert_title(self.slug, self.manga_dir, url=manga_url, name=self.name, checked=time.time())